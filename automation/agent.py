@@ -0,0 +1,279 @@
+import argparse
+import gzip
+import json
+import logging
+import sqlite3
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import requests
+from snmp import Engine, SNMPv2c
+from automation.data_extractor import (scan_subnet, add_printer_parsing_snmp, checking_activity, get_printer_stamp,
+                                       fetch_snmp_data_to_int, split_nm_supply, parsing_snmp_katusha,
+                                       parsing_snmp_avision, parsing_snmp_hp, parsing_snmp_kyosera,
+                                       parsing_snmp_sindoh, fetch_pantum_counters, fetch_device_error)
+from automation.snmp_oid_map import device_snmp_map, printer_supplies_dict
+
+
+logger_main = logging.getLogger('automation')
+
+DEFAULT_CONFIG = {
+    'buffer_path': 'collector_buffer.sqlite3',
+    'poll_interval': 300,
+    'discovery_interval': 21600,
+    'batch_size': 500,
+    'counters_hour': 10,
+    'timeout': 30,
+}
+
+COUNTER_PARSERS = {
+    'katusha': parsing_snmp_katusha.__wrapped__,
+    'avision': parsing_snmp_avision.__wrapped__,
+    'hewlett-packard': parsing_snmp_hp.__wrapped__,
+    'kyocera': parsing_snmp_kyosera.__wrapped__,
+    'sindoh': parsing_snmp_sindoh.__wrapped__,
+    'pantum': fetch_pantum_counters,
+}
+
+UNKNOWN_PRINTER_INFO = ['Printer', 'Model', 'Serial_Number']
+
+
+class AgentPrinter:
+    def __init__(self, ip_address: str, stamp: str, model: str, serial_number: str):
+        if stamp.lower() not in device_snmp_map:
+            stamp = 'Katusha'
+        self.ip_address = SimpleNamespace(address=ip_address)
+        self.model = SimpleNamespace(name=model, stamp=SimpleNamespace(name=stamp))
+        self.serial_number = serial_number
+        self.is_active = True
+
+    def __str__(self):
+        return f"{self.model.stamp.name} {self.model.name} {self.ip_address.address}"
+
+
+class ReadingsBuffer:
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS readings (id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS rejected_readings (id INTEGER PRIMARY KEY, payload TEXT NOT NULL,
+                                                          error TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        ''')
+
+    def append(self, readings: list):
+        with self.connection:
+            self.connection.executemany('INSERT INTO readings (payload) VALUES (?)',
+                                        [(json.dumps(reading),) for reading in readings])
+
+    def pending(self, limit: int) -> list:
+        return self.connection.execute('SELECT id, payload FROM readings ORDER BY id LIMIT ?', (limit,)).fetchall()
+
+    def remove(self, reading_ids: list):
+        with self.connection:
+            self.connection.executemany('DELETE FROM readings WHERE id = ?',
+                                        [(reading_id,) for reading_id in reading_ids])
+
+    def reject(self, readings: list, error: str):
+        with self.connection:
+            self.connection.executemany('INSERT INTO rejected_readings (id, payload, error) VALUES (?, ?, ?)',
+                                        [(reading_id, payload, error) for reading_id, payload in readings])
+            self.connection.executemany('DELETE FROM readings WHERE id = ?',
+                                        [(reading_id,) for reading_id, _ in readings])
+
+    def count_rejected(self) -> int:
+        return self.connection.execute('SELECT COUNT(*) FROM rejected_readings').fetchone()[0]
+
+    def count(self) -> int:
+        return self.connection.execute('SELECT COUNT(*) FROM readings').fetchone()[0]
+
+    def get_state(self, key: str, default=None):
+        row = self.connection.execute('SELECT value FROM state WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_state(self, key: str, value):
+        with self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)', (key, json.dumps(value)))
+
+
+def load_config(path: str) -> dict:
+    with open(path) as config_file:
+        config = json.load(config_file)
+    for key in ('server_url', 'token'):
+        if not config.get(key):
+            raise ValueError(f"{key} is required in the collector config")
+    return {**DEFAULT_CONFIG, **config}
+
+
+def fetch_subnets(config: dict, buffer: ReadingsBuffer) -> list:
+    if config.get('subnets'):
+        return config['subnets']
+
+    try:
+        response = requests.get(f"{config['server_url'].rstrip('/')}/api/collector-config",
+                                headers={'Authorization': f"Token {config['token']}"}, timeout=config['timeout'])
+        response.raise_for_status()
+        subnets = response.json()['subnets']
+        buffer.set_state('subnets', subnets)
+        return subnets
+    except (requests.RequestException, ValueError, KeyError) as e:
+        logger_main.warning(f"Collector config is not available, using the cached subnets: {e}")
+        return buffer.get_state('subnets', [])
+
+
+def discover_printers(subnets: list) -> list:
+    printers = list()
+    for subnet in subnets:
+        for ip_address in scan_subnet(subnet):
+            printer_info = add_printer_parsing_snmp(ip_address)
+            if printer_info == UNKNOWN_PRINTER_INFO or not all(printer_info):
+                continue
+            printers.append(AgentPrinter(ip_address, *printer_info))
+    logger_main.info(f"Discovered {len(printers)} printers in {len(subnets)} subnets")
+    return printers
+
+
+def fetch_supply_levels(printer) -> list:
+    supplies = list()
+    stamp = get_printer_stamp(printer)
+
+    if stamp:
+        try:
+            with Engine(SNMPv2c, defaultCommunity=b"public") as engine:
+                ip_printer = engine.Manager(str(printer.ip_address.address))
+                for nm_supply_oid in printer_supplies_dict['supply']:
+                    nm_res_supply_oid = 'resource_' + nm_supply_oid
+                    if nm_res_supply_oid in device_snmp_map[stamp]:
+                        extracted_value = fetch_snmp_data_to_int(ip_printer, stamp, nm_res_supply_oid)
+                        if extracted_value and extracted_value <= 100:
+                            color_supply, type_supply = split_nm_supply(nm_supply_oid)
+                            supplies.append({'color': color_supply, 'type': type_supply, 'remaining': extracted_value})
+        except Exception as e:
+            logger_main.error(f"{printer}: {e} - Error in launching the SNMP engine in the fetch_supply_levels "
+                              f"function")
+
+    return supplies
+
+
+def fetch_counters(printer):
+    parser = COUNTER_PARSERS[printer.model.stamp.name.lower()]
+    try:
+        counters = parser(printer)
+    except (ValueError, TypeError) as e:
+        logger_main.error(f"{printer}: {e} - Error in the fetch_counters function")
+        return
+    if counters and all(value is not None for value in counters):
+        return dict(zip(('page', 'print', 'copies', 'scan'), counters))
+
+
+def collect_readings(printers: list, buffer: ReadingsBuffer, counters_hour: int) -> list:
+    readings = list()
+    now = datetime.now()
+    today = now.date().isoformat()
+    counters_days = buffer.get_state('counters_days', {})
+
+    for printer in printers:
+        time_collect = datetime.now(timezone.utc).isoformat()
+        if not checking_activity(printer.ip_address.address):
+            readings.append({'serial_number': printer.serial_number, 'time_collect': time_collect, 'online': False})
+            continue
+
+        reading = {'serial_number': printer.serial_number, 'time_collect': time_collect,
+                   'supplies': fetch_supply_levels(printer)}
+        if now.hour >= counters_hour and counters_days.get(printer.serial_number) != today:
+            counters = fetch_counters(printer)
+            if counters:
+                reading.update(counters)
+                counters_days[printer.serial_number] = today
+        error = fetch_device_error(printer)
+        if error:
+            reading['errors'] = [error]
+        readings.append(reading)
+
+    buffer.append(readings)
+    buffer.set_state('counters_days', counters_days)
+    return readings
+
+
+class ServerUnavailable(Exception):
+    pass
+
+
+def ship_batch(buffer: ReadingsBuffer, batch: list, url: str, headers: dict, timeout: int) -> int:
+    body = gzip.compress('\n'.join(payload for _, payload in batch).encode())
+    try:
+        response = requests.post(url, data=body, headers=headers, timeout=timeout)
+    except requests.RequestException as e:
+        logger_main.warning(f"Server is unreachable, {buffer.count()} readings are buffered: {e}")
+        raise ServerUnavailable
+
+    if response.status_code == 400:
+        if len(batch) == 1:
+            logger_main.error(f"Server rejected the reading {batch[0][1]}: {response.text}")
+            buffer.reject(batch, response.text)
+            return 0
+        middle = len(batch) // 2
+        return (ship_batch(buffer, batch[:middle], url, headers, timeout) +
+                ship_batch(buffer, batch[middle:], url, headers, timeout))
+    if response.status_code != 200:
+        logger_main.warning(f"Server responded with {response.status_code}, {buffer.count()} readings are "
+                            f"buffered")
+        raise ServerUnavailable
+
+    unknown = response.json().get('unknown')
+    if unknown:
+        logger_main.warning(f"Printers are not registered on the server: {', '.join(unknown)}")
+    buffer.remove([reading_id for reading_id, _ in batch])
+    return len(batch)
+
+
+def ship_readings(buffer: ReadingsBuffer, config: dict) -> int:
+    shipped = 0
+    url = f"{config['server_url'].rstrip('/')}/api/ingest"
+    headers = {'Authorization': f"Token {config['token']}", 'Content-Type': 'application/x-ndjson',
+               'Content-Encoding': 'gzip'}
+
+    while True:
+        batch = buffer.pending(config['batch_size'])
+        if not batch:
+            break
+        try:
+            shipped += ship_batch(buffer, batch, url, headers, config['timeout'])
+        except ServerUnavailable:
+            break
+
+    return shipped
+
+
+def run_agent(config: dict, once: bool = False):
+    buffer = ReadingsBuffer(config['buffer_path'])
+    printers = list()
+    last_discovery = None
+
+    while True:
+        if last_discovery is None or time.monotonic() - last_discovery >= config['discovery_interval']:
+            printers = discover_printers(fetch_subnets(config, buffer))
+            last_discovery = time.monotonic()
+
+        collect_readings(printers, buffer, config['counters_hour'])
+        ship_readings(buffer, config)
+
+        if once:
+            break
+        time.sleep(config['poll_interval'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Collects printer readings in the configured subnets and ships '
+                                                 'them to the central server')
+    parser.add_argument('--config', default='collector.json', help='Path to the collector config')
+    parser.add_argument('--once', action='store_true', help='Run one collection cycle and exit')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    run_agent(load_config(args.config), once=args.once)
+
+
+if __name__ == '__main__':
+    # python -m automation.agent --config collector.json
+    main()
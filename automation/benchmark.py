@@ -0,0 +1,290 @@
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from django.utils import timezone
+import numpy as np
+from automation.snmp_oid_map import device_snmp_map
+from automation.snmp_simulator import get_device_oid_values
+
+
+logger_main = logging.getLogger('automation')
+
+BENCHMARK_SUBNET_SIZE = 250
+BENCHMARK_BATCH_SIZE = 5000
+BENCHMARK_AREAS = ('abakan', 'sayanogorsk', 'chernogorsk', 'shira', 'ust-abakan', 'kopyovo')
+BENCHMARK_PRINTER_MODELS = (
+    ('Katusha', 'M247'),
+    ('Avision', 'AM30A'),
+    ('Hewlett-Packard', 'LaserJet M404'),
+    ('Kyocera', 'ECOSYS M2040dn'),
+    ('Pantum', 'BM5100ADN'),
+    ('SINDOH', 'N600'),
+)
+COLLECTOR_TASKS = {
+    'Katusha': 'parsing_katushas_page_counts',
+    'Avision': 'parsing_avisions_page_counts',
+    'Hewlett-Packard': 'parsing_hps_page_counts',
+    'Kyocera': 'parsing_kyoseras_page_counts',
+    'Pantum': 'parsing_pantums_page_counts',
+    'SINDOH': 'parsing_sindohs_page_counts',
+}
+
+
+def get_benchmark_address(index: int) -> tuple:
+    subnet_index, host = divmod(index, BENCHMARK_SUBNET_SIZE)
+    return f'127.0.{subnet_index + 1}.0', f'127.0.{subnet_index + 1}.{host + 2}'
+
+
+def bulk_create_in_batches(model, rows, batch_size: int = BENCHMARK_BATCH_SIZE) -> int:
+    batch, qty = list(), 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            qty += len(batch)
+            batch = list()
+    if batch:
+        model.objects.bulk_create(batch)
+        qty += len(batch)
+    return qty
+
+
+def seed_synthetic_fleet(qty_printers: int, qty_days: int, seed: int = 0) -> dict:
+    from monitoring.models import (Subnet, IPAddress, Department, Cabinet, Location, PrinterStamp, PrinterModel,
+                                   SupplyItem, Printer, PrinterSupplyStatus, Statistics, DailyStat, MonthlyStat,
+                                   ChangeSupply, PrinterError)
+    from automation.rollups import rebuild_daily_rollups, refresh_subnet_stats
+
+    rng = np.random.default_rng(seed)
+    today = timezone.localdate()
+    first_day = today - timedelta(days=qty_days + 1)
+
+    qty_subnets = (qty_printers + BENCHMARK_SUBNET_SIZE - 1) // BENCHMARK_SUBNET_SIZE
+    subnets = Subnet.objects.bulk_create([
+        Subnet(name=BENCHMARK_AREAS[i % len(BENCHMARK_AREAS)], address=f'127.0.{i + 1}.0', mask=24)
+        for i in range(qty_subnets)
+    ])
+    ip_addresses = IPAddress.objects.bulk_create([
+        IPAddress(address=get_benchmark_address(i)[1], subnet=subnets[i // BENCHMARK_SUBNET_SIZE])
+        for i in range(qty_printers)
+    ])
+
+    departments = Department.objects.bulk_create([Department(name=f'Отдел {i + 1}') for i in range(10)])
+    cabinets = Cabinet.objects.bulk_create([Cabinet(number=str(100 + i)) for i in range(50)])
+    locations = Location.objects.bulk_create([Location(department=departments[i % len(departments)], cabinet=cabinet)
+                                              for i, cabinet in enumerate(cabinets)])
+
+    printer_models, supplies = list(), list()
+    for stamp_name, model_name in BENCHMARK_PRINTER_MODELS:
+        stamp = PrinterStamp.objects.create(name=stamp_name)
+        printer_models.append(PrinterModel.objects.create(stamp=stamp, name=model_name))
+        supplies.append(SupplyItem.objects.create(name=f'{stamp_name[:3].upper()}-{model_name[:10]}', price=3000))
+
+    model_indexes = rng.integers(0, len(printer_models), qty_printers)
+    printers = Printer.objects.bulk_create([
+        Printer(ip_address=ip_addresses[i], model=printer_models[model_indexes[i]], serial_number=f'BENCH{i:08d}',
+                location=locations[i % len(locations)], date_of_commission=first_day, is_active=True)
+        for i in range(qty_printers)
+    ])
+    consumption = rng.integers(3000, 12000, qty_printers)
+    PrinterSupplyStatus.objects.bulk_create([
+        PrinterSupplyStatus(printer=printer, supply=supplies[model_indexes[i]],
+                            remaining_supply_percentage=int(rng.integers(0, 101)), consumption=int(consumption[i]))
+        for i, printer in enumerate(printers)
+    ])
+
+    daily_pages = rng.poisson(rng.uniform(0, 300, (qty_printers, 1)), (qty_printers, qty_days))
+    daily_pages[:, [day for day in range(qty_days) if (first_day + timedelta(days=day + 1)).weekday() >= 5]] = 0
+    daily_prints = (daily_pages * rng.uniform(0.5, 0.9, (qty_printers, 1))).astype(int)
+    daily_copies = ((daily_pages - daily_prints) * 0.7).astype(int)
+    daily_scans = daily_pages - daily_prints - daily_copies
+    start_counters = rng.integers(1000, 200000, qty_printers)
+    pages_total = start_counters[:, None] + np.cumsum(daily_pages, axis=1)
+    prints_total = start_counters[:, None] // 2 + np.cumsum(daily_prints, axis=1)
+    copies_total = start_counters[:, None] // 4 + np.cumsum(daily_copies, axis=1)
+    scans_total = pages_total - prints_total - copies_total
+    collect_times = [timezone.make_aware(datetime.combine(first_day + timedelta(days=day + 1), datetime.min.time()) +
+                                         timedelta(hours=10)) for day in range(qty_days)]
+
+    qty_statistics = bulk_create_in_batches(Statistics, (
+        Statistics(printer_id=printer.id, page=int(pages_total[i, day]), print=int(prints_total[i, day]),
+                   copies=int(copies_total[i, day]), scan=int(scans_total[i, day]), time_collect=collect_times[day])
+        for i, printer in enumerate(printers) for day in range(qty_days)
+    ))
+    qty_daily_stats = bulk_create_in_batches(DailyStat, (
+        DailyStat(printer_id=printer.id, page=int(daily_pages[i, day]), print=int(daily_prints[i, day]),
+                  copies=int(daily_copies[i, day]), scan=int(daily_scans[i, day]), time_collect=collect_times[day])
+        for i, printer in enumerate(printers) for day in range(qty_days)
+    ))
+
+    months = dict()
+    for day, collect_time in enumerate(collect_times):
+        months.setdefault((collect_time.year, collect_time.month), list()).append(day)
+    qty_monthly_stats = bulk_create_in_batches(MonthlyStat, (
+        MonthlyStat(printer_id=printer.id, page=int(daily_pages[i, days].sum()),
+                    print=int(daily_prints[i, days].sum()), copies=int(daily_copies[i, days].sum()),
+                    scan=int(daily_scans[i, days].sum()),
+                    time_collect=collect_times[days[-1]])
+        for i, printer in enumerate(printers) for days in months.values()
+    ))
+
+    def generate_changes():
+        for i, printer in enumerate(printers):
+            change_days = np.searchsorted(np.cumsum(daily_pages[i]), np.arange(consumption[i], pages_total[i, -1] -
+                                                                               start_counters[i], consumption[i]))
+            for day in change_days[change_days < qty_days]:
+                yield ChangeSupply(printer_id=printer.id, supply_id=supplies[model_indexes[i]].id,
+                                   time_change=collect_times[day])
+
+    qty_changes = bulk_create_in_batches(ChangeSupply, generate_changes())
+    error_printers, error_days = np.nonzero(rng.random((qty_printers, qty_days)) < 0.02)
+    qty_errors = bulk_create_in_batches(PrinterError, (
+        PrinterError(printer_id=printers[i].id, event_date=collect_times[day], description='Замятие бумаги')
+        for i, day in zip(error_printers, error_days)
+    ))
+
+    rebuild_daily_rollups(first_day, today)
+    refresh_subnet_stats()
+
+    return {
+        'printers': qty_printers,
+        'days': qty_days,
+        'statistics': qty_statistics,
+        'daily_stats': qty_daily_stats,
+        'monthly_stats': qty_monthly_stats,
+        'changes_supplies': qty_changes,
+        'printer_errors': qty_errors,
+    }
+
+
+def get_simulated_devices(printers) -> tuple:
+    from monitoring.models import Statistics
+
+    last_stats = {stat.printer_id: stat for stat in Statistics.objects.filter(printer__in=printers).order_by(
+        'printer_id', '-time_collect').distinct('printer_id')}
+    snmp_devices, pantum_devices = dict(), dict()
+    for printer in printers:
+        stamp = printer.model.stamp.name.lower()
+        if stamp not in device_snmp_map:
+            stamp = 'katusha'
+        stat = last_stats.get(printer.id)
+        print_value, copies_value = (stat.print, stat.copies) if stat else (0, 0)
+        scan_value = (stat.scan if stat else 0) + 10
+        counters = {'print': print_value + 10, 'copies': copies_value + 5, 'copies_small': copies_value + 5,
+                    'copies_big': 0, 'scan': scan_value, 'scan-fs': 0, 'scan_apd': scan_value, 'scan_tablet': 0,
+                    'print_copies': print_value + copies_value + 15}
+        address = str(printer.ip_address.address)
+        snmp_devices[address] = get_device_oid_values(stamp, printer.model.name, printer.serial_number, counters)
+        if stamp == 'pantum':
+            pantum_devices[address] = (print_value + copies_value + scan_value + 15, copies_value + 5)
+    return snmp_devices, pantum_devices
+
+
+def get_percentiles_ms(timings: list) -> dict:
+    p50, p95 = np.percentile(timings, [50, 95])
+    return {'p50_ms': round(float(p50) * 1000, 2), 'p95_ms': round(float(p95) * 1000, 2),
+            'max_ms': round(max(timings) * 1000, 2)}
+
+
+def measure_collector_throughput(stamp_names) -> dict:
+    from monitoring import tasks
+    from monitoring.models import TaskRun
+
+    results = dict()
+    for stamp_name in stamp_names:
+        task = getattr(tasks, COLLECTOR_TASKS[stamp_name])
+        task()
+        task_run = TaskRun.objects.filter(task_name=task.name).latest('id')
+        rtts = [rtt for _, rtt, _ in task_run.device_timings if rtt is not None]
+        results[stamp_name] = {
+            'devices': task_run.qty_attempted,
+            'succeeded': task_run.qty_succeeded,
+            'timed_out': task_run.qty_timed_out,
+            'failed': task_run.qty_failed,
+            'duration_s': round(task_run.duration, 3),
+            'devices_per_second': round(task_run.qty_attempted / task_run.duration, 2) if task_run.duration else None,
+            **(get_percentiles_ms(rtts) if rtts else {}),
+        }
+    return results
+
+
+def measure_request(client, method: str, path: str, data=None, repeat: int = 5, **kwargs) -> dict:
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    timings, status_codes, queries = list(), set(), 0
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            start_time = time.perf_counter()
+            response = getattr(client, method)(path, data, **kwargs)
+            if getattr(response, 'streaming', False):
+                b''.join(response.streaming_content)
+            timings.append(time.perf_counter() - start_time)
+        status_codes.add(response.status_code)
+        queries = len(context.captured_queries)
+    return {'status_codes': sorted(status_codes), 'queries': queries, **get_percentiles_ms(timings)}
+
+
+def measure_dashboard_and_reports(client, repeat: int = 5) -> dict:
+    from django.urls import reverse
+    from monitoring.models import Printer, DailyStat, MonthlyStat
+
+    printer = Printer.objects.order_by('id').first()
+    date_end = timezone.localtime(DailyStat.objects.latest('time_collect').time_collect).date()
+    date_start = max(date_end - timedelta(days=30),
+                     timezone.localtime(DailyStat.objects.earliest('time_collect').time_collect).date())
+    month_end = timezone.localtime(MonthlyStat.objects.latest('time_collect').time_collect).date()
+    month_start = max(month_end - timedelta(days=365),
+                      timezone.localtime(MonthlyStat.objects.earliest('time_collect').time_collect).date())
+    reports_url = reverse('monitoring:reports')
+
+    requests = {
+        'index': ('get', reverse('monitoring:index'), None),
+        'printer': ('get', reverse('monitoring:printer', args=[printer.id]), None),
+        'events': ('get', reverse('monitoring:events'), None),
+        'forecast': ('get', reverse('monitoring:forecast'), None),
+        'data_in_js:year-print-stats': ('get', reverse('monitoring:data_in_js', args=['year-print-stats']), None),
+        'data_in_js:week-stats': ('get', reverse('monitoring:data_in_js', args=['week-stats']), None),
+        'report:printers': ('post', reports_url, {'area': 'all', 'printers_report': True}),
+        'report:statistics': ('post', reports_url, {'area': 'all', 'option': 'all', 'date_field': date_end,
+                                                    'statistics_report': True}),
+        'report:days': ('post', reports_url, {'area': 'all', 'option': 'page', 'date_start': date_start,
+                                              'date_end': date_end, 'days_report': True}),
+        'report:months': ('post', reports_url, {'area': 'all', 'option': 'page',
+                                                'date_start': month_start.strftime('%Y-%m'),
+                                                'date_end': month_end.strftime('%Y-%m'), 'months_report': True}),
+        'report:days-area': ('post', reports_url, {'area': BENCHMARK_AREAS[0], 'option': 'page',
+                                                   'date_start': date_start, 'date_end': date_end,
+                                                   'days_report': True}),
+    }
+    return {name: measure_request(client, method, path, data, repeat) for name, (method, path, data) in
+            requests.items()}
+
+
+def measure_export(client, qty_rows: int, repeat: int = 3) -> dict:
+    from django.urls import reverse
+
+    rows = ''.join(f'<tr><td>{i}</td><td>Принтер {i}</td><td>{i * 10}</td></tr>' for i in range(qty_rows))
+    table = f'<table><thead><tr><th>№</th><th>Принтер</th><th>Страниц</th></tr></thead><tbody>{rows}</tbody></table>'
+    body = json.dumps({'table': table, 'part': 0, 'totalParts': 1})
+    return measure_request(client, 'post', reverse('monitoring:export_report'), body, repeat,
+                           content_type='application/json')
+
+
+def compare_with_baseline(results: dict, baseline: dict, tolerance: float = 0.2) -> list:
+    regressions = list()
+    for section, items in results.items():
+        for name, values in items.items():
+            baseline_values = baseline.get(section, {}).get(name)
+            if not isinstance(values, dict) or not isinstance(baseline_values, dict):
+                continue
+            for key in ('p50_ms', 'p95_ms', 'duration_s', 'queries'):
+                current, previous = values.get(key), baseline_values.get(key)
+                if current is None or not previous:
+                    continue
+                ratio = current / previous
+                if ratio > 1 + tolerance:
+                    regressions.append({'section': section, 'name': name, 'metric': key, 'baseline': previous,
+                                        'current': current, 'ratio': round(ratio, 2)})
+    return regressions
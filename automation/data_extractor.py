@@ -13,13 +13,19 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as ec
 from functools import wraps
+from automation.supply_stock import record_supply_stock_movements
+from automation.rollups import add_daily_stats_to_rollups
 from automation.snmp_oid_map import (device_snmp_map, printer_stamp_snmp_set, printer_supplies_dict,
                                      printer_errors_snmp_dict)
 from datetime import timedelta
+from collections import defaultdict
+from django.db import transaction
 
 
 logger_main = logging.getLogger('automation')
 
+CONSUMPTION_EWMA_ALPHA = 0.3
+
 
 def scan_subnet(subnet) -> list:
     command = f"nmap -p 515,9100 {subnet} | grep 'report\|open'"
@@ -211,96 +217,165 @@ def add_supply_in_printer(printer, supply, remaining_supply_percentage, qty_page
 
 
 def update_printer_resource(printer_id):
-    from monitoring.models import Printer
+    update_printers_resources([printer_id])
 
-    printer = Printer.objects.get(pk=printer_id)
-    if printer.is_active:
-        stamp = get_printer_stamp(printer)
-
-        if stamp:
-            try:
-                with Engine(SNMPv2c, defaultCommunity=b"public") as engine:
-                    ip_printer = engine.Manager(str(printer.ip_address.address))
-                    for nm_supply_oid in printer_supplies_dict['supply']:
-                        nm_res_supply_oid = 'resource_' + nm_supply_oid
-                        if nm_res_supply_oid in device_snmp_map[stamp]:
-                            extracted_value = fetch_snmp_data_to_int(ip_printer, stamp, nm_res_supply_oid)
-                            if extracted_value:
-                                printer_supply_status = get_printer_supply_status(printer, nm_supply_oid)
-                                update_printer_supply_status(printer_supply_status, extracted_value)
-
-                    printer.save()
-            except Exception as e:
-                logger_main.error(
-                    f"{printer}: {e} - Error in launching the SNMP engine in the update_printer_resource function")
-
-
-def get_printer_supply_status(printer, nm_supply_oid: str):
-    from monitoring.models import PrinterSupplyStatus
 
-    color_supply, type_supply = split_nm_supply(nm_supply_oid)
+def update_printers_resources(printer_ids, telemetry=None):
+    from monitoring.models import Printer
 
-    query = PrinterSupplyStatus.objects.filter(
-        printer=printer,
-        supply__type=type_supply,
-        supply__color=color_supply
-    ).first()
+    printers = Printer.objects.select_related('ip_address', 'model__stamp').filter(pk__in=printer_ids, is_active=True)
+    supply_status_index = get_printer_supply_status_index(printer_ids)
 
-    return query
+    readings = list()
+    for printer in printers:
+        if telemetry is None:
+            readings += fetch_printer_resource(printer, supply_status_index)
+        else:
+            readings += telemetry.poll(printer.id, read_printer_resource, printer, supply_status_index) or []
 
+    apply_printer_supply_readings(readings)
 
-def update_printer_supply_status(printer_supply_status, new_remaining_supply_percentage):
-    current_value = printer_supply_status.remaining_supply_percentage
-    new_consumption = None
 
-    if current_value != new_remaining_supply_percentage:
-        if current_value < new_remaining_supply_percentage:
-            supply = printer_supply_status.supply
-            printer = printer_supply_status.printer
-            average_printer_supply_consumption = printer_supply_status.consumption
+def fetch_printer_resource(printer, supply_status_index: dict) -> list:
+    try:
+        return read_printer_resource(printer, supply_status_index)
+    except Exception as e:
+        logger_main.error(
+            f"{printer}: {e} - Error in launching the SNMP engine in the update_printer_resource function")
+        return []
 
-            update_qty_supply(supply)
-            create_change_supply(printer, supply)
-            new_consumption = calculate_average_printer_supply_consumption(printer, supply,
-                                                                           average_printer_supply_consumption)
 
-    printer_supply_status.remaining_supply_percentage = new_remaining_supply_percentage
-    if new_consumption:
-        printer_supply_status.consumption = new_consumption
-    printer_supply_status.save()
+def read_printer_resource(printer, supply_status_index: dict) -> list:
+    readings = list()
+    stamp = get_printer_stamp(printer)
 
+    if stamp:
+        with Engine(SNMPv2c, defaultCommunity=b"public") as engine:
+            ip_printer = engine.Manager(str(printer.ip_address.address))
+            for nm_supply_oid in printer_supplies_dict['supply']:
+                nm_res_supply_oid = 'resource_' + nm_supply_oid
+                if nm_res_supply_oid in device_snmp_map[stamp]:
+                    extracted_value = fetch_snmp_data_to_int(ip_printer, stamp, nm_res_supply_oid)
+                    if extracted_value:
+                        color_supply, type_supply = split_nm_supply(nm_supply_oid)
+                        printer_supply_status = supply_status_index.get((printer.id, color_supply, type_supply))
+                        if printer_supply_status:
+                            readings.append((printer_supply_status, extracted_value))
 
-def update_qty_supply(supply):
-    from monitoring.models import SupplyDetails
+    return readings
 
-    supply_details = SupplyDetails.objects.get(supply=supply)
-    supply_details.qty -= 1
-    supply_details.save()
 
+def get_printer_supply_status_index(printer_ids) -> dict:
+    from monitoring.models import PrinterSupplyStatus
 
-def create_change_supply(printer, supply):
-    from monitoring.models import ChangeSupply
+    supply_statuses = PrinterSupplyStatus.objects.select_related('printer', 'supply').filter(
+        printer_id__in=printer_ids).order_by('id')
 
-    new_change_supply = ChangeSupply(
-        printer=printer,
-        supply=supply,
-    )
-    new_change_supply.save()
+    supply_status_index = dict()
+    for supply_status in supply_statuses:
+        key = (supply_status.printer_id, supply_status.supply.color, supply_status.supply.type)
+        supply_status_index.setdefault(key, supply_status)
 
+    return supply_status_index
 
-def calculate_average_printer_supply_consumption(printer, supply, average_printer_supply_consumption):
-    from monitoring.models import ChangeSupply, ForecastStat
 
-    last_two_change_supplies = ChangeSupply.objects.filter(printer=printer, supply=supply).order_by('-id')[:2]
-    if len(last_two_change_supplies) == 2:
-        current_stat = ForecastStat.objects.filter(printer=printer).last()
+def apply_printer_supply_readings(readings: list, reading_times: dict = None):
+    from monitoring.models import PrinterSupplyStatus
+    from monitoring.signals import notify_low_supply
+
+    time_now = timezone.now()
+    updated_statuses = list()
+    changed_statuses = list()
+    replaced_statuses = list()
+    for printer_supply_status, new_remaining_supply_percentage in readings:
+        time_collect = (reading_times or {}).get(printer_supply_status.printer_id, time_now)
+        if printer_supply_status.time_update and time_collect < printer_supply_status.time_update:
+            continue
+        printer_supply_status.time_update = time_collect
+        updated_statuses.append(printer_supply_status)
+
+        current_value = printer_supply_status.remaining_supply_percentage
+        if current_value == new_remaining_supply_percentage:
+            continue
+        if current_value is not None and current_value < new_remaining_supply_percentage:
+            replaced_statuses.append(printer_supply_status)
+        printer_supply_status.remaining_supply_percentage = new_remaining_supply_percentage
+        changed_statuses.append(printer_supply_status)
+
+    if not updated_statuses:
+        return
 
-        recent_date = last_two_change_supplies[1].time_change.date()
-        recent_stat = ForecastStat.objects.get(printer=printer, time_collect=recent_date)
+    with transaction.atomic():
+        if replaced_statuses:
+            process_supply_replacements(replaced_statuses)
+        PrinterSupplyStatus.objects.bulk_update(updated_statuses,
+                                                ['remaining_supply_percentage', 'consumption', 'time_update'])
+
+    for printer_supply_status in changed_statuses:
+        if printer_supply_status.remaining_supply_percentage == 1:
+            notify_low_supply(printer_supply_status)
+
+
+def process_supply_replacements(replaced_statuses: list):
+    from monitoring.models import ChangeSupply, ForecastStat, SupplyConsumptionStat
+
+    printer_ids = {status.printer_id for status in replaced_statuses}
+    supply_ids = {status.supply_id for status in replaced_statuses}
+
+    consumption_stats = {(stat.printer_id, stat.supply_id): stat for stat in SupplyConsumptionStat.objects.filter(
+        printer_id__in=printer_ids, supply_id__in=supply_ids)}
+    current_counters = {stat.printer_id: stat.copies_printing for stat in ForecastStat.objects.filter(
+        printer_id__in=printer_ids).order_by('printer_id', '-time_collect', '-id').distinct('printer_id')}
+
+    qty_replacements = defaultdict(int)
+    new_changes_supplies = list()
+    new_consumption_stats = list()
+    for printer_supply_status in replaced_statuses:
+        time_change = printer_supply_status.time_update or timezone.now()
+        qty_replacements[printer_supply_status.supply_id] += 1
+        new_changes_supplies.append(ChangeSupply(printer_id=printer_supply_status.printer_id,
+                                                 supply_id=printer_supply_status.supply_id, time_change=time_change))
+
+        key = (printer_supply_status.printer_id, printer_supply_status.supply_id)
+        consumption_stat = consumption_stats.get(key)
+        if consumption_stat is None:
+            consumption_stat = SupplyConsumptionStat(printer_id=key[0], supply_id=key[1],
+                                                     ewma=printer_supply_status.consumption)
+            consumption_stats[key] = consumption_stat
+            new_consumption_stats.append(consumption_stat)
+
+        update_consumption_estimate(consumption_stat, current_counters.get(printer_supply_status.printer_id),
+                                    time_change)
+        if consumption_stat.ewma is not None:
+            printer_supply_status.consumption = round(consumption_stat.ewma)
+
+    existing_consumption_stats = [stat for stat in consumption_stats.values() if stat.pk is not None]
+
+    record_supply_stock_movements({supply_id: -qty for supply_id, qty in qty_replacements.items()}, 'replacement')
+    ChangeSupply.objects.bulk_create(new_changes_supplies)
+    SupplyConsumptionStat.objects.bulk_create(new_consumption_stats)
+    SupplyConsumptionStat.objects.bulk_update(existing_consumption_stats,
+                                              ['qty_changes', 'ewma', 'variance', 'last_counter', 'time_change'])
+
+
+def update_consumption_estimate(consumption_stat, counter, time_change):
+    if counter is not None and consumption_stat.last_counter is not None and counter > consumption_stat.last_counter:
+        consumption = counter - consumption_stat.last_counter
+        consumption_stat.qty_changes += 1
+        if consumption_stat.ewma is None:
+            consumption_stat.ewma = float(consumption)
+            consumption_stat.variance = 0.0
+        else:
+            diff = consumption - consumption_stat.ewma
+            increment = CONSUMPTION_EWMA_ALPHA * diff
+            consumption_stat.ewma += increment
+            consumption_stat.variance = (1 - CONSUMPTION_EWMA_ALPHA) * (consumption_stat.variance + diff * increment)
 
-        current_consumption = current_stat.copies_printing - recent_stat.copies_printing
+    if counter is not None:
+        consumption_stat.last_counter = counter
+    consumption_stat.time_change = time_change
 
-        return (average_printer_supply_consumption + current_consumption) // 2
+    return consumption_stat
 
 
 def save_printer_stats_to_database(printer, page_value: int, print_value: int, copies_value: int, scan_value: int):
@@ -373,14 +448,16 @@ def save_printer_stats_to_database(printer, page_value: int, print_value: int, c
         )
         new_monthly_stat.save()
 
+    add_daily_stats_to_rollups([new_daily_stat])
+
 
 def parsing_snmp(func):
     @wraps(func)
     def wrapper(printer, *args, **kwargs):
         from monitoring.models import Statistics
-        today = timezone.now().date()
+        today = timezone.localdate()
         if printer.is_active:
-            statistics_today = Statistics.objects.filter(printer=printer, time_collect__date=today)
+            statistics_today = Statistics.objects.filter(printer=printer, collect_date=today)
             if not statistics_today.exists():
                 page_value, print_value, copies_value, scan_value = func(printer, *args, **kwargs)
                 printer_info_stats = {
@@ -484,74 +561,81 @@ def parsing_snmp_sindoh(printer):
         logger_main.error(f"{printer}: {e} - Error in launching the SNMP engine in the parsing_snmp_sindoh function")
 
 
-def parsing_pantum(printer):
-    from monitoring.models import Statistics
+def parsing_snmp_pantum(printer):
+    stamp = str(printer.model.stamp.name).lower()
+    try:
+        with Engine(SNMPv2c, defaultCommunity=b"public") as engine:
+            ip_printer = engine.Manager(str(printer.ip_address.address))
+            print_val = fetch_snmp_data_to_int(ip_printer, stamp, 'print')
+            return print_val
+    except Exception as e:
+        logger_main.error(f"{printer}: {e} - Error in launching the SNMP engine in the parsing_snmp_pantum "
+                          f"function")
 
-    def parsing_snmp_pantum(printer_pantum):
-        stamp = str(printer.model.stamp.name).lower()
-        try:
-            with Engine(SNMPv2c, defaultCommunity=b"public") as engine:
-                ip_printer = engine.Manager(str(printer_pantum.ip_address.address))
-                print_val = fetch_snmp_data_to_int(ip_printer, stamp, 'print')
-                return print_val
-        except Exception as e:
-            logger_main.error(f"{printer}: {e} - Error in launching the SNMP engine in the parsing_snmp_pantum "
-                              f"function")
 
-    def web_scraping_pantum(ip_address: str) -> tuple:
-        options = Options()
-        options.add_argument("--headless")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
+def web_scraping_pantum(ip_address: str) -> tuple:
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
 
-        driver = webdriver.Chrome(options=options)
+    driver = webdriver.Chrome(options=options)
 
-        try:
-            driver.get(f"http://{ip_address}/index.html")
-            wait = WebDriverWait(driver, 60)
-            element_device = wait.until(ec.presence_of_element_located((By.XPATH, '//*[@id="DEVICE"]')))
-            element_device.click()
-            time.sleep(5)
-            value = wait.until(ec.visibility_of_element_located((By.XPATH, '//*[@id="form_main"]/div[1]/div[2]')))
-            text_value = value.text
-            page_val = int(text_value)
-            time.sleep(5)
-            element_copy = wait.until(ec.presence_of_element_located((By.XPATH, '//*[@id="COPYINFO"]')))
-            element_copy.click()
-            time.sleep(5)
-            value = wait.until(ec.visibility_of_element_located((By.XPATH, '//*[@id="form_main"]/div[1]/div[2]')))
-            text_value = value.text
-            copies_val = int(text_value)
-
-            return page_val, copies_val
-        except selenium.common.exceptions.WebDriverException as e:
-            if "ERR_CONNECTION_TIMED_OUT" in e.msg:
-                logger_main.error(f"{printer}: Connection timed out - Error in launching the Selenium driver in the "
-                                  f"web_scraping_pantum function")
-            else:
-                logger_main.error(f"{printer}: {e.msg} - Error in launching the Selenium driver in the "
-                                  f"web_scraping_pantum function")
+    try:
+        driver.get(f"http://{ip_address}/index.html")
+        wait = WebDriverWait(driver, 60)
+        element_device = wait.until(ec.presence_of_element_located((By.XPATH, '//*[@id="DEVICE"]')))
+        element_device.click()
+        time.sleep(5)
+        value = wait.until(ec.visibility_of_element_located((By.XPATH, '//*[@id="form_main"]/div[1]/div[2]')))
+        text_value = value.text
+        page_val = int(text_value)
+        time.sleep(5)
+        element_copy = wait.until(ec.presence_of_element_located((By.XPATH, '//*[@id="COPYINFO"]')))
+        element_copy.click()
+        time.sleep(5)
+        value = wait.until(ec.visibility_of_element_located((By.XPATH, '//*[@id="form_main"]/div[1]/div[2]')))
+        text_value = value.text
+        copies_val = int(text_value)
+
+        return page_val, copies_val
+    except selenium.common.exceptions.WebDriverException as e:
+        if "ERR_CONNECTION_TIMED_OUT" in e.msg:
+            logger_main.error(f"{ip_address}: Connection timed out - Error in launching the Selenium driver in the "
+                              f"web_scraping_pantum function")
+        else:
+            logger_main.error(f"{ip_address}: {e.msg} - Error in launching the Selenium driver in the "
+                              f"web_scraping_pantum function")
 
-        driver.quit()
+    driver.quit()
+
+
+def fetch_pantum_counters(printer) -> tuple:
+    print_value = parsing_snmp_pantum(printer)
+    page_value, copies_value = web_scraping_pantum(str(printer.ip_address.address))
+
+    if page_value is None:
+        raise ValueError(f"page_value cannot be None")
+    if print_value is None:
+        raise ValueError(f"print_value cannot be None")
+    if copies_value is None:
+        raise ValueError(f"copies_value cannot be None")
+
+    scan_value = page_value - print_value - copies_value
+    return page_value, print_value, copies_value, scan_value
+
+
+def parsing_pantum(printer):
+    from monitoring.models import Statistics
 
     try:
         if printer.is_active:
-            today = timezone.now().date()
-            statistics_today = Statistics.objects.filter(printer=printer, time_collect__date=today)
+            today = timezone.localdate()
+            statistics_today = Statistics.objects.filter(printer=printer, collect_date=today)
             if statistics_today.exists():
                 pass
             else:
-                print_value = parsing_snmp_pantum(printer)
-                page_value, copies_value = web_scraping_pantum(str(printer.ip_address.address))
-
-                if page_value is None:
-                    raise ValueError(f"page_value cannot be None")
-                if print_value is None:
-                    raise ValueError(f"print_value cannot be None")
-                if copies_value is None:
-                    raise ValueError(f"copies_value cannot be None")
-
-                scan_value = page_value - print_value - copies_value
+                page_value, print_value, copies_value, scan_value = fetch_pantum_counters(printer)
 
                 printer_info_stats = {
                     'printer': printer,
@@ -561,6 +645,7 @@ def parsing_pantum(printer):
                     'scan_value': scan_value,
                 }
                 save_printer_stats_to_database(**printer_info_stats)
+                return page_value, print_value, copies_value, scan_value
 
     except ValueError as e:
         logger_main.error(f"{printer}: {e} - Error in the parsing_pantum function")
@@ -569,11 +654,11 @@ def parsing_pantum(printer):
 def add_missing_statistics_to_db(printer):
     from monitoring.models import Statistics
 
-    today = timezone.now().date()
-    statistics_today = Statistics.objects.filter(printer=printer, time_collect__date=today)
+    today = timezone.localdate()
+    statistics_today = Statistics.objects.filter(printer=printer, collect_date=today)
     if not statistics_today.exists():
         yesterday = today - timedelta(days=1)
-        statistics_yesterday = Statistics.objects.filter(printer=printer, time_collect__date=yesterday)
+        statistics_yesterday = Statistics.objects.filter(printer=printer, collect_date=yesterday)
         if statistics_yesterday.exists():
             yesterday_stat = statistics_yesterday.first()
             page_val = yesterday_stat.page
@@ -589,36 +674,37 @@ def detect_device_errors(printer_id):
     printer = Printer.objects.get(pk=printer_id)
 
     if printer.is_active:
-        try:
-            with Engine(SNMPv2c, defaultCommunity=b"public") as engine:
-                ip_printer = engine.Manager(str(printer.ip_address.address))
-                response = str(
-                    ip_printer.get(printer_errors_snmp_dict['hrDeviceStatus'],
-                                   wait=True, timeout=15.0, refreshPeriod=1.0))
-                match = re.search(r'\((\d+)\)', response)
-                if match:
-                    device_status = int(match.group(1))
-                    if device_status == 5:
-                        response = str(
-                            ip_printer.get(printer_errors_snmp_dict['hrPrinterDetectedErrorState'],
-                                           wait=True, timeout=15.0, refreshPeriod=1.0))
-                        match = re.search(r"'(.*?)'", response)
-                        if match:
-                            error = match.group(1)
-                            if error != '\\x00':
-                                new_error = PrinterError(
-                                    printer=printer,
-                                    description=error,
-                                )
-                                new_error.save()
-                        else:
-                            new_error = PrinterError(
-                                printer=printer,
-                                description=f'Unknown error - {response}',
-                            )
-                            new_error.save()
+        error = fetch_device_error(printer)
+        if error:
+            new_error = PrinterError(
+                printer=printer,
+                description=error,
+            )
+            new_error.save()
 
-        except Exception as e:
-            logger_main.error(f"{printer}: {e} - Error in launching the SNMP engine in the detect_device_errors "
-                              f"function")
 
+def fetch_device_error(printer):
+    try:
+        with Engine(SNMPv2c, defaultCommunity=b"public") as engine:
+            ip_printer = engine.Manager(str(printer.ip_address.address))
+            response = str(
+                ip_printer.get(printer_errors_snmp_dict['hrDeviceStatus'],
+                               wait=True, timeout=15.0, refreshPeriod=1.0))
+            match = re.search(r'\((\d+)\)', response)
+            if match:
+                device_status = int(match.group(1))
+                if device_status == 5:
+                    response = str(
+                        ip_printer.get(printer_errors_snmp_dict['hrPrinterDetectedErrorState'],
+                                       wait=True, timeout=15.0, refreshPeriod=1.0))
+                    match = re.search(r"'(.*?)'", response)
+                    if match:
+                        error = match.group(1)
+                        if error != '\\x00':
+                            return error
+                    else:
+                        return f'Unknown error - {response}'
+
+    except Exception as e:
+        logger_main.error(f"{printer}: {e} - Error in launching the SNMP engine in the detect_device_errors "
+                          f"function")
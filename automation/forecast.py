@@ -0,0 +1,145 @@
+import logging
+import time
+import numpy as np
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+logger_main = logging.getLogger('automation')
+
+FORECAST_HISTORY_DAYS = 730
+WEEKDAY_PROFILE_HALF_LIFE_WEEKS = 8
+FORECAST_BATCH_SIZE = 1000
+
+
+def get_next_month_range(today):
+    forecast_start = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+    forecast_end = (forecast_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return forecast_start, forecast_end
+
+
+def load_daily_printed_history(printer_ids: list, start_date, end_date) -> np.ndarray:
+    from monitoring.models import DailyStat
+
+    history = np.zeros((len(printer_ids), (end_date - start_date).days + 1))
+    observed = np.zeros(history.shape, dtype=bool)
+    printer_index = {printer_id: row for row, printer_id in enumerate(printer_ids)}
+
+    rows = list(DailyStat.objects.filter(printer_id__in=printer_ids, collect_date__range=(start_date, end_date))
+                .annotate(printed=F('print') + Coalesce('copies', 0))
+                .values_list('printer_id', 'collect_date', 'printed'))
+    if rows:
+        printer_col, day_col, printed_col = zip(*rows)
+        row_index = np.array([printer_index[printer_id] for printer_id in printer_col])
+        day_index = np.array([(day - start_date).days for day in day_col])
+        np.add.at(history, (row_index, day_index), np.array(printed_col, dtype=float))
+        observed[row_index, day_index] = True
+
+    history[~observed | (history < 0)] = np.nan
+    return history
+
+
+def fit_weekday_profile(history: np.ndarray, start_date,
+                        half_life_weeks: float = WEEKDAY_PROFILE_HALF_LIFE_WEEKS) -> np.ndarray:
+    days = history.shape[1]
+    weekdays = (start_date.weekday() + np.arange(days)) % 7
+    weights = 0.5 ** ((days - 1 - np.arange(days)) / 7 / half_life_weeks)
+
+    observed = ~np.isnan(history)
+    weighted_pages = np.where(observed, history, 0) * weights
+    observed_weights = observed * weights
+
+    profile = np.zeros((history.shape[0], 7))
+    for weekday in range(7):
+        columns = weekdays == weekday
+        total_weight = observed_weights[:, columns].sum(axis=1)
+        np.divide(weighted_pages[:, columns].sum(axis=1), total_weight, out=profile[:, weekday],
+                  where=total_weight > 0)
+    return profile
+
+
+def forecast_daily_pages(profile: np.ndarray, start_date, days: int) -> np.ndarray:
+    weekdays = (start_date.weekday() + np.arange(days)) % 7
+    return np.rint(profile[:, weekdays]).astype(int)
+
+
+def predict_supply_change_days(cumulative_pages: np.ndarray, pages_left: float, consumption: int) -> np.ndarray:
+    if consumption <= 0 or not len(cumulative_pages):
+        return np.array([], dtype=int)
+
+    thresholds = np.arange(max(pages_left, 0), cumulative_pages[-1] + 1, consumption)
+    return np.searchsorted(cumulative_pages, thresholds, side='left')
+
+
+def calculate_forecast(today=None):
+    from monitoring.models import (Printer, PrinterSupplyStatus, ForecastStat, Forecast, ForecastChangeSupplies,
+                                   MaintenanceCosts)
+
+    start_time = time.monotonic()
+    today = today or timezone.localdate()
+    forecast_start, forecast_end = get_next_month_range(today)
+    horizon_start = today + timedelta(days=1)
+    horizon_days = (forecast_end - horizon_start).days + 1
+    month_offset = (forecast_start - horizon_start).days
+    history_start = today - timedelta(days=FORECAST_HISTORY_DAYS - 1)
+
+    printer_ids = list(Printer.objects.filter(is_archived=False).order_by('id').values_list('id', flat=True))
+    if not printer_ids:
+        return
+
+    history = load_daily_printed_history(printer_ids, history_start, today)
+    profile = fit_weekday_profile(history, history_start)
+    daily_pages = forecast_daily_pages(profile, horizon_start, horizon_days)
+    cumulative_pages = np.cumsum(daily_pages, axis=1)
+
+    current_counters = {stat.printer_id: stat.copies_printing for stat in ForecastStat.objects.filter(
+        printer_id__in=printer_ids).order_by('printer_id', '-time_collect', '-id').distinct('printer_id')}
+
+    new_forecasts = []
+    for row, printer_id in enumerate(printer_ids):
+        current_counter = current_counters.get(printer_id, 0)
+        for day in range(month_offset, horizon_days):
+            new_forecasts.append(Forecast(
+                printer_id=printer_id,
+                qty_pages=current_counter + int(cumulative_pages[row, day]),
+                daily_pages=int(daily_pages[row, day]),
+                forecast_date=horizon_start + timedelta(days=day),
+            ))
+
+    printer_index = {printer_id: row for row, printer_id in enumerate(printer_ids)}
+    supplies_costs = np.zeros(len(printer_ids))
+    new_change_supplies = []
+    supply_statuses = PrinterSupplyStatus.objects.filter(
+        printer_id__in=printer_ids, consumption__gt=0, remaining_supply_percentage__isnull=False).select_related(
+        'supply')
+    for status in supply_statuses:
+        row = printer_index[status.printer_id]
+        pages_left = status.consumption * status.remaining_supply_percentage / 100
+        for day in predict_supply_change_days(cumulative_pages[row], pages_left, status.consumption):
+            new_change_supplies.append(ForecastChangeSupplies(
+                printer_id=status.printer_id,
+                supply_id=status.supply_id,
+                forecast_date=horizon_start + timedelta(days=int(day)),
+            ))
+            if day >= month_offset:
+                supplies_costs[row] += float(status.supply.price)
+
+    paper_costs = daily_pages[:, month_offset:].sum(axis=1) * settings.PAPER_SHEET_PRICE
+    new_costs = [MaintenanceCosts(printer_id=printer_id, paper_cost=round(float(paper_costs[row]), 2),
+                                  supplies_cost=round(float(supplies_costs[row]), 2))
+                 for row, printer_id in enumerate(printer_ids)]
+
+    with transaction.atomic():
+        Forecast.objects.all().delete()
+        ForecastChangeSupplies.objects.all().delete()
+        MaintenanceCosts.objects.all().delete()
+        Forecast.objects.bulk_create(new_forecasts, batch_size=FORECAST_BATCH_SIZE)
+        ForecastChangeSupplies.objects.bulk_create(new_change_supplies, batch_size=FORECAST_BATCH_SIZE)
+        MaintenanceCosts.objects.bulk_create(new_costs, batch_size=FORECAST_BATCH_SIZE)
+
+    logger_main.info(f"Forecast for {len(printer_ids)} printers on {forecast_start:%m-%Y} has been calculated in "
+                     f"{time.monotonic() - start_time:.2f} s")
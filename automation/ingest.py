@@ -0,0 +1,249 @@
+import json
+import zlib
+import logging
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from automation.data_extractor import get_printer_supply_status_index, apply_printer_supply_readings
+from automation.rollups import add_daily_stats_to_rollups
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+logger_main = logging.getLogger('automation')
+
+MAX_INGEST_SIZE = 20 * 1024 * 1024
+INGEST_CONTENT_TYPES = ('application/x-ndjson', 'application/msgpack')
+COUNTER_FIELDS = ('page', 'print', 'copies', 'scan')
+
+
+def decompress_body(body: bytes, content_encoding: str) -> bytes:
+    if not content_encoding or content_encoding == 'identity':
+        return body
+    if content_encoding == 'gzip':
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif content_encoding == 'deflate':
+        decompressor = zlib.decompressobj()
+    else:
+        raise ValueError(f"Unsupported content encoding {content_encoding}")
+
+    try:
+        data = decompressor.decompress(body, MAX_INGEST_SIZE)
+    except zlib.error as e:
+        raise ValueError(f"Invalid compressed data: {e}")
+    if decompressor.unconsumed_tail:
+        raise ValueError(f"Batch is larger than {MAX_INGEST_SIZE} bytes")
+    return data
+
+
+def decode_readings(body: bytes, content_type: str, content_encoding: str = '') -> list:
+    data = decompress_body(body, content_encoding)
+
+    if content_type == 'application/x-ndjson':
+        raw_readings = []
+        for line_number, line in enumerate(data.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                raw_readings.append(json.loads(line))
+            except ValueError as e:
+                raise ValueError(f"Line {line_number}: {e}")
+    elif content_type == 'application/msgpack':
+        if msgpack is None:
+            raise ValueError('msgpack is not installed on the server')
+        unpacker = msgpack.Unpacker(raw=False, timestamp=3)
+        unpacker.feed(data)
+        try:
+            raw_readings = list(unpacker)
+        except (ValueError, msgpack.ExtraData) as e:
+            raise ValueError(f"Invalid msgpack data: {e}")
+    else:
+        raise ValueError(f"Unsupported content type {content_type}")
+
+    readings = []
+    for number, raw_reading in enumerate(raw_readings, start=1):
+        try:
+            readings.append(validate_reading(raw_reading))
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Reading {number}: {e}")
+    return readings
+
+
+def validate_reading(raw_reading) -> dict:
+    if not isinstance(raw_reading, dict):
+        raise ValueError('reading must be an object')
+
+    serial_number = raw_reading.get('serial_number')
+    if not isinstance(serial_number, str) or not serial_number:
+        raise ValueError('serial_number is required')
+
+    time_collect = raw_reading.get('time_collect')
+    if isinstance(time_collect, str):
+        time_collect = parse_datetime(time_collect)
+    if time_collect is None or not hasattr(time_collect, 'tzinfo'):
+        raise ValueError('time_collect must be an ISO 8601 datetime')
+    if timezone.is_naive(time_collect):
+        time_collect = timezone.make_aware(time_collect)
+
+    online = raw_reading.get('online', True)
+    if not isinstance(online, bool):
+        raise ValueError('online must be a boolean')
+
+    reading = {'serial_number': serial_number, 'time_collect': time_collect, 'online': online}
+    has_counters = raw_reading.get('page') is not None or raw_reading.get('print') is not None
+    for field in COUNTER_FIELDS:
+        value = raw_reading.get(field, 0 if field in ('copies', 'scan') else None)
+        if not has_counters:
+            value = None
+        elif not isinstance(value, int) or isinstance(value, bool) or value < 0:
+            raise ValueError(f"{field} must be a non-negative integer")
+        reading[field] = value
+
+    supplies = raw_reading.get('supplies') or []
+    if not isinstance(supplies, list):
+        raise ValueError('supplies must be a list')
+    reading['supplies'] = []
+    for supply in supplies:
+        if not isinstance(supply, dict):
+            raise ValueError('supply must be an object')
+        remaining = supply.get('remaining')
+        if not isinstance(remaining, int) or isinstance(remaining, bool) or not 0 <= remaining <= 100:
+            raise ValueError('supply remaining must be an integer percentage')
+        reading['supplies'].append({'color': str(supply.get('color', 'black')),
+                                    'type': str(supply.get('type', 'cartridge')),
+                                    'remaining': remaining})
+
+    errors = raw_reading.get('errors') or []
+    if not isinstance(errors, list):
+        raise ValueError('errors must be a list')
+    reading['errors'] = [str(error) for error in errors]
+
+    return reading
+
+
+def get_month(time_collect) -> tuple:
+    local_time = timezone.localtime(time_collect)
+    return local_time.year, local_time.month
+
+
+def save_readings_to_database(readings: list) -> dict:
+    from monitoring.models import Printer, Statistics, DailyStat, MonthlyStat, ForecastStat, PrinterError
+    from monitoring.signals import notify_printer_error
+
+    serial_numbers = {reading['serial_number'] for reading in readings}
+    printers = {printer.serial_number: printer for printer in
+                Printer.objects.filter(serial_number__in=serial_numbers, is_archived=False)}
+    result = {'accepted': 0, 'duplicates': 0, 'unknown': sorted(serial_numbers - set(printers))}
+
+    readings = sorted((reading for reading in readings if reading['serial_number'] in printers),
+                      key=lambda reading: (reading['serial_number'], reading['time_collect']))
+    if not readings:
+        return result
+    printer_ids = sorted({printer.id for printer in printers.values()})
+
+    with transaction.atomic():
+        list(Printer.objects.select_for_update().filter(id__in=printer_ids).order_by('id').values_list('id'))
+        last_stats = {stat.printer_id: stat for stat in Statistics.objects.filter(
+            printer_id__in=printer_ids).order_by('printer_id', '-time_collect', '-id').distinct('printer_id')}
+        last_monthly_stats = {stat.printer_id: stat for stat in MonthlyStat.objects.filter(
+            printer_id__in=printer_ids).order_by('printer_id', '-time_collect', '-id').distinct('printer_id')}
+
+        new_stats, new_forecast_stats, new_daily_stats, new_monthly_stats, new_errors = [], [], [], [], []
+        changed_monthly_stats = {}
+        latest_supplies = {}
+        latest_supply_times = {}
+        latest_activity = {}
+        for reading in readings:
+            printer = printers[reading['serial_number']]
+            time_collect = reading['time_collect']
+            latest_activity[printer.id] = reading['online']
+            if not reading['online']:
+                result['accepted'] += 1
+                continue
+            if reading['page'] is not None:
+                last_stat = last_stats.get(printer.id)
+                if last_stat and time_collect <= last_stat.time_collect:
+                    result['duplicates'] += 1
+                    continue
+
+                new_stat = Statistics(printer=printer, time_collect=time_collect,
+                                      **{field: reading[field] for field in COUNTER_FIELDS})
+                new_stats.append(new_stat)
+                local_time = timezone.localtime(time_collect)
+                new_forecast_stats.append(ForecastStat(printer=printer, time_collect=local_time.date(),
+                                                       copies_printing=reading['copies'] + reading['print']))
+
+                new_daily_stat = DailyStat(printer=printer, time_collect=time_collect, **{
+                    field: reading[field] - (getattr(last_stat, field) or 0) if last_stat else 0
+                    for field in COUNTER_FIELDS})
+                new_daily_stats.append(new_daily_stat)
+
+                monthly_stat = last_monthly_stats.get(printer.id)
+                if monthly_stat and last_stat and get_month(monthly_stat.time_collect) == get_month(local_time):
+                    for field in COUNTER_FIELDS:
+                        setattr(monthly_stat, field,
+                                (getattr(monthly_stat, field) or 0) + getattr(new_daily_stat, field))
+                    monthly_stat.time_collect = time_collect
+                    if monthly_stat.pk:
+                        changed_monthly_stats[monthly_stat.pk] = monthly_stat
+                else:
+                    monthly_stat = MonthlyStat(printer=printer, time_collect=time_collect,
+                                               **{field: getattr(new_daily_stat, field) for field in COUNTER_FIELDS})
+                    new_monthly_stats.append(monthly_stat)
+                    last_monthly_stats[printer.id] = monthly_stat
+                last_stats[printer.id] = new_stat
+
+            new_errors.extend(PrinterError(printer=printer, description=error, event_date=time_collect)
+                              for error in reading['errors'])
+            if reading['supplies']:
+                latest_supplies[printer.id] = reading['supplies']
+                latest_supply_times[printer.id] = time_collect
+            result['accepted'] += 1
+
+        Statistics.objects.bulk_create(new_stats, ignore_conflicts=True)
+        ForecastStat.objects.bulk_create(new_forecast_stats)
+        DailyStat.objects.bulk_create(new_daily_stats)
+        add_daily_stats_to_rollups(new_daily_stats)
+        MonthlyStat.objects.bulk_create(new_monthly_stats)
+        MonthlyStat.objects.bulk_update(changed_monthly_stats.values(), [*COUNTER_FIELDS, 'time_collect'])
+        existing_errors = set(PrinterError.objects.filter(
+            printer_id__in=printer_ids, event_date__in={error.event_date for error in new_errors}).values_list(
+            'printer_id', 'event_date', 'description'))
+        inserted_errors = PrinterError.objects.bulk_create(
+            [error for error in new_errors
+             if (error.printer_id, error.event_date, error.description) not in existing_errors])
+
+        update_printers_activity(printers.values(), latest_activity)
+
+        if latest_supplies:
+            supply_status_index = get_printer_supply_status_index(list(latest_supplies))
+            supply_readings = []
+            for printer_id, supplies in latest_supplies.items():
+                for supply in supplies:
+                    status = supply_status_index.get((printer_id, supply['color'], supply['type']))
+                    if status:
+                        supply_readings.append((status, supply['remaining']))
+            apply_printer_supply_readings(supply_readings, latest_supply_times)
+
+    for printer_error in inserted_errors:
+        notify_printer_error(printer_error)
+
+    logger_main.info(f"Ingested {result['accepted']} readings, skipped {result['duplicates']} duplicates")
+    return result
+
+
+def update_printers_activity(printers, latest_activity: dict):
+    from monitoring.models import Printer
+
+    for is_active in (True, False):
+        changed_printers = [printer for printer in printers
+                            if latest_activity.get(printer.id) is is_active and printer.is_active != is_active]
+        if not changed_printers:
+            continue
+        Printer.objects.filter(id__in=[printer.id for printer in changed_printers]).update(is_active=is_active)
+        for printer in changed_printers:
+            printer.is_active = is_active
+            logger_main.info(f"Printer {printer} activity has been changed to {is_active}")
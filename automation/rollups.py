@@ -0,0 +1,225 @@
+import logging
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import F, Sum, Count
+from django.utils import timezone
+from dateutil.relativedelta import relativedelta
+
+
+logger_main = logging.getLogger('automation')
+
+ROLLUP_FIELDS = ('page', 'print', 'copies', 'scan')
+
+
+def new_rollup_counters() -> dict:
+    return dict.fromkeys(ROLLUP_FIELDS, 0)
+
+
+def get_month_start(day):
+    return day.replace(day=1)
+
+
+def group_daily_stats(daily_stats, printer_subnets: dict) -> tuple:
+    fleet_counters = defaultdict(new_rollup_counters)
+    subnet_counters = defaultdict(new_rollup_counters)
+
+    for daily_stat in daily_stats:
+        date = timezone.localtime(daily_stat.time_collect).date()
+        subnet_id = printer_subnets.get(daily_stat.printer_id)
+        for field in ROLLUP_FIELDS:
+            value = getattr(daily_stat, field) or 0
+            fleet_counters[date][field] += value
+            if subnet_id is not None:
+                subnet_counters[(subnet_id, date)][field] += value
+
+    return fleet_counters, subnet_counters
+
+
+def sum_by_month(subnet_counters: dict) -> dict:
+    monthly_counters = defaultdict(new_rollup_counters)
+    for (subnet_id, date), values in subnet_counters.items():
+        for field, value in values.items():
+            monthly_counters[(subnet_id, get_month_start(date))][field] += value
+    return monthly_counters
+
+
+def increment_rollups(model, counters: dict, key_fields: tuple):
+    if not counters:
+        return
+
+    now = timezone.now()
+    model.objects.bulk_create([model(**dict(zip(key_fields, key))) for key in counters], ignore_conflicts=True)
+    for key, values in counters.items():
+        model.objects.filter(**dict(zip(key_fields, key))).update(
+            time_update=now, **{field: F(field) + value for field, value in values.items()})
+
+
+def add_daily_stats_to_rollups(daily_stats: list):
+    from monitoring.models import Printer, FleetDailyStat, SubnetDailyStat, SubnetMonthlyStat
+
+    if not daily_stats:
+        return
+
+    printer_subnets = dict(Printer.objects.filter(
+        id__in={daily_stat.printer_id for daily_stat in daily_stats}).values_list('id', 'ip_address__subnet_id'))
+    fleet_counters, subnet_counters = group_daily_stats(daily_stats, printer_subnets)
+
+    with transaction.atomic():
+        increment_rollups(FleetDailyStat, {(date,): values for date, values in fleet_counters.items()}, ('date',))
+        increment_rollups(SubnetDailyStat, subnet_counters, ('subnet_id', 'date'))
+        increment_rollups(SubnetMonthlyStat, sum_by_month(subnet_counters), ('subnet_id', 'date'))
+
+
+def move_printer_rollups(printer_id, old_subnet_id, new_subnet_id):
+    from monitoring.models import DailyStat, SubnetDailyStat, SubnetMonthlyStat
+
+    printer_counters = {
+        row['date']: {field: row[f'total_{field}'] or 0 for field in ROLLUP_FIELDS}
+        for row in DailyStat.objects.filter(printer_id=printer_id).annotate(date=F('collect_date')).values(
+            'date').annotate(**{f'total_{field}': Sum(field) for field in ROLLUP_FIELDS})
+    }
+
+    with transaction.atomic():
+        for subnet_id, sign in ((old_subnet_id, -1), (new_subnet_id, 1)):
+            if subnet_id is None:
+                continue
+            subnet_counters = {(subnet_id, date): {field: sign * value for field, value in values.items()}
+                               for date, values in printer_counters.items()}
+            increment_rollups(SubnetDailyStat, subnet_counters, ('subnet_id', 'date'))
+            increment_rollups(SubnetMonthlyStat, sum_by_month(subnet_counters), ('subnet_id', 'date'))
+        refresh_subnet_stats({old_subnet_id, new_subnet_id} - {None})
+
+
+def refresh_subnet_stats(subnet_ids=None):
+    from monitoring.models import Subnet, Printer, PrinterSupplyStatus, SubnetStat
+
+    subnets = Subnet.objects.all() if subnet_ids is None else Subnet.objects.filter(id__in=subnet_ids)
+    subnet_ids = list(subnets.values_list('id', flat=True))
+    if not subnet_ids:
+        return
+
+    printers = Printer.objects.filter(ip_address__subnet_id__in=subnet_ids)
+    qty_printers = dict(printers.values('ip_address__subnet_id').annotate(qty=Count('id')).values_list(
+        'ip_address__subnet_id', 'qty'))
+    qty_supplies = dict(PrinterSupplyStatus.objects.filter(printer__in=printers).values(
+        'printer__ip_address__subnet_id').annotate(qty=Count('id')).values_list('printer__ip_address__subnet_id',
+                                                                                'qty'))
+    qty_printers_without_supplies = dict(printers.filter(printersupplystatus__isnull=True).values(
+        'ip_address__subnet_id').annotate(qty=Count('id')).values_list('ip_address__subnet_id', 'qty'))
+
+    SubnetStat.objects.bulk_create(
+        [SubnetStat(subnet_id=subnet_id,
+                    qty_printers=qty_printers.get(subnet_id, 0),
+                    qty_supplies=qty_supplies.get(subnet_id, 0),
+                    qty_printers_without_supplies=qty_printers_without_supplies.get(subnet_id, 0),
+                    time_update=timezone.now())
+         for subnet_id in subnet_ids],
+        update_conflicts=True, unique_fields=['subnet'],
+        update_fields=['qty_printers', 'qty_supplies', 'qty_printers_without_supplies', 'time_update'])
+
+
+def get_daily_stats_in_range(start_date=None, end_date=None):
+    from monitoring.models import DailyStat
+
+    daily_stats = DailyStat.objects.annotate(date=F('collect_date'))
+    if start_date:
+        daily_stats = daily_stats.filter(date__gte=start_date)
+    if end_date:
+        daily_stats = daily_stats.filter(date__lte=end_date)
+    return daily_stats
+
+
+def aggregate_daily_stats(start_date=None, end_date=None) -> tuple:
+    daily_stats = get_daily_stats_in_range(start_date, end_date)
+    totals = {f'total_{field}': Sum(field) for field in ROLLUP_FIELDS}
+
+    fleet_counters = {
+        (row['date'],): {field: row[f'total_{field}'] or 0 for field in ROLLUP_FIELDS}
+        for row in daily_stats.values('date').annotate(**totals)
+    }
+    subnet_counters = {
+        (row['printer__ip_address__subnet_id'], row['date']): {field: row[f'total_{field}'] or 0
+                                                               for field in ROLLUP_FIELDS}
+        for row in daily_stats.filter(printer__ip_address__subnet__isnull=False).values(
+            'printer__ip_address__subnet_id', 'date').annotate(**totals)
+    }
+    return fleet_counters, subnet_counters
+
+
+def filter_rollups_in_range(queryset, start_date=None, end_date=None):
+    if start_date:
+        queryset = queryset.filter(date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(date__lte=end_date)
+    return queryset
+
+
+def get_months_range(start_date=None, end_date=None) -> tuple:
+    months_start = get_month_start(start_date) if start_date else None
+    months_end = get_month_start(end_date) + relativedelta(months=1, days=-1) if end_date else None
+    return months_start, months_end
+
+
+def aggregate_monthly_stats(start_date=None, end_date=None) -> dict:
+    _, subnet_counters = aggregate_daily_stats(*get_months_range(start_date, end_date))
+    return sum_by_month(subnet_counters)
+
+
+def rebuild_daily_rollups(start_date=None, end_date=None) -> tuple:
+    from monitoring.models import FleetDailyStat, SubnetDailyStat, SubnetMonthlyStat
+
+    fleet_counters, subnet_counters = aggregate_daily_stats(start_date, end_date)
+    monthly_counters = aggregate_monthly_stats(start_date, end_date)
+
+    with transaction.atomic():
+        filter_rollups_in_range(FleetDailyStat.objects.all(), start_date, end_date).delete()
+        filter_rollups_in_range(SubnetDailyStat.objects.all(), start_date, end_date).delete()
+        filter_rollups_in_range(SubnetMonthlyStat.objects.all(), *get_months_range(start_date, end_date)).delete()
+        FleetDailyStat.objects.bulk_create(
+            [FleetDailyStat(date=date, **values) for (date,), values in fleet_counters.items()], batch_size=1000)
+        SubnetDailyStat.objects.bulk_create(
+            [SubnetDailyStat(subnet_id=subnet_id, date=date, **values)
+             for (subnet_id, date), values in subnet_counters.items()], batch_size=1000)
+        SubnetMonthlyStat.objects.bulk_create(
+            [SubnetMonthlyStat(subnet_id=subnet_id, date=date, **values)
+             for (subnet_id, date), values in monthly_counters.items()], batch_size=1000)
+        refresh_subnet_stats()
+
+    logger_main.info(f"Daily rollups are rebuilt: {len(fleet_counters)} fleet days, "
+                     f"{len(subnet_counters)} subnet days, {len(monthly_counters)} subnet months")
+    return len(fleet_counters), len(subnet_counters)
+
+
+def find_rollup_mismatches(start_date=None, end_date=None) -> list:
+    from monitoring.models import FleetDailyStat, SubnetDailyStat, SubnetMonthlyStat
+
+    expected_fleet, expected_subnet = aggregate_daily_stats(start_date, end_date)
+    actual_fleet = {
+        (row['date'],): {field: row[field] for field in ROLLUP_FIELDS}
+        for row in filter_rollups_in_range(FleetDailyStat.objects.all(), start_date, end_date).values(
+            'date', *ROLLUP_FIELDS)
+    }
+    actual_subnet = {
+        (row['subnet_id'], row['date']): {field: row[field] for field in ROLLUP_FIELDS}
+        for row in filter_rollups_in_range(SubnetDailyStat.objects.all(), start_date, end_date).values(
+            'subnet_id', 'date', *ROLLUP_FIELDS)
+    }
+
+    expected_monthly = aggregate_monthly_stats(start_date, end_date)
+    actual_monthly = {
+        (row['subnet_id'], row['date']): {field: row[field] for field in ROLLUP_FIELDS}
+        for row in filter_rollups_in_range(SubnetMonthlyStat.objects.all(), *get_months_range(
+            start_date, end_date)).values('subnet_id', 'date', *ROLLUP_FIELDS)
+    }
+
+    mismatches = list()
+    for table, expected, actual in (('fleet', expected_fleet, actual_fleet),
+                                    ('subnet', expected_subnet, actual_subnet),
+                                    ('subnet_monthly', expected_monthly, actual_monthly)):
+        for key in sorted(expected.keys() | actual.keys(), key=str):
+            expected_values = expected.get(key, new_rollup_counters())
+            actual_values = actual.get(key, new_rollup_counters())
+            if expected_values != actual_values:
+                mismatches.append({'table': table, 'key': key, 'expected': expected_values,
+                                   'actual': actual_values})
+    return mismatches
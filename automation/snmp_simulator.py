@@ -0,0 +1,281 @@
+import heapq
+import logging
+import random
+import selectors
+import socket
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from automation.snmp_oid_map import device_snmp_map
+
+
+logger_main = logging.getLogger('automation')
+
+SNMP_PORT = 161
+HTTP_PORT = 80
+COUNTER_OIDS = {'print', 'copies', 'copies_small', 'copies_big', 'scan', 'scan-fs', 'scan_apd', 'scan_tablet',
+                'print_copies'}
+
+TAG_INTEGER = 0x02
+TAG_OCTET_STRING = 0x04
+TAG_NULL = 0x05
+TAG_OID = 0x06
+TAG_SEQUENCE = 0x30
+TAG_GET_REQUEST = 0xA0
+TAG_GET_RESPONSE = 0xA2
+TAG_NO_SUCH_OBJECT = 0x80
+
+
+def normalize_oid(oid: str) -> str:
+    return oid.strip('.')
+
+
+def encode_length(length: int) -> bytes:
+    if length < 0x80:
+        return bytes([length])
+    payload = length.to_bytes((length.bit_length() + 7) // 8, 'big')
+    return bytes([0x80 | len(payload)]) + payload
+
+
+def encode_tlv(tag: int, payload: bytes) -> bytes:
+    return bytes([tag]) + encode_length(len(payload)) + payload
+
+
+def encode_integer(value: int) -> bytes:
+    return encode_tlv(TAG_INTEGER, value.to_bytes(max((value.bit_length() + 8) // 8, 1), 'big', signed=True))
+
+
+def encode_oid(oid: str) -> bytes:
+    parts = [int(part) for part in normalize_oid(oid).split('.')]
+    payload = bytearray([parts[0] * 40 + parts[1]])
+    for part in parts[2:]:
+        chunk = [part & 0x7F]
+        part >>= 7
+        while part:
+            chunk.append(0x80 | (part & 0x7F))
+            part >>= 7
+        payload.extend(reversed(chunk))
+    return encode_tlv(TAG_OID, bytes(payload))
+
+
+def encode_value(value) -> bytes:
+    if value is None:
+        return encode_tlv(TAG_NO_SUCH_OBJECT, b'')
+    if isinstance(value, int):
+        return encode_integer(value)
+    return encode_tlv(TAG_OCTET_STRING, str(value).encode())
+
+
+def decode_tlv(data: bytes, offset: int = 0) -> tuple:
+    tag = data[offset]
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        size = length & 0x7F
+        length = int.from_bytes(data[offset:offset + size], 'big')
+        offset += size
+    return tag, data[offset:offset + length], offset + length
+
+
+def decode_sequence(data: bytes) -> list:
+    items, offset = list(), 0
+    while offset < len(data):
+        tag, value, offset = decode_tlv(data, offset)
+        items.append((tag, value))
+    return items
+
+
+def decode_oid(data: bytes) -> str:
+    parts = [data[0] // 40, data[0] % 40]
+    value = 0
+    for byte in data[1:]:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            parts.append(value)
+            value = 0
+    return '.'.join(str(part) for part in parts)
+
+
+def build_get_request(community: bytes, request_id: int, oids: list) -> bytes:
+    varbinds = b''.join(encode_tlv(TAG_SEQUENCE, encode_oid(oid) + encode_tlv(TAG_NULL, b'')) for oid in oids)
+    pdu = encode_tlv(TAG_GET_REQUEST, encode_integer(request_id) + encode_integer(0) + encode_integer(0) +
+                     encode_tlv(TAG_SEQUENCE, varbinds))
+    return encode_tlv(TAG_SEQUENCE, encode_integer(1) + encode_tlv(TAG_OCTET_STRING, community) + pdu)
+
+
+def build_get_response(request: bytes, values: dict):
+    _, message, _ = decode_tlv(request)
+    (_, version), (_, community), (pdu_tag, pdu) = decode_sequence(message)
+    if pdu_tag != TAG_GET_REQUEST:
+        return
+    (_, request_id), _, _, (_, varbinds) = decode_sequence(pdu)
+
+    response_varbinds = b''
+    for _, varbind in decode_sequence(varbinds):
+        (_, oid), _ = decode_sequence(varbind)
+        oid = decode_oid(oid)
+        value = values(oid) if callable(values) else values.get(oid)
+        response_varbinds += encode_tlv(TAG_SEQUENCE, encode_oid(oid) + encode_value(value))
+
+    response_pdu = encode_tlv(TAG_GET_RESPONSE, encode_tlv(TAG_INTEGER, request_id) + encode_integer(0) +
+                              encode_integer(0) + encode_tlv(TAG_SEQUENCE, response_varbinds))
+    return encode_tlv(TAG_SEQUENCE, encode_tlv(TAG_INTEGER, version) + encode_tlv(TAG_OCTET_STRING, community) +
+                      response_pdu)
+
+
+def get_device_oid_values(stamp: str, model_name: str, serial_number: str, counters: dict,
+                          resource: int = 50) -> dict:
+    values = dict()
+    for nm_oid, oid in device_snmp_map[stamp].items():
+        if nm_oid == 'stamp':
+            value = f'{"HP" if stamp.startswith("hewlett-packard") else stamp.upper()} {model_name}'
+        elif nm_oid == 'model':
+            value = model_name
+        elif nm_oid == 'serial_num':
+            value = serial_number
+        elif nm_oid in COUNTER_OIDS:
+            value = counters.get(nm_oid, 0)
+        elif nm_oid.startswith('resource_'):
+            value = resource
+        else:
+            value = f'{nm_oid.upper()}-{model_name}'
+        values[normalize_oid(oid)] = value
+    return values
+
+
+class SimulatedSnmpAgents:
+    """SNMPv2c agents answering GetRequest for a set of loopback addresses with simulated latency and loss."""
+
+    def __init__(self, devices: dict, port: int = SNMP_PORT, latency: float = 0.0, jitter: float = 0.0,
+                 loss: float = 0.0, seed: int = 0):
+        self.devices = devices
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.selector = selectors.DefaultSelector()
+        self.sockets = list()
+        self.pending = list()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.qty_requests = 0
+        self.qty_dropped = 0
+
+    def start(self):
+        for address in self.devices:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((address, self.port))
+            sock.setblocking(False)
+            self.selector.register(sock, selectors.EVENT_READ, address)
+            self.sockets.append(sock)
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+        for sock in self.sockets:
+            self.selector.unregister(sock)
+            sock.close()
+        self.sockets.clear()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def serve(self):
+        while not self.stop_event.is_set():
+            timeout = 0.1
+            if self.pending:
+                timeout = min(max(self.pending[0][0] - time.monotonic(), 0), timeout)
+            for key, _ in self.selector.select(timeout):
+                self.receive(key.fileobj, key.data)
+            self.send_due()
+
+    def receive(self, sock, address: str):
+        try:
+            request, client = sock.recvfrom(65535)
+        except OSError:
+            return
+        self.qty_requests += 1
+        if self.random.random() < self.loss:
+            self.qty_dropped += 1
+            return
+        try:
+            response = build_get_response(request, self.devices[address])
+        except (IndexError, ValueError) as e:
+            logger_main.error(f"{address}: {e} - Malformed SNMP request in the simulated agent")
+            return
+        if response:
+            delay = max(self.latency + self.random.uniform(-self.jitter, self.jitter), 0)
+            heapq.heappush(self.pending, (time.monotonic() + delay, id(response), sock, response, client))
+
+    def send_due(self):
+        now = time.monotonic()
+        while self.pending and self.pending[0][0] <= now:
+            _, _, sock, response, client = heapq.heappop(self.pending)
+            try:
+                sock.sendto(response, client)
+            except OSError:
+                pass
+
+
+PANTUM_PAGE = '''<html><body>
+<a id="DEVICE" href="#" onclick="show({page}); return false;">Device</a>
+<a id="COPYINFO" href="#" onclick="show({copies}); return false;">Copy</a>
+<div id="form_main"><div><div>Counter</div><div id="counter"></div></div></div>
+<script>function show(value) {{ document.getElementById('counter').textContent = value; }}</script>
+</body></html>'''
+
+
+class PantumPageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        stub = self.server.stub
+        if stub.latency:
+            time.sleep(stub.latency)
+        page_value, copies_value = stub.devices[self.server.server_address[0]]
+        body = PANTUM_PAGE.format(page=page_value, copies=copies_value).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PantumWebStubs:
+    """Web interfaces of Pantum printers with the counters pages used by web_scraping_pantum."""
+
+    def __init__(self, devices: dict, port: int = HTTP_PORT, latency: float = 0.0):
+        self.devices = devices
+        self.port = port
+        self.latency = latency
+        self.servers = list()
+
+    def start(self):
+        for address in self.devices:
+            server = ThreadingHTTPServer((address, self.port), PantumPageHandler)
+            server.stub = self
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.servers.append(server)
+        return self
+
+    def stop(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        self.servers.clear()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
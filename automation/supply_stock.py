@@ -0,0 +1,62 @@
+import logging
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F, Sum, Case, When, Value
+from django.utils import timezone
+
+
+logger_main = logging.getLogger('automation')
+
+
+def record_supply_stock_movements(qty_by_supply: dict, reason: str):
+    from monitoring.models import SupplyDetails, SupplyStockMovement
+
+    qty_by_supply = {supply_id: qty for supply_id, qty in qty_by_supply.items() if qty}
+    if not qty_by_supply:
+        return
+
+    with transaction.atomic():
+        existing_supply_ids = set(SupplyDetails.objects.filter(
+            supply_id__in=qty_by_supply).values_list('supply_id', flat=True))
+        missing_supply_ids = set(qty_by_supply) - existing_supply_ids
+        if missing_supply_ids:
+            SupplyDetails.objects.bulk_create(
+                [SupplyDetails(supply_id=supply_id, qty=0) for supply_id in missing_supply_ids], ignore_conflicts=True)
+
+        SupplyDetails.objects.filter(supply_id__in=qty_by_supply).update(
+            qty=F('qty') + Case(*[When(supply_id=supply_id, then=Value(qty))
+                                  for supply_id, qty in qty_by_supply.items()], default=Value(0)))
+
+        SupplyStockMovement.objects.bulk_create(
+            [SupplyStockMovement(supply_id=supply_id, qty=qty, reason=reason)
+             for supply_id, qty in qty_by_supply.items()])
+
+
+def record_supply_stock_movement(supply, qty: int, reason: str):
+    record_supply_stock_movements({supply.id: qty}, reason)
+
+
+def compact_supply_stock_ledger(days: int = 30):
+    from monitoring.models import SupplyDetails, SupplyStockMovement
+
+    border_time = timezone.now() - timedelta(days=days)
+
+    with transaction.atomic():
+        balances = {details.supply_id: details.qty for details in
+                    SupplyDetails.objects.select_for_update().order_by('supply_id')}
+
+        old_movements = SupplyStockMovement.objects.filter(time_change__lt=border_time)
+        compacted_qty = {item['supply_id']: item['total_qty'] for item in
+                         old_movements.values('supply_id').annotate(total_qty=Sum('qty'))}
+        old_movements.delete()
+        SupplyStockMovement.objects.bulk_create(
+            [SupplyStockMovement(supply_id=supply_id, qty=qty, reason='compaction', time_change=border_time)
+             for supply_id, qty in compacted_qty.items()])
+
+        ledger_qty = {item['supply_id']: item['total_qty'] for item in
+                      SupplyStockMovement.objects.values('supply_id').annotate(total_qty=Sum('qty'))}
+
+    for supply_id, qty in balances.items():
+        if ledger_qty.get(supply_id, 0) != qty:
+            logger_main.warning(f"Supply {supply_id}: stock balance {qty} does not match the stock ledger "
+                                f"{ledger_qty.get(supply_id, 0)}")
@@ -0,0 +1,147 @@
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from django.utils import timezone
+import numpy as np
+
+
+logger_main = logging.getLogger('automation')
+
+TASK_RUN_HISTORY_SIZE = 500
+DEVICE_TIMEOUT_SECONDS = 15.0
+DEVICE_STATUSES = ('succeeded', 'timed_out', 'skipped', 'failed')
+
+
+def get_queue_lag(request):
+    if request is None:
+        return
+    published_at = getattr(request, 'published_at', None) or (getattr(request, 'headers', None) or {}).get(
+        'published_at')
+    if published_at:
+        return max(time.time() - float(published_at), 0.0)
+
+
+class TaskTelemetry:
+    def __init__(self, task_name: str, queue_lag=None):
+        self.task_name = task_name
+        self.queue_lag = queue_lag
+        self.time_start = timezone.now()
+        self.start_time = time.perf_counter()
+        self.device_timings = list()
+
+    def record(self, printer_id, status: str, rtt=None):
+        self.device_timings.append([printer_id, round(rtt, 3) if rtt is not None else None, status])
+
+    def poll(self, printer_id, func, *args, succeeded=None):
+        start_time = time.perf_counter()
+        try:
+            result = func(*args)
+        except Exception as e:
+            rtt = time.perf_counter() - start_time
+            self.record(printer_id, 'timed_out' if rtt >= DEVICE_TIMEOUT_SECONDS else 'failed', rtt)
+            logger_main.error(f"{self.task_name}: printer {printer_id}: {e}")
+            return
+
+        rtt = time.perf_counter() - start_time
+        self.record(printer_id, 'succeeded' if succeeded is None or succeeded(result) else 'timed_out', rtt)
+        return result
+
+    def save(self):
+        from monitoring.models import TaskRun
+
+        qty_statuses = dict.fromkeys(DEVICE_STATUSES, 0)
+        for _, _, status in self.device_timings:
+            qty_statuses[status] += 1
+
+        task_run = TaskRun.objects.create(
+            task_name=self.task_name,
+            time_start=self.time_start,
+            duration=time.perf_counter() - self.start_time,
+            queue_lag=self.queue_lag,
+            qty_attempted=len(self.device_timings) - qty_statuses['skipped'],
+            qty_succeeded=qty_statuses['succeeded'],
+            qty_timed_out=qty_statuses['timed_out'],
+            qty_skipped=qty_statuses['skipped'],
+            qty_failed=qty_statuses['failed'],
+            device_timings=self.device_timings,
+        )
+        trim_task_runs(self.task_name)
+
+        logger_main.info(f"{self.task_name}: {task_run.duration:.2f} s, attempted {task_run.qty_attempted}, "
+                         f"succeeded {task_run.qty_succeeded}, timed out {task_run.qty_timed_out}, "
+                         f"skipped {task_run.qty_skipped}, failed {task_run.qty_failed}")
+        return task_run
+
+
+def trim_task_runs(task_name: str, history_size: int = TASK_RUN_HISTORY_SIZE):
+    from monitoring.models import TaskRun
+
+    oldest_kept_id = TaskRun.objects.filter(task_name=task_name).order_by('-id').values_list(
+        'id', flat=True)[history_size - 1:history_size].first()
+    if oldest_kept_id is not None:
+        TaskRun.objects.filter(task_name=task_name, id__lt=oldest_kept_id).delete()
+
+
+@contextmanager
+def task_telemetry(task_name: str, request=None):
+    telemetry = TaskTelemetry(task_name, get_queue_lag(request))
+    try:
+        yield telemetry
+    finally:
+        telemetry.save()
+
+
+def get_percentiles(values) -> dict:
+    values = [value for value in values if value is not None]
+    if not values:
+        return {'p50': None, 'p95': None, 'max': None}
+    p50, p95 = np.percentile(values, [50, 95])
+    return {'p50': round(float(p50), 3), 'p95': round(float(p95), 3), 'max': round(float(max(values)), 3)}
+
+
+def summarize_task_runs(task_runs) -> list:
+    runs_by_task = defaultdict(list)
+    for task_run in task_runs:
+        runs_by_task[task_run.task_name].append(task_run)
+
+    summary = list()
+    for task_name, runs in sorted(runs_by_task.items()):
+        last_run = max(runs, key=lambda run: run.time_start)
+        summary.append({
+            'task_name': task_name,
+            'runs': len(runs),
+            'duration': get_percentiles(run.duration for run in runs),
+            'queue_lag': get_percentiles(run.queue_lag for run in runs),
+            'last_run': last_run,
+        })
+    return summary
+
+
+def summarize_device_timings(task_runs, group_field: str) -> list:
+    from monitoring.models import Printer
+
+    task_runs = list(task_runs)
+    printer_ids = {printer_id for task_run in task_runs for printer_id, _, _ in task_run.device_timings}
+    printer_groups = dict(Printer.objects.filter(id__in=printer_ids).values_list('id', group_field))
+
+    rtts_by_group = defaultdict(list)
+    statuses_by_group = defaultdict(lambda: dict.fromkeys(DEVICE_STATUSES, 0))
+    for task_run in task_runs:
+        for printer_id, rtt, status in task_run.device_timings:
+            group = printer_groups.get(printer_id) or '-'
+            statuses_by_group[group][status] += 1
+            if rtt is not None:
+                rtts_by_group[group].append(rtt)
+
+    total_time = sum(sum(rtts) for rtts in rtts_by_group.values()) or 1
+    summary = list()
+    for group, statuses in statuses_by_group.items():
+        rtts = rtts_by_group[group]
+        summary.append({
+            'group': group,
+            'statuses': statuses,
+            'rtt': get_percentiles(rtts),
+            'time_share': round(sum(rtts) / total_time * 100, 1),
+        })
+    return sorted(summary, key=lambda item: item['time_share'], reverse=True)
@@ -14,3 +14,16 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_asgi_application()
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+if settings.TELEGRAM_WEBHOOK_URL:
+    if not settings.TELEGRAM_WEBHOOK_SECRET:
+        raise ImproperlyConfigured('TELEGRAM_WEBHOOK_SECRET must be set when TELEGRAM_WEBHOOK_URL is set')
+
+    from tgbot.management.commands.bot import build_application
+    from tgbot.update_sources import WebhookSource
+
+    webhook_source = WebhookSource(settings.TELEGRAM_WEBHOOK_URL, settings.TELEGRAM_WEBHOOK_SECRET)
+    application = webhook_source.wrap_asgi(build_application(), application)
@@ -1,8 +1,15 @@
 import os
+import time
 from celery import Celery
+from celery.signals import before_task_publish
 
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 app = Celery('core')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
+
+@before_task_publish.connect
+def add_published_at_header(headers=None, **kwargs):
+    if headers is not None:
+        headers.setdefault('published_at', time.time())
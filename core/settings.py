@@ -30,6 +30,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'monitoring.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -43,7 +44,7 @@ ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'monitoring.metrics.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / "templates"],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -138,6 +139,10 @@ LOGGING = {
             'format': '{levelname} {message}',
             'style': '{',
         },
+        'json': {
+            'format': '{{"time": "{asctime}", "level": "{levelname}", "request": {message}}}',
+            'style': '{',
+        },
     },
     'handlers': {
         'debug_file': {
@@ -182,6 +187,14 @@ LOGGING = {
             'filename': os.path.join(LOGS_DIR, 'automation.log'),
             'formatter': 'verbose',
         },
+        'metrics_file': {
+            'level': 'INFO',
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': os.path.join(LOGS_DIR, 'metrics.log'),
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'formatter': 'json',
+        },
     },
     'loggers': {
         'django': {
@@ -204,8 +217,34 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'metrics': {
+            'handlers': ['metrics_file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
+VIEW_QUERY_BUDGETS = {
+    'monitoring:index': 80,
+    'monitoring:printer': 60,
+    'monitoring:reports': 60,
+    'monitoring:report': 80,
+    'monitoring:data_in_js': 15,
+    'monitoring:events': 60,
+    'monitoring:forecast': 60,
+    'monitoring:ingest_readings': 40,
+}
+
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+
+ASYNC_DASHBOARD_VIEWS = config('ASYNC_DASHBOARD_VIEWS', default=False, cast=bool)
+DASHBOARD_QUERY_WORKERS = 8
+
+PAPER_SHEET_PRICE = config('PAPER_SHEET_PRICE', default=0.7, cast=float)
+
+TELEGRAM_WEBHOOK_URL = config('TELEGRAM_WEBHOOK_URL', default='')
+TELEGRAM_WEBHOOK_SECRET = config('TELEGRAM_WEBHOOK_SECRET', default='')
+
 if "celery" in sys.argv[0]:
     DEBUG = False
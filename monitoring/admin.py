@@ -1,10 +1,13 @@
 from django.contrib import admin
+from django.db import transaction
 from django.core.exceptions import ObjectDoesNotExist
 
 from monitoring import models
 from monitoring.forms import SubnetAdminForm, IPAddressAdminForm, PrinterAdminForm
 from django.contrib import messages
 from automation.data_extractor import scan_subnet, add_printer_parsing_snmp
+from automation.supply_stock import record_supply_stock_movement
+from automation.telemetry import summarize_task_runs, summarize_device_timings
 
 
 admin.site.register(models.PrinterStamp)
@@ -131,6 +134,59 @@ class StatisticsAdmin(admin.ModelAdmin):
 class SupplyDetailsAdmin(admin.ModelAdmin):
     list_display = ('supply', 'qty')
 
+    def get_readonly_fields(self, request, obj=None):
+        return ('supply',) if obj else ()
+
+    def save_model(self, request, obj, form, change):
+        new_qty = obj.qty
+        with transaction.atomic():
+            if change:
+                obj.qty = models.SupplyDetails.objects.select_for_update().values_list('qty', flat=True).get(pk=obj.pk)
+            else:
+                obj.qty = 0
+                super().save_model(request, obj, form, change)
+            record_supply_stock_movement(obj.supply, new_qty - obj.qty, 'adjustment')
+        obj.refresh_from_db()
+
+
+@admin.register(models.SupplyStockMovement)
+class SupplyStockMovementAdmin(admin.ModelAdmin):
+    list_display = ('supply', 'qty', 'reason', 'time_change')
+    list_filter = ('reason',)
+    search_fields = ('supply__name',)
+
+
+@admin.register(models.CollectorAgent)
+class CollectorAgentAdmin(admin.ModelAdmin):
+    list_display = ('name', 'is_active', 'last_seen')
+    readonly_fields = ('last_seen',)
+    filter_horizontal = ('subnets',)
+
+
+@admin.register(models.TaskRun)
+class TaskRunAdmin(admin.ModelAdmin):
+    list_display = ('task_name', 'time_start', 'duration', 'queue_lag', 'qty_attempted', 'qty_succeeded',
+                    'qty_timed_out', 'qty_skipped', 'qty_failed')
+    list_filter = ('task_name',)
+    readonly_fields = [field.name for field in models.TaskRun._meta.fields]
+    change_list_template = 'admin/monitoring/taskrun/change_list.html'
+
+    def has_add_permission(self, request):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        task_runs = models.TaskRun.objects.all()
+        if request.GET.get('task_name__exact'):
+            task_runs = task_runs.filter(task_name=request.GET['task_name__exact'])
+        task_runs = list(task_runs)
+        extra_context = {
+            **(extra_context or {}),
+            'task_summary': summarize_task_runs(task_runs),
+            'stamp_summary': summarize_device_timings(task_runs, 'model__stamp__name'),
+            'subnet_summary': summarize_device_timings(task_runs, 'ip_address__subnet__name'),
+        }
+        return super().changelist_view(request, extra_context)
+
 
 class PrinterSupplyStatusInline(admin.TabularInline):
     model = models.PrinterSupplyStatus
@@ -8,4 +8,10 @@ class MonitoringConfig(AppConfig):
 
     def ready(self):
         import monitoring.signals
-        from automation.data_extractor import update_printer_supply_status
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+        from monitoring.metrics import install_query_metrics
+
+        connection_created.connect(install_query_metrics)
+        for connection in connections.all(initialized_only=True):
+            install_query_metrics(connection)
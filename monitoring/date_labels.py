@@ -0,0 +1,51 @@
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+
+MONTHS = ('Январь', 'Февраль', 'Март', 'Апрель', 'Май', 'Июнь', 'Июль', 'Август', 'Сентябрь', 'Октябрь', 'Ноябрь',
+          'Декабрь')
+WEEKDAYS = ('Понедельник', 'Вторник', 'Среда', 'Четверг', 'Пятница', 'Суббота', 'Воскресенье')
+
+MONTHS_TABLE = np.array(MONTHS, dtype=object)
+WEEKDAYS_TABLE = np.array(WEEKDAYS, dtype=object)
+DAY_MONTH_TABLE = np.array([[f'{day:02d}.{month:02d}' for day in range(32)] for month in range(13)], dtype=object)
+
+
+def format_month(value) -> str:
+    return MONTHS[value.month - 1]
+
+
+@lru_cache(maxsize=512)
+def format_month_year_parts(year: int, month: int) -> str:
+    return f'{MONTHS[month - 1]} {year}'
+
+
+def format_month_year(value) -> str:
+    return format_month_year_parts(value.year, value.month)
+
+
+def format_weekday(value) -> str:
+    return WEEKDAYS[value.weekday()]
+
+
+def format_day_month(value) -> str:
+    return DAY_MONTH_TABLE[value.month, value.day]
+
+
+def to_datetime_index(values) -> pd.DatetimeIndex:
+    return pd.DatetimeIndex(pd.to_datetime(list(values)))
+
+
+def format_weekdays(values) -> list:
+    return WEEKDAYS_TABLE[to_datetime_index(values).weekday].tolist()
+
+
+def format_months_years(values) -> list:
+    index = to_datetime_index(values)
+    return [format_month_year_parts(year, month) for year, month in zip(index.year, index.month)]
+
+
+def format_days_months(values) -> list:
+    index = to_datetime_index(values)
+    return DAY_MONTH_TABLE[index.month, index.day].tolist()
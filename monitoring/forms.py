@@ -174,7 +174,7 @@ class MonthReportForm(DayReportForm):
         try:
             earliest_record = MonthlyStat.objects.earliest('time_collect')
             latest_record = MonthlyStat.objects.latest('time_collect')
-            self.period_start = (earliest_record.time_collect + timedelta(hours=7)).strftime('%Y-%m')
+            self.period_start = timezone.localtime(earliest_record.time_collect).strftime('%Y-%m')
             self.period_end = latest_record.time_collect.strftime('%Y-%m')
         except Exception as e:
             self.period_start = (timezone.now() - timezone.timedelta(days=3 * 365)).strftime('%Y-%m')
@@ -0,0 +1,109 @@
+import json
+import time
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from automation.benchmark import (COLLECTOR_TASKS, seed_synthetic_fleet, get_simulated_devices,
+                                  measure_collector_throughput, measure_dashboard_and_reports, measure_export,
+                                  compare_with_baseline)
+from automation.snmp_simulator import SimulatedSnmpAgents, PantumWebStubs, SNMP_PORT, HTTP_PORT
+
+
+class Command(BaseCommand):
+    help = ('Seeds a synthetic fleet into a throwaway test database and measures collector throughput against '
+            'simulated SNMP agents, dashboard and report latency and export time')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--printers', type=int, default=500, help='Number of printers')
+        parser.add_argument('--days', type=int, default=365, help='Length of history in days')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the generator')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of requests per view')
+        parser.add_argument('--stamps', nargs='*', default=['Katusha', 'Avision', 'Hewlett-Packard', 'Kyocera',
+                                                             'SINDOH'],
+                            choices=list(COLLECTOR_TASKS), help='Vendors polled by the collector benchmark')
+        parser.add_argument('--latency', type=float, default=0.005, help='Simulated device latency, s')
+        parser.add_argument('--jitter', type=float, default=0.0, help='Simulated device latency jitter, s')
+        parser.add_argument('--loss', type=float, default=0.0, help='Share of dropped SNMP requests')
+        parser.add_argument('--snmp-port', type=int, default=SNMP_PORT, help='Port of the simulated SNMP agents')
+        parser.add_argument('--http-port', type=int, default=HTTP_PORT, help='Port of the Pantum web stubs')
+        parser.add_argument('--export-rows', type=int, default=5000, help='Number of rows in the exported table')
+        parser.add_argument('--output', help='Path of the JSON file for the results')
+        parser.add_argument('--baseline', help='Path of the JSON baseline to compare the results with')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown against the baseline')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the test database after the run')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            baseline = json.loads(Path(options['baseline']).read_text(encoding='utf-8'))
+
+        old_database_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            results = self.run_benchmarks(options)
+        finally:
+            connection.creation.destroy_test_db(old_database_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        output = json.dumps(results, ensure_ascii=False, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(output, encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f'Results have been saved to {options["output"]}'))
+        else:
+            self.stdout.write(output)
+
+        if baseline is not None:
+            regressions = compare_with_baseline(results, baseline, options['tolerance'])
+            for regression in regressions:
+                self.stdout.write(self.style.WARNING(
+                    f'{regression["section"]} {regression["name"]} {regression["metric"]}: '
+                    f'{regression["baseline"]} -> {regression["current"]} (x{regression["ratio"]})'))
+            if regressions:
+                raise CommandError(f'{len(regressions)} metrics are slower than the baseline')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def run_benchmarks(self, options) -> dict:
+        from django.contrib.auth.models import User
+        from monitoring.models import Printer
+
+        start_time = time.perf_counter()
+        seed = seed_synthetic_fleet(options['printers'], options['days'], options['seed'])
+        seed['duration_s'] = round(time.perf_counter() - start_time, 3)
+        self.stdout.write(f'Seeded {seed["printers"]} printers x {seed["days"]} days in {seed["duration_s"]} s')
+
+        collector = dict()
+        if options['stamps']:
+            printers = Printer.objects.filter(model__stamp__name__in=options['stamps']).select_related(
+                'model__stamp', 'ip_address')
+            snmp_devices, pantum_devices = get_simulated_devices(printers)
+            try:
+                with SimulatedSnmpAgents(snmp_devices, options['snmp_port'], options['latency'], options['jitter'],
+                                         options['loss'], options['seed']), \
+                        PantumWebStubs(pantum_devices, options['http_port'], options['latency']):
+                    collector = measure_collector_throughput(options['stamps'])
+            except PermissionError:
+                raise CommandError(f'Binding the simulated devices to port {options["snmp_port"]} requires the '
+                                   f'CAP_NET_BIND_SERVICE capability')
+
+        user = User.objects.create_superuser(username='benchmark', password=None)
+        client = Client()
+        client.force_login(user)
+
+        return {
+            'meta': {
+                'printers': options['printers'],
+                'days': options['days'],
+                'seed': options['seed'],
+                'latency': options['latency'],
+                'loss': options['loss'],
+                'time_run': timezone.now().isoformat(),
+            },
+            'seed': {'fleet': seed},
+            'collector': collector,
+            'views': measure_dashboard_and_reports(client, options['repeat']),
+            'export': {'export_report': measure_export(client, options['export_rows'])},
+        }
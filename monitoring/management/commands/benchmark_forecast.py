@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from datetime import timedelta
+from automation.forecast import (fit_weekday_profile, forecast_daily_pages, predict_supply_change_days,
+                                 get_next_month_range)
+import numpy as np
+import time
+
+
+class Command(BaseCommand):
+    help = 'Measures the forecast calculation time on synthetic history without touching the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--printers', type=int, default=1000, help='Number of printers')
+        parser.add_argument('--days', type=int, default=730, help='Length of history in days')
+        parser.add_argument('--supplies', type=int, default=4, help='Number of supplies per printer')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of runs')
+
+    def handle(self, *args, **options):
+        printers, days, supplies = options['printers'], options['days'], options['supplies']
+        rng = np.random.default_rng(0)
+        today = timezone.localdate()
+        history_start = today - timedelta(days=days - 1)
+        _, forecast_end = get_next_month_range(today)
+        horizon_start = today + timedelta(days=1)
+        horizon_days = (forecast_end - horizon_start).days + 1
+
+        history = rng.poisson(rng.uniform(0, 300, (printers, 1)), (printers, days)).astype(float)
+        history[rng.random(history.shape) < 0.05] = np.nan
+        consumption = rng.integers(1000, 10000, (printers, supplies))
+        remaining = rng.integers(0, 101, (printers, supplies))
+
+        timings = []
+        for _ in range(options['repeat']):
+            start_time = time.perf_counter()
+            profile = fit_weekday_profile(history, history_start)
+            daily_pages = forecast_daily_pages(profile, horizon_start, horizon_days)
+            cumulative_pages = np.cumsum(daily_pages, axis=1)
+            for row in range(printers):
+                for supply in range(supplies):
+                    predict_supply_change_days(cumulative_pages[row], consumption[row, supply] *
+                                               remaining[row, supply] / 100, consumption[row, supply])
+            timings.append(time.perf_counter() - start_time)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{printers} printers x {days} days: best {min(timings):.3f} s, '
+            f'median {float(np.median(timings)):.3f} s over {options["repeat"]} runs'))
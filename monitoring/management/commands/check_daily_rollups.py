@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from datetime import date, timedelta
+from automation.rollups import find_rollup_mismatches, rebuild_daily_rollups
+
+
+class Command(BaseCommand):
+    help = 'Compares the fleet and subnet daily rollups with the daily statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Number of last days to check')
+        parser.add_argument('--start', type=date.fromisoformat, help='First date to check, YYYY-MM-DD')
+        parser.add_argument('--fix', action='store_true', help='Rebuild the rollups of the mismatched days')
+
+    def handle(self, *args, **options):
+        start_date = options['start'] or timezone.localdate() - timedelta(days=options['days'] - 1)
+        mismatches = find_rollup_mismatches(start_date)
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS(f'Daily rollups are consistent since {start_date}'))
+            return
+
+        for mismatch in mismatches:
+            self.stdout.write(f"{mismatch['table']} {mismatch['key']}: expected {mismatch['expected']}, "
+                              f"actual {mismatch['actual']}")
+
+        if options['fix']:
+            for mismatch_date in sorted({mismatch['key'][-1] for mismatch in mismatches}):
+                rebuild_daily_rollups(mismatch_date, mismatch_date)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt the rollups of {len(mismatches)} mismatched rows'))
+        else:
+            raise CommandError(f'Daily rollups have {len(mismatches)} mismatched rows')
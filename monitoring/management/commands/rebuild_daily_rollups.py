@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from datetime import date
+from automation.rollups import rebuild_daily_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the fleet and subnet daily rollups from the daily statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='First date to rebuild, YYYY-MM-DD')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last date to rebuild, YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        fleet_days, subnet_days = rebuild_daily_rollups(options['start'], options['end'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {fleet_days} fleet days and {subnet_days} subnet days'))
@@ -0,0 +1,197 @@
+import json
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+
+logger_metrics = logging.getLogger('metrics')
+
+REQUEST_DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRICS_PREFIX = 'printer_monitoring'
+
+current_request_metrics = ContextVar('current_request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.start_time = time.perf_counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start_time = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            with self.lock:
+                self.queries += 1
+                self.db_time += time.perf_counter() - start_time
+
+    def get_summary(self) -> dict:
+        total_time = time.perf_counter() - self.start_time
+        return {
+            'queries': self.queries,
+            'db_time': self.db_time,
+            'template_time': self.template_time,
+            'python_time': max(total_time - self.db_time - self.template_time, 0.0),
+            'total_time': total_time,
+        }
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current_request_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install_query_metrics(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+class ViewMetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = dict()
+
+    def observe(self, view_name: str, summary: dict, budget_exceeded: bool = False):
+        with self.lock:
+            view = self.views.setdefault(view_name, {
+                'requests': 0, 'queries': 0, 'db_time': 0.0, 'python_time': 0.0, 'template_time': 0.0,
+                'total_time': 0.0, 'budget_exceeded': 0, 'buckets': [0] * len(REQUEST_DURATION_BUCKETS),
+            })
+            view['requests'] += 1
+            view['budget_exceeded'] += int(budget_exceeded)
+            for key in ('queries', 'db_time', 'python_time', 'template_time', 'total_time'):
+                view[key] += summary[key]
+            for index, bucket in enumerate(REQUEST_DURATION_BUCKETS):
+                if summary['total_time'] <= bucket:
+                    view['buckets'][index] += 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {view_name: {**view, 'buckets': list(view['buckets'])} for view_name, view in self.views.items()}
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+
+registry = ViewMetricsRegistry()
+
+
+def escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus_metrics(views: dict) -> str:
+    counters = (
+        ('http_requests_total', 'requests', 'Total number of handled requests.'),
+        ('db_queries_total', 'queries', 'Total number of SQL queries.'),
+        ('db_seconds_total', 'db_time', 'Total time spent in SQL queries.'),
+        ('python_seconds_total', 'python_time', 'Total time spent in Python code outside SQL and templates.'),
+        ('template_seconds_total', 'template_time', 'Total time spent rendering templates.'),
+        ('query_budget_exceeded_total', 'budget_exceeded', 'Total number of requests over the query budget.'),
+    )
+    lines = list()
+    for name, key, description in counters:
+        lines.append(f'# HELP {METRICS_PREFIX}_{name} {description}')
+        lines.append(f'# TYPE {METRICS_PREFIX}_{name} counter')
+        for view_name, view in sorted(views.items()):
+            lines.append(f'{METRICS_PREFIX}_{name}{{view="{escape_label(view_name)}"}} {view[key]}')
+
+    name = f'{METRICS_PREFIX}_http_request_duration_seconds'
+    lines.append(f'# HELP {name} Request duration.')
+    lines.append(f'# TYPE {name} histogram')
+    for view_name, view in sorted(views.items()):
+        label = escape_label(view_name)
+        for bucket, count in zip(REQUEST_DURATION_BUCKETS, view['buckets']):
+            lines.append(f'{name}_bucket{{view="{label}",le="{bucket}"}} {count}')
+        lines.append(f'{name}_bucket{{view="{label}",le="+Inf"}} {view["requests"]}')
+        lines.append(f'{name}_sum{{view="{label}"}} {view["total_time"]}')
+        lines.append(f'{name}_count{{view="{label}"}} {view["requests"]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def render_task_metrics(task_summary: list) -> str:
+    lines = list()
+    for name, key, description in (
+        ('task_duration_seconds', 'duration', 'Task run duration over the stored runs.'),
+        ('task_queue_lag_seconds', 'queue_lag', 'Time between task publishing and start over the stored runs.'),
+    ):
+        lines.append(f'# HELP {METRICS_PREFIX}_{name} {description}')
+        lines.append(f'# TYPE {METRICS_PREFIX}_{name} summary')
+        for task in task_summary:
+            label = escape_label(task['task_name'])
+            for quantile, percentile in (('0.5', 'p50'), ('0.95', 'p95')):
+                if task[key][percentile] is not None:
+                    lines.append(f'{METRICS_PREFIX}_{name}{{task="{label}",quantile="{quantile}"}} '
+                                 f'{task[key][percentile]}')
+            lines.append(f'{METRICS_PREFIX}_{name}_count{{task="{label}"}} {task["runs"]}')
+
+    name = f'{METRICS_PREFIX}_task_last_run_devices'
+    lines.append(f'# HELP {name} Devices handled by the last task run.')
+    lines.append(f'# TYPE {name} gauge')
+    for task in task_summary:
+        label = escape_label(task['task_name'])
+        for status in ('attempted', 'succeeded', 'timed_out', 'skipped', 'failed'):
+            lines.append(f'{name}{{task="{label}",status="{status}"}} {getattr(task["last_run"], f"qty_{status}")}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def get_query_budget(view_name: str):
+    return getattr(settings, 'VIEW_QUERY_BUDGETS', {}).get(view_name)
+
+
+def log_request_metrics(request, response, view_name: str, summary: dict, budget):
+    record = {
+        'view': view_name,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'queries': summary['queries'],
+        'query_budget': budget,
+        'db_ms': round(summary['db_time'] * 1000, 2),
+        'python_ms': round(summary['python_time'] * 1000, 2),
+        'template_ms': round(summary['template_time'] * 1000, 2),
+        'total_ms': round(summary['total_time'] * 1000, 2),
+    }
+    if budget is not None and summary['queries'] > budget:
+        logger_metrics.warning(json.dumps(record, ensure_ascii=False))
+    else:
+        logger_metrics.info(json.dumps(record, ensure_ascii=False))
+
+
+class InstrumentedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = current_request_metrics.get()
+        if metrics is None:
+            return self.template.render(context, request)
+
+        start_time, start_db_time = time.perf_counter(), metrics.db_time
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start_time - (metrics.db_time - start_db_time)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
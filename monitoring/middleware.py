@@ -0,0 +1,42 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from monitoring.metrics import (RequestMetrics, current_request_metrics, registry, get_query_budget,
+                                log_request_metrics)
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics = RequestMetrics()
+        token = current_request_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request_metrics.reset(token)
+        return self.observe(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_request_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request_metrics.reset(token)
+        return self.observe(request, response, metrics)
+
+    def observe(self, request, response, metrics):
+        summary = metrics.get_summary()
+        view_name = request.resolver_match.view_name if request.resolver_match else 'unresolved'
+        budget = get_query_budget(view_name)
+        registry.observe(view_name, summary, budget is not None and summary['queries'] > budget)
+        log_request_metrics(request, response, view_name, summary, budget)
+        return response
@@ -0,0 +1,40 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def create_opening_balances(apps, schema_editor):
+    SupplyDetails = apps.get_model('monitoring', 'SupplyDetails')
+    SupplyStockMovement = apps.get_model('monitoring', 'SupplyStockMovement')
+
+    SupplyStockMovement.objects.bulk_create(
+        [SupplyStockMovement(supply_id=details.supply_id, qty=details.qty, reason='compaction')
+         for details in SupplyDetails.objects.exclude(qty=0)])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplyStockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qty', models.IntegerField(verbose_name='Изменение количества')),
+                ('reason', models.CharField(choices=[('replacement', 'замена в принтере'), ('adjustment', 'корректировка остатка'), ('compaction', 'сводный остаток')], max_length=20, verbose_name='Причина')),
+                ('time_change', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время изменения')),
+                ('supply', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='monitoring.supplyitem', verbose_name='Расходный материал')),
+            ],
+            options={
+                'verbose_name': 'Движение расходного материала на складе',
+                'verbose_name_plural': 'Движения расходных материалов на складе',
+                'db_table': 'supply_stock_movement',
+                'db_table_comment': 'Таблица для хранения журнала движения расходных материалов на складе.',
+                'indexes': [models.Index(fields=['supply', 'time_change'], name='supply_stock_supply_time_idx')],
+            },
+        ),
+        migrations.RunPython(create_opening_balances, migrations.RunPython.noop),
+    ]
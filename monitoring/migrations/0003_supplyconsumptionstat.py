@@ -0,0 +1,62 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_consumption_stats(apps, schema_editor):
+    PrinterSupplyStatus = apps.get_model('monitoring', 'PrinterSupplyStatus')
+    ChangeSupply = apps.get_model('monitoring', 'ChangeSupply')
+    ForecastStat = apps.get_model('monitoring', 'ForecastStat')
+    SupplyConsumptionStat = apps.get_model('monitoring', 'SupplyConsumptionStat')
+
+    consumption_stats = dict()
+    for supply_status in PrinterSupplyStatus.objects.all():
+        key = (supply_status.printer_id, supply_status.supply_id)
+        if key in consumption_stats:
+            continue
+
+        last_change = ChangeSupply.objects.filter(printer_id=key[0], supply_id=key[1]).order_by('time_change').last()
+        last_counter = None
+        if last_change:
+            counter_stat = ForecastStat.objects.filter(
+                printer_id=key[0], time_collect__lte=last_change.time_change.date()).order_by('time_collect').last()
+            if counter_stat:
+                last_counter = counter_stat.copies_printing
+
+        consumption_stats[key] = SupplyConsumptionStat(
+            printer_id=key[0],
+            supply_id=key[1],
+            ewma=supply_status.consumption,
+            last_counter=last_counter,
+            time_change=last_change.time_change if last_change else None,
+        )
+
+    SupplyConsumptionStat.objects.bulk_create(consumption_stats.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0002_supplystockmovement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplyConsumptionStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qty_changes', models.IntegerField(default=0, verbose_name='Количество учтенных замен')),
+                ('ewma', models.FloatField(blank=True, null=True, verbose_name='Сглаженный расход, кол-во страниц')),
+                ('variance', models.FloatField(default=0, verbose_name='Дисперсия расхода')),
+                ('last_counter', models.IntegerField(blank=True, null=True, verbose_name='Счетчик страниц при последней замене')),
+                ('time_change', models.DateTimeField(blank=True, null=True, verbose_name='Время последней замены')),
+                ('printer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='monitoring.printer', verbose_name='Принтер')),
+                ('supply', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='monitoring.supplyitem', verbose_name='Расходный материал')),
+            ],
+            options={
+                'db_table': 'supply_consumption_statistics',
+                'db_table_comment': 'Таблица для хранения состояния оценки расхода материалов по заменам.',
+                'unique_together': {('printer', 'supply')},
+            },
+        ),
+        migrations.RunPython(create_consumption_stats, migrations.RunPython.noop),
+    ]
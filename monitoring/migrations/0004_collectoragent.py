@@ -0,0 +1,28 @@
+import monitoring.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0003_supplyconsumptionstat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollectorAgent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Обязательное поле.', max_length=100, verbose_name='Наименование сборщика')),
+                ('token', models.CharField(default=monitoring.models.generate_collector_token, help_text='Передается сборщиком в заголовке Authorization: Token <токен>.', max_length=40, unique=True, verbose_name='Токен')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активность')),
+                ('last_seen', models.DateTimeField(blank=True, null=True, verbose_name='Время последней передачи данных')),
+            ],
+            options={
+                'verbose_name': 'Удаленный сборщик',
+                'verbose_name_plural': 'Удаленные сборщики',
+                'db_table': 'collector_agent',
+                'db_table_comment': 'Таблица для хранения информации об удаленных сборщиках показаний принтеров.',
+            },
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0004_collectoragent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collectoragent',
+            name='subnets',
+            field=models.ManyToManyField(blank=True, help_text='Подсети, которые опрашивает этот сборщик вместо сервера.', related_name='collectors', to='monitoring.subnet', verbose_name='Подсети'),
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0005_collectoragent_subnets'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailystat',
+            index=models.Index(fields=['time_collect'], name='daily_stat_time_collect_idx'),
+        ),
+    ]
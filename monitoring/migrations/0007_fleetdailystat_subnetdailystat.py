@@ -0,0 +1,81 @@
+from zoneinfo import ZoneInfo
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+
+ROLLUP_FIELDS = ('page', 'print', 'copies', 'scan')
+
+
+def create_daily_rollups(apps, schema_editor):
+    DailyStat = apps.get_model('monitoring', 'DailyStat')
+    FleetDailyStat = apps.get_model('monitoring', 'FleetDailyStat')
+    SubnetDailyStat = apps.get_model('monitoring', 'SubnetDailyStat')
+
+    daily_stats = DailyStat.objects.annotate(date=TruncDate('time_collect', tzinfo=ZoneInfo(settings.TIME_ZONE)))
+    totals = {f'total_{field}': Sum(field, default=0) for field in ROLLUP_FIELDS}
+
+    FleetDailyStat.objects.bulk_create([
+        FleetDailyStat(date=row['date'], **{field: row[f'total_{field}'] for field in ROLLUP_FIELDS})
+        for row in daily_stats.values('date').annotate(**totals).order_by()
+    ], batch_size=1000)
+    SubnetDailyStat.objects.bulk_create([
+        SubnetDailyStat(subnet_id=row['printer__ip_address__subnet_id'], date=row['date'],
+                        **{field: row[f'total_{field}'] for field in ROLLUP_FIELDS})
+        for row in daily_stats.filter(printer__ip_address__subnet__isnull=False)
+        .values('printer__ip_address__subnet_id', 'date').annotate(**totals).order_by()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0006_dailystat_time_collect_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FleetDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('page', models.BigIntegerField(default=0, verbose_name='Страниц')),
+                ('print', models.BigIntegerField(default=0, verbose_name='Печать')),
+                ('copies', models.BigIntegerField(default=0, verbose_name='Копии')),
+                ('scan', models.BigIntegerField(default=0, verbose_name='Сканирование')),
+                ('time_update', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время обновления')),
+            ],
+            options={
+                'verbose_name': 'Ежедневная статистика парка',
+                'verbose_name_plural': 'Ежедневная статистика парка',
+                'db_table': 'fleet_daily_statistics',
+                'db_table_comment': 'Таблица для хранения суммарной ежедневной статистики по всем принтерам.',
+                'constraints': [models.UniqueConstraint(fields=('date',), name='fleet_daily_stat_date_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SubnetDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('page', models.BigIntegerField(default=0, verbose_name='Страниц')),
+                ('print', models.BigIntegerField(default=0, verbose_name='Печать')),
+                ('copies', models.BigIntegerField(default=0, verbose_name='Копии')),
+                ('scan', models.BigIntegerField(default=0, verbose_name='Сканирование')),
+                ('time_update', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время обновления')),
+                ('subnet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='monitoring.subnet', verbose_name='Подсеть')),
+            ],
+            options={
+                'verbose_name': 'Ежедневная статистика подсети',
+                'verbose_name_plural': 'Ежедневная статистика подсетей',
+                'db_table': 'subnet_daily_statistics',
+                'db_table_comment': 'Таблица для хранения суммарной ежедневной статистики по принтерам подсети.',
+                'unique_together': {('subnet', 'date')},
+            },
+        ),
+        migrations.RunPython(create_daily_rollups, migrations.RunPython.noop),
+    ]
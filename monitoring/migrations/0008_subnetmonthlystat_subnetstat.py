@@ -0,0 +1,86 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+ROLLUP_FIELDS = ('page', 'print', 'copies', 'scan')
+
+
+def create_subnet_stats(apps, schema_editor):
+    Subnet = apps.get_model('monitoring', 'Subnet')
+    SubnetStat = apps.get_model('monitoring', 'SubnetStat')
+
+    SubnetStat.objects.bulk_create([
+        SubnetStat(subnet_id=subnet.id, qty_printers=subnet.qty_printers, qty_supplies=subnet.qty_supplies)
+        for subnet in Subnet.objects.annotate(qty_printers=Count('ipaddress__printer', distinct=True),
+                                              qty_supplies=Count('ipaddress__printer__printersupplystatus'))
+    ])
+    for subnet_stat in SubnetStat.objects.all():
+        subnet_stat.qty_printers_without_supplies = Subnet.objects.filter(
+            id=subnet_stat.subnet_id, ipaddress__printer__isnull=False,
+            ipaddress__printer__printersupplystatus__isnull=True).count()
+        subnet_stat.save()
+
+
+def create_subnet_monthly_stats(apps, schema_editor):
+    SubnetDailyStat = apps.get_model('monitoring', 'SubnetDailyStat')
+    SubnetMonthlyStat = apps.get_model('monitoring', 'SubnetMonthlyStat')
+
+    totals = {f'total_{field}': Sum(field, default=0) for field in ROLLUP_FIELDS}
+    SubnetMonthlyStat.objects.bulk_create([
+        SubnetMonthlyStat(subnet_id=row['subnet_id'], date=row['month'],
+                          **{field: row[f'total_{field}'] for field in ROLLUP_FIELDS})
+        for row in SubnetDailyStat.objects.annotate(month=TruncMonth('date'))
+        .values('subnet_id', 'month').annotate(**totals).order_by()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0007_fleetdailystat_subnetdailystat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubnetMonthlyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('page', models.BigIntegerField(default=0, verbose_name='Страниц')),
+                ('print', models.BigIntegerField(default=0, verbose_name='Печать')),
+                ('copies', models.BigIntegerField(default=0, verbose_name='Копии')),
+                ('scan', models.BigIntegerField(default=0, verbose_name='Сканирование')),
+                ('time_update', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время обновления')),
+                ('subnet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='monitoring.subnet', verbose_name='Подсеть')),
+            ],
+            options={
+                'verbose_name': 'Ежемесячная статистика подсети',
+                'verbose_name_plural': 'Ежемесячная статистика подсетей',
+                'db_table': 'subnet_monthly_statistics',
+                'db_table_comment': 'Таблица для хранения суммарной ежемесячной статистики по принтерам подсети.',
+                'unique_together': {('subnet', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SubnetStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qty_printers', models.IntegerField(default=0, verbose_name='Количество принтеров')),
+                ('qty_supplies', models.IntegerField(default=0, verbose_name='Количество расходных материалов')),
+                ('qty_printers_without_supplies', models.IntegerField(default=0, verbose_name='Количество принтеров без расходных материалов')),
+                ('time_update', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время обновления')),
+                ('subnet', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stat', to='monitoring.subnet', verbose_name='Подсеть')),
+            ],
+            options={
+                'verbose_name': 'Сводка по подсети',
+                'verbose_name_plural': 'Сводка по подсетям',
+                'db_table': 'subnet_statistics',
+                'db_table_comment': 'Таблица для хранения количества принтеров и расходных материалов в подсетях.',
+            },
+        ),
+        migrations.RunPython(create_subnet_monthly_stats, migrations.RunPython.noop),
+        migrations.RunPython(create_subnet_stats, migrations.RunPython.noop),
+    ]
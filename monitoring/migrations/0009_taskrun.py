@@ -0,0 +1,35 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0008_subnetmonthlystat_subnetstat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_name', models.CharField(max_length=100, verbose_name='Задача')),
+                ('time_start', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время запуска')),
+                ('duration', models.FloatField(verbose_name='Длительность, с')),
+                ('queue_lag', models.FloatField(blank=True, null=True, verbose_name='Ожидание в очереди, с')),
+                ('qty_attempted', models.IntegerField(default=0, verbose_name='Опрошено устройств')),
+                ('qty_succeeded', models.IntegerField(default=0, verbose_name='Успешно')),
+                ('qty_timed_out', models.IntegerField(default=0, verbose_name='Превышено время ожидания')),
+                ('qty_skipped', models.IntegerField(default=0, verbose_name='Пропущено')),
+                ('qty_failed', models.IntegerField(default=0, verbose_name='С ошибкой')),
+                ('device_timings', models.JSONField(blank=True, default=list, verbose_name='Время опроса устройств')),
+            ],
+            options={
+                'verbose_name': 'Запуск задачи',
+                'verbose_name_plural': 'Запуски задач',
+                'db_table': 'task_run',
+                'db_table_comment': 'Таблица для хранения телеметрии последних запусков фоновых задач.',
+                'indexes': [models.Index(fields=['task_name', '-time_start'], name='task_run_name_time_idx')],
+            },
+        ),
+    ]
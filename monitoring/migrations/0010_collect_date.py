@@ -0,0 +1,32 @@
+import django.db.models.functions.datetime
+import zoneinfo
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0009_taskrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailystat',
+            name='collect_date',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.functions.datetime.TruncDate('time_collect', tzinfo=zoneinfo.ZoneInfo(key='Asia/Krasnoyarsk')), output_field=models.DateField(), verbose_name='Дата сбора'),
+        ),
+        migrations.AddField(
+            model_name='monthlystat',
+            name='collect_date',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.functions.datetime.TruncDate('time_collect', tzinfo=zoneinfo.ZoneInfo(key='Asia/Krasnoyarsk')), output_field=models.DateField(), verbose_name='Дата сбора'),
+        ),
+        migrations.AddField(
+            model_name='statistics',
+            name='collect_date',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.functions.datetime.TruncDate('time_collect', tzinfo=zoneinfo.ZoneInfo(key='Asia/Krasnoyarsk')), output_field=models.DateField(), verbose_name='Дата сбора'),
+        ),
+        migrations.AddIndex(
+            model_name='statistics',
+            index=models.Index(fields=['printer', 'collect_date'], name='statistics_printer_date_idx'),
+        ),
+    ]
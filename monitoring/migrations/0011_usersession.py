@@ -0,0 +1,50 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def create_user_sessions(apps, schema_editor):
+    Session = apps.get_model('sessions', 'Session')
+    UserSession = apps.get_model('monitoring', 'UserSession')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+
+    user_sessions = dict()
+    for session in Session.objects.filter(expire_date__gte=timezone.now()).order_by('expire_date'):
+        user_id = SessionStore().decode(session.session_data).get('_auth_user_id')
+        if user_id is not None:
+            user_sessions[int(user_id)] = session.session_key
+
+    UserSession.objects.bulk_create([
+        UserSession(user_id=user_id, session_key=user_sessions[user_id])
+        for user_id in User.objects.filter(id__in=list(user_sessions)).values_list('id', flat=True)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0010_collect_date'),
+        ('sessions', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSession',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='current_session', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('session_key', models.CharField(max_length=40, verbose_name='Ключ сессии')),
+                ('time_login', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время входа')),
+            ],
+            options={
+                'verbose_name': 'Сессия пользователя',
+                'verbose_name_plural': 'Сессии пользователей',
+                'db_table': 'user_session',
+                'db_table_comment': 'Таблица для хранения текущей сессии каждого пользователя веб-интерфейса.',
+            },
+        ),
+        migrations.RunPython(create_user_sessions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+from django.db.models import Q
+
+
+def link_printer_log_entries(apps, schema_editor):
+    LogEntry = apps.get_model('admin', 'LogEntry')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Printer = apps.get_model('monitoring', 'Printer')
+
+    printer_ids = {
+        f'{printer.model.stamp.name} {printer.model.name} {printer.ip_address.address if printer.ip_address else None}':
+            printer.id
+        for printer in Printer.objects.select_related('model__stamp', 'ip_address')
+    }
+    if not printer_ids:
+        return
+
+    content_type, _ = ContentType.objects.get_or_create(app_label='monitoring', model='printer')
+    unlinked_entries = LogEntry.objects.filter(
+        Q(content_type__isnull=True) | Q(content_type=content_type),
+        Q(object_id__isnull=True) | Q(object_id=''),
+        object_repr__in=list(printer_ids),
+    )
+    for entry in unlinked_entries:
+        entry.content_type = content_type
+        entry.object_id = str(printer_ids[entry.object_repr])
+        entry.save(update_fields=['content_type', 'object_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0011_usersession'),
+        ('admin', '0003_logentry_add_action_flag_choices'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_printer_log_entries, migrations.RunPython.noop),
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS django_admin_log_object_idx '
+            'ON django_admin_log (content_type_id, object_id, action_time DESC);',
+            'DROP INDEX IF EXISTS django_admin_log_object_idx;',
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_supply_details(apps, schema_editor):
+    SupplyDetails = apps.get_model('monitoring', 'SupplyDetails')
+    SupplyStockMovement = apps.get_model('monitoring', 'SupplyStockMovement')
+
+    duplicate_supply_ids = SupplyDetails.objects.values('supply_id').annotate(qty_rows=Count('id')).filter(
+        qty_rows__gt=1).values_list('supply_id', flat=True)
+    for supply_id in list(duplicate_supply_ids):
+        rows = SupplyDetails.objects.filter(supply_id=supply_id).order_by('id')
+        first_row = rows.first()
+        ledger_qty = SupplyStockMovement.objects.filter(supply_id=supply_id).aggregate(total_qty=Sum('qty'))['total_qty']
+        rows.exclude(id=first_row.id).delete()
+        if ledger_qty is not None:
+            SupplyDetails.objects.filter(id=first_row.id).update(qty=ledger_qty)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0012_logentry_printer_object_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_supply_details, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='supplydetails',
+            constraint=models.UniqueConstraint(fields=('supply',), name='supply_details_supply_unique', violation_error_message='Остаток этого расходного материала уже существует.'),
+        ),
+    ]
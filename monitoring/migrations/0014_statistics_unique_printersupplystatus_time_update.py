@@ -0,0 +1,32 @@
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicate_statistics(apps, schema_editor):
+    Statistics = apps.get_model('monitoring', 'Statistics')
+
+    duplicates = Statistics.objects.values('printer_id', 'time_collect').annotate(
+        qty_rows=Count('id'), first_id=Min('id')).filter(qty_rows__gt=1)
+    for duplicate in list(duplicates):
+        Statistics.objects.filter(printer_id=duplicate['printer_id'], time_collect=duplicate['time_collect']).exclude(
+            id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0013_supplydetails_supply_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='printersupplystatus',
+            name='time_update',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Время обновления'),
+        ),
+        migrations.RunPython(delete_duplicate_statistics, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='statistics',
+            constraint=models.UniqueConstraint(fields=('printer', 'time_collect'), name='statistics_printer_time_collect_unique'),
+        ),
+    ]
@@ -1,5 +1,9 @@
+import secrets
+from zoneinfo import ZoneInfo
+from django.conf import settings
 from django.utils import timezone
 from django.db import models
+from django.db.models.functions import TruncDate
 
 
 class Subnet(models.Model):
@@ -225,6 +229,7 @@ class PrinterSupplyStatus(models.Model):
                                                       verbose_name='Остаток расходного материала, %')
     consumption = models.IntegerField(blank=True, null=True, help_text='Обязательное поле.',
                                       verbose_name='Cредний расход материала, кол-во страниц')
+    time_update = models.DateTimeField(blank=True, null=True, verbose_name='Время обновления')
 
     class Meta:
         db_table = 'printer_supply_status'
@@ -246,11 +251,40 @@ class SupplyDetails(models.Model):
         verbose_name = 'Остаток расходного материала на складе'
         verbose_name_plural = 'Остатки расходных материалов на складе'
         db_table_comment = 'Таблица для хранения информации об остатках расходных материалов на складе'
+        constraints = [
+            models.UniqueConstraint(fields=['supply'], name='supply_details_supply_unique',
+                                    violation_error_message='Остаток этого расходного материала уже существует.'),
+        ]
 
     def __str__(self):
         return f'{self.supply} {self.qty}'
 
 
+class SupplyStockMovement(models.Model):
+    REASON_MOVEMENT = (
+        ('replacement', 'замена в принтере'),
+        ('adjustment', 'корректировка остатка'),
+        ('compaction', 'сводный остаток'),
+    )
+
+    supply = models.ForeignKey(SupplyItem, on_delete=models.CASCADE, verbose_name='Расходный материал')
+    qty = models.IntegerField(verbose_name='Изменение количества')
+    reason = models.CharField(max_length=20, choices=REASON_MOVEMENT, verbose_name='Причина')
+    time_change = models.DateTimeField(default=timezone.now, verbose_name='Время изменения')
+
+    class Meta:
+        db_table = 'supply_stock_movement'
+        verbose_name = 'Движение расходного материала на складе'
+        verbose_name_plural = 'Движения расходных материалов на складе'
+        db_table_comment = 'Таблица для хранения журнала движения расходных материалов на складе.'
+        indexes = [
+            models.Index(fields=['supply', 'time_change'], name='supply_stock_supply_time_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.supply} {self.qty:+}'
+
+
 class BaseStat(models.Model):
     printer = models.ForeignKey('Printer', on_delete=models.CASCADE)
     page = models.IntegerField(blank=False)
@@ -258,6 +292,9 @@ class BaseStat(models.Model):
     copies = models.IntegerField(blank=True, null=True)
     scan = models.IntegerField(blank=True, null=True)
     time_collect = models.DateTimeField(blank=False, default=timezone.now)
+    collect_date = models.GeneratedField(expression=TruncDate('time_collect', tzinfo=ZoneInfo(settings.TIME_ZONE)),
+                                         output_field=models.DateField(), db_persist=True, db_index=True,
+                                         verbose_name='Дата сбора')
 
     class Meta:
         abstract = True
@@ -269,6 +306,12 @@ class Statistics(BaseStat):
         verbose_name = 'Статистика'
         verbose_name_plural = 'Статистика'
         db_table_comment = 'Таблица для хранения информации о статистике использования принтеров.'
+        indexes = [
+            models.Index(fields=['printer', 'collect_date'], name='statistics_printer_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['printer', 'time_collect'], name='statistics_printer_time_collect_unique'),
+        ]
 
 
 class DailyStat(BaseStat):
@@ -277,6 +320,9 @@ class DailyStat(BaseStat):
         verbose_name = 'Ежедневная статистика'
         verbose_name_plural = 'Ежедневная статистика'
         db_table_comment = 'Таблица для хранения информации о ежедневной статистике использования принтеров.'
+        indexes = [
+            models.Index(fields=['time_collect'], name='daily_stat_time_collect_idx'),
+        ]
 
     def formatted_time_collect(self):
         return self.time_collect.strftime('%d-%m-%Y')
@@ -293,6 +339,66 @@ class MonthlyStat(BaseStat):
         return self.time_collect.strftime('%m-%Y')
 
 
+class BaseRollupStat(models.Model):
+    date = models.DateField(verbose_name='Дата')
+    page = models.BigIntegerField(default=0, verbose_name='Страниц')
+    print = models.BigIntegerField(default=0, verbose_name='Печать')
+    copies = models.BigIntegerField(default=0, verbose_name='Копии')
+    scan = models.BigIntegerField(default=0, verbose_name='Сканирование')
+    time_update = models.DateTimeField(default=timezone.now, verbose_name='Время обновления')
+
+    class Meta:
+        abstract = True
+
+
+class FleetDailyStat(BaseRollupStat):
+    class Meta:
+        db_table = 'fleet_daily_statistics'
+        verbose_name = 'Ежедневная статистика парка'
+        verbose_name_plural = 'Ежедневная статистика парка'
+        db_table_comment = 'Таблица для хранения суммарной ежедневной статистики по всем принтерам.'
+        constraints = [
+            models.UniqueConstraint(fields=['date'], name='fleet_daily_stat_date_unique'),
+        ]
+
+
+class SubnetDailyStat(BaseRollupStat):
+    subnet = models.ForeignKey(Subnet, on_delete=models.CASCADE, verbose_name='Подсеть')
+
+    class Meta:
+        db_table = 'subnet_daily_statistics'
+        verbose_name = 'Ежедневная статистика подсети'
+        verbose_name_plural = 'Ежедневная статистика подсетей'
+        db_table_comment = 'Таблица для хранения суммарной ежедневной статистики по принтерам подсети.'
+        unique_together = ('subnet', 'date')
+
+
+class SubnetMonthlyStat(BaseRollupStat):
+    subnet = models.ForeignKey(Subnet, on_delete=models.CASCADE, verbose_name='Подсеть')
+
+    class Meta:
+        db_table = 'subnet_monthly_statistics'
+        verbose_name = 'Ежемесячная статистика подсети'
+        verbose_name_plural = 'Ежемесячная статистика подсетей'
+        db_table_comment = 'Таблица для хранения суммарной ежемесячной статистики по принтерам подсети.'
+        unique_together = ('subnet', 'date')
+
+
+class SubnetStat(models.Model):
+    subnet = models.OneToOneField(Subnet, on_delete=models.CASCADE, related_name='stat', verbose_name='Подсеть')
+    qty_printers = models.IntegerField(default=0, verbose_name='Количество принтеров')
+    qty_supplies = models.IntegerField(default=0, verbose_name='Количество расходных материалов')
+    qty_printers_without_supplies = models.IntegerField(default=0,
+                                                        verbose_name='Количество принтеров без расходных материалов')
+    time_update = models.DateTimeField(default=timezone.now, verbose_name='Время обновления')
+
+    class Meta:
+        db_table = 'subnet_statistics'
+        verbose_name = 'Сводка по подсети'
+        verbose_name_plural = 'Сводка по подсетям'
+        db_table_comment = 'Таблица для хранения количества принтеров и расходных материалов в подсетях.'
+
+
 class ChangeSupply(models.Model):
     printer = models.ForeignKey(Printer, on_delete=models.CASCADE, verbose_name='Принтер',
                                 help_text='Обязательное поле.')
@@ -324,6 +430,21 @@ class ForecastStat(models.Model):
         db_table_comment = 'Таблица для хранения информации о статистике для подготовки прогноза.'
 
 
+class SupplyConsumptionStat(models.Model):
+    printer = models.ForeignKey(Printer, on_delete=models.CASCADE, verbose_name='Принтер')
+    supply = models.ForeignKey(SupplyItem, on_delete=models.CASCADE, verbose_name='Расходный материал')
+    qty_changes = models.IntegerField(default=0, verbose_name='Количество учтенных замен')
+    ewma = models.FloatField(blank=True, null=True, verbose_name='Сглаженный расход, кол-во страниц')
+    variance = models.FloatField(default=0, verbose_name='Дисперсия расхода')
+    last_counter = models.IntegerField(blank=True, null=True, verbose_name='Счетчик страниц при последней замене')
+    time_change = models.DateTimeField(blank=True, null=True, verbose_name='Время последней замены')
+
+    class Meta:
+        db_table = 'supply_consumption_statistics'
+        unique_together = ('printer', 'supply')
+        db_table_comment = 'Таблица для хранения состояния оценки расхода материалов по заменам.'
+
+
 class Forecast(models.Model):
     printer = models.ForeignKey('Printer', on_delete=models.CASCADE)
     qty_pages = models.IntegerField()
@@ -369,3 +490,67 @@ class PrinterError(models.Model):
     def __str__(self):
         return f"{self.printer} - {self.description}"
 
+
+
+def generate_collector_token():
+    return secrets.token_hex(20)
+
+
+class CollectorAgent(models.Model):
+    name = models.CharField(max_length=100, verbose_name='Наименование сборщика', help_text='Обязательное поле.')
+    token = models.CharField(max_length=40, unique=True, default=generate_collector_token, verbose_name='Токен',
+                             help_text='Передается сборщиком в заголовке Authorization: Token <токен>.')
+    subnets = models.ManyToManyField(Subnet, blank=True, related_name='collectors', verbose_name='Подсети',
+                                     help_text='Подсети, которые опрашивает этот сборщик вместо сервера.')
+    is_active = models.BooleanField(default=True, verbose_name='Активность')
+    last_seen = models.DateTimeField(blank=True, null=True, verbose_name='Время последней передачи данных')
+
+    class Meta:
+        db_table = 'collector_agent'
+        verbose_name = 'Удаленный сборщик'
+        verbose_name_plural = 'Удаленные сборщики'
+        db_table_comment = 'Таблица для хранения информации об удаленных сборщиках показаний принтеров.'
+
+    def __str__(self):
+        return self.name
+
+
+class TaskRun(models.Model):
+    task_name = models.CharField(max_length=100, verbose_name='Задача')
+    time_start = models.DateTimeField(default=timezone.now, verbose_name='Время запуска')
+    duration = models.FloatField(verbose_name='Длительность, с')
+    queue_lag = models.FloatField(blank=True, null=True, verbose_name='Ожидание в очереди, с')
+    qty_attempted = models.IntegerField(default=0, verbose_name='Опрошено устройств')
+    qty_succeeded = models.IntegerField(default=0, verbose_name='Успешно')
+    qty_timed_out = models.IntegerField(default=0, verbose_name='Превышено время ожидания')
+    qty_skipped = models.IntegerField(default=0, verbose_name='Пропущено')
+    qty_failed = models.IntegerField(default=0, verbose_name='С ошибкой')
+    device_timings = models.JSONField(default=list, blank=True, verbose_name='Время опроса устройств')
+
+    class Meta:
+        db_table = 'task_run'
+        verbose_name = 'Запуск задачи'
+        verbose_name_plural = 'Запуски задач'
+        db_table_comment = 'Таблица для хранения телеметрии последних запусков фоновых задач.'
+        indexes = [
+            models.Index(fields=['task_name', '-time_start'], name='task_run_name_time_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.task_name} {self.time_start:%d.%m.%Y %H:%M:%S}'
+
+
+class UserSession(models.Model):
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                related_name='current_session', verbose_name='Пользователь')
+    session_key = models.CharField(max_length=40, verbose_name='Ключ сессии')
+    time_login = models.DateTimeField(default=timezone.now, verbose_name='Время входа')
+
+    class Meta:
+        db_table = 'user_session'
+        verbose_name = 'Сессия пользователя'
+        verbose_name_plural = 'Сессии пользователей'
+        db_table_comment = 'Таблица для хранения текущей сессии каждого пользователя веб-интерфейса.'
+
+    def __str__(self):
+        return f'{self.user} {self.time_login:%d.%m.%Y %H:%M:%S}'
@@ -1,14 +1,15 @@
 from django.contrib.sessions.models import Session
 from django.utils import timezone
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 import asyncio
 from decouple import config
 from easy_async_tg_notify import Notifier
 from tgbot.models import TelegramUser
 from asgiref.sync import sync_to_async
-from monitoring.models import Printer, PrinterError, PrinterSupplyStatus
+from monitoring.models import Printer, PrinterError, PrinterSupplyStatus, IPAddress, Subnet, UserSession
 from automation.data_extractor import printer_init_resource
+from automation.rollups import move_printer_rollups, refresh_subnet_stats
 import logging
 from django.contrib.auth.signals import user_logged_in, user_logged_out, user_login_failed
 
@@ -36,11 +37,17 @@ def log_user_login_failed(sender, credentials, request, **kwargs):
 
 @receiver(user_logged_in)
 def logout_previous_user(sender, request, user, **kwargs):
-    sessions = Session.objects.filter(expire_date__gte=timezone.now())
-    for session in sessions:
-        data = session.get_decoded()
-        if data.get('_auth_user_id') == str(user.id):
-            session.delete()
+    session_key = request.session.session_key
+    Session.objects.filter(session_key__in=UserSession.objects.filter(user_id=user.id).exclude(
+        session_key=session_key).values('session_key')).delete()
+    UserSession.objects.update_or_create(user_id=user.id, defaults={'session_key': session_key,
+                                                                     'time_login': timezone.now()})
+
+
+@receiver(user_logged_out)
+def forget_user_session(sender, request, user, **kwargs):
+    if user is not None:
+        UserSession.objects.filter(user_id=user.id).delete()
 
 
 @receiver(pre_save, sender=Printer)
@@ -56,6 +63,69 @@ def printer_created(sender, instance, created, **kwargs):
         printer_init_resource(instance)
 
 
+@receiver(pre_save, sender=Printer)
+def remember_printer_subnet(sender, instance, **kwargs):
+    instance.previous_subnet_id = Printer.objects.filter(id=instance.id).values_list(
+        'ip_address__subnet_id', flat=True).first() if instance.id else None
+
+
+@receiver(post_save, sender=Printer)
+def update_printer_subnet_rollups(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    subnet_id = instance.ip_address.subnet_id if instance.ip_address else None
+    previous_subnet_id = getattr(instance, 'previous_subnet_id', None)
+    if created:
+        refresh_subnet_stats({subnet_id} - {None})
+    elif subnet_id != previous_subnet_id:
+        move_printer_rollups(instance.id, previous_subnet_id, subnet_id)
+
+
+@receiver(post_delete, sender=Printer)
+def update_deleted_printer_subnet_stats(sender, instance, **kwargs):
+    if instance.ip_address_id:
+        refresh_subnet_stats(IPAddress.objects.filter(id=instance.ip_address_id).values_list('subnet_id', flat=True))
+
+
+@receiver(pre_save, sender=IPAddress)
+def remember_ip_address_subnet(sender, instance, **kwargs):
+    instance.previous_subnet_id = IPAddress.objects.filter(id=instance.id).values_list(
+        'subnet_id', flat=True).first() if instance.id else None
+
+
+@receiver(post_save, sender=IPAddress)
+def update_ip_address_subnet_rollups(sender, instance, created, raw=False, **kwargs):
+    previous_subnet_id = getattr(instance, 'previous_subnet_id', None)
+    if created or raw or instance.subnet_id == previous_subnet_id:
+        return
+    printer_id = Printer.objects.filter(ip_address=instance).values_list('id', flat=True).first()
+    if printer_id:
+        move_printer_rollups(printer_id, previous_subnet_id, instance.subnet_id)
+
+
+@receiver(post_delete, sender=IPAddress)
+def update_deleted_ip_address_subnet_stats(sender, instance, origin=None, **kwargs):
+    if not isinstance(origin, Subnet):
+        refresh_subnet_stats({instance.subnet_id})
+
+
+def refresh_printer_subnet_stats(printer_id):
+    subnet_id = Printer.objects.filter(id=printer_id).values_list('ip_address__subnet_id', flat=True).first()
+    if subnet_id:
+        refresh_subnet_stats({subnet_id})
+
+
+@receiver(post_save, sender=PrinterSupplyStatus)
+def update_created_supply_subnet_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        refresh_printer_subnet_stats(instance.printer_id)
+
+
+@receiver(post_delete, sender=PrinterSupplyStatus)
+def update_deleted_supply_subnet_stats(sender, instance, **kwargs):
+    refresh_printer_subnet_stats(instance.printer_id)
+
+
 token = config('TELEGRAM_BOT_TOKEN')
 
 
@@ -66,31 +136,39 @@ async def send_msg(msg_text: str):
         await notifier.send_text(msg_text, users_ids)
 
 
-@receiver(post_save, sender=PrinterSupplyStatus)
-def notify_low_cart(sender, instance, created, **kwargs):
+def notify_low_supply(printer_supply_status):
 
     low_supplies = list()
 
-    if instance.remaining_supply_percentage == 1:
-        low_supplies.append(f' закончился {instance.supply}')
+    if printer_supply_status.remaining_supply_percentage == 1:
+        low_supplies.append(f' закончился {printer_supply_status.supply}')
 
     if low_supplies:
         message = ((
-            f'📢 <b>УВЕДОМЛЕНИЕ</b>\n\nВ принтере {instance.printer.model}') +
+            f'📢 <b>УВЕДОМЛЕНИЕ</b>\n\nВ принтере {printer_supply_status.printer.model}') +
                    "\n".join(low_supplies) + "\n" + (f'Местоположение: '
-                                                     f'{instance.printer.get_subnet_name()},'
-                                                     f'{instance.printer.location}\n'
+                                                     f'{printer_supply_status.printer.get_subnet_name()},'
+                                                     f'{printer_supply_status.printer.location}\n'
         ))
         asyncio.run(send_msg(message))
 
 
-@receiver(post_save, sender=PrinterError)
-def notify_error(sender, instance, created, **kwargs):
+@receiver(post_save, sender=PrinterSupplyStatus)
+def notify_low_cart(sender, instance, created, **kwargs):
+    notify_low_supply(instance)
+
+
+def notify_printer_error(printer_error):
 
     message = (
         f'📢 <b>УВЕДОМЛЕНИЕ</b>\n\n'
-        f'В принтере {instance.printer.model} возникла ошибка {instance.description}\n '
-        f'Местоположение: {instance.printer.get_subnet_name()}, {instance.printer.location}\n'
+        f'В принтере {printer_error.printer.model} возникла ошибка {printer_error.description}\n '
+        f'Местоположение: {printer_error.printer.get_subnet_name()}, {printer_error.printer.location}\n'
     )
+    asyncio.run(send_msg(message))
+
+
+@receiver(post_save, sender=PrinterError)
+def notify_error(sender, instance, created, **kwargs):
     if created:
-        asyncio.run(send_msg(message))
+        notify_printer_error(instance)
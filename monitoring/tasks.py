@@ -3,7 +3,7 @@ from celery.utils.log import get_task_logger
 import psycopg2
 import datetime
 from automation.data_extractor import (scan_subnet, add_printer_parsing_snmp, checking_activity,
-                                       update_printer_resource, parsing_snmp_katusha, parsing_snmp_avision,
+                                       update_printer_resource, update_printers_resources, parsing_snmp_katusha, parsing_snmp_avision,
                                        parsing_snmp_hp, parsing_pantum, parsing_snmp_kyosera, parsing_snmp_sindoh,
                                        add_missing_statistics_to_db, detect_device_errors)
 from django.core.exceptions import ObjectDoesNotExist
@@ -12,10 +12,16 @@ from celery.schedules import timedelta
 from django.utils import timezone
 import logging
 from automation.clear_logs import LogsFileManager
+from automation.supply_stock import compact_supply_stock_ledger
+from automation.forecast import calculate_forecast
+from automation.telemetry import task_telemetry
 
 
 custom_logger = logging.getLogger('automation')
 
+RESOURCES_BATCH_SIZE = 50
+SESSIONS_BATCH_SIZE = 1000
+
 task_schedule = {
     "scan-subnets-regular": {
         "task": "monitoring.tasks.scan_subnets_regular",
@@ -65,6 +71,14 @@ task_schedule = {
         "task": "monitoring.tasks.detect_device_errors_regular",
         "schedule": crontab(minute="*/5", hour='7-19'),
     },
+    "calculate-forecast-regular": {
+        "task": "monitoring.tasks.calculate_forecast_regular",
+        "schedule": crontab(minute="30", hour="19"),
+    },
+    "compact-supply-stock-ledger-weekly": {
+        "task": "monitoring.tasks.compact_supply_stock_ledger_regular",
+        "schedule": crontab(minute="30", hour="0", day_of_week='0'),
+    },
     "clear-logs-files-every-2-weeks": {
         "task": "monitoring.tasks.clear_logs_files_regular",
         "schedule": crontab(minute="0", hour="0", day_of_week='0', day_of_month='1-31/14'),
@@ -73,9 +87,20 @@ task_schedule = {
 
 
 @shared_task
-def delete_expired_sessions():
+def delete_expired_sessions(batch_size: int = SESSIONS_BATCH_SIZE):
     from django.contrib.sessions.models import Session
-    Session.objects.filter(expire_date__lt=timezone.now()).delete()
+    from monitoring.models import UserSession
+
+    time_now = timezone.now()
+    qty_deleted = 0
+    while True:
+        session_keys = list(Session.objects.filter(expire_date__lt=time_now).values_list(
+            'session_key', flat=True)[:batch_size])
+        if not session_keys:
+            break
+        UserSession.objects.filter(session_key__in=session_keys).delete()
+        qty_deleted += Session.objects.filter(session_key__in=session_keys).delete()[0]
+    return qty_deleted
 
 
 @shared_task
@@ -83,7 +108,7 @@ def scan_subnets_regular():
     from monitoring.models import IPAddress, Subnet, Printer
     from monitoring.admin import add_printer, create_printer
 
-    subnets = Subnet.objects.all()
+    subnets = Subnet.objects.exclude(collectors__is_active=True)
     for subnet in subnets:
         ips = scan_subnet(f"{subnet.address}/{subnet.mask}")
         for ip in ips:
@@ -130,17 +155,25 @@ def update_existing_printer(printer_info, ip):
     existing_printer.save()
 
 
-@shared_task
-def checking_activity_regular():
+def get_polled_printers():
     from monitoring.models import Printer
 
-    printers = Printer.objects.all()
-    for printer in printers:
-        activity_printer = checking_activity(str(printer.ip_address))
-        if printer.is_active != activity_printer:
-            printer.is_active = activity_printer
-            printer.save()
-            custom_logger.info(f"Printer {printer} activity has been changed to {activity_printer}")
+    return Printer.objects.exclude(ip_address__subnet__collectors__is_active=True)
+
+
+@shared_task(bind=True)
+def checking_activity_regular(self):
+    printers = get_polled_printers()
+    with task_telemetry(self.name, self.request) as telemetry:
+        for printer in printers:
+            activity_printer = telemetry.poll(printer.id, checking_activity, str(printer.ip_address),
+                                              succeeded=bool)
+            if activity_printer is None:
+                continue
+            if printer.is_active != activity_printer:
+                printer.is_active = activity_printer
+                printer.save()
+                custom_logger.info(f"Printer {printer} activity has been changed to {activity_printer}")
 
 
 @shared_task
@@ -148,67 +181,71 @@ def async_update_printer_resource(printer_id):
     update_printer_resource(printer_id)
 
 
-@shared_task
-def update_printer_resource_regular():
-    from monitoring.models import Printer
-
-    printer_ids = Printer.objects.values('id')
-    for printer_id in printer_ids:
-        async_update_printer_resource.delay(printer_id['id'])
+@shared_task(bind=True)
+def async_update_printers_resources(self, printer_ids):
+    with task_telemetry(self.name, self.request) as telemetry:
+        update_printers_resources(printer_ids, telemetry)
 
 
 @shared_task
-def parsing_katushas_page_counts():
-    from monitoring.models import Printer
-
-    katushas = Printer.objects.filter(model__stamp__name='Katusha', is_active=True)
-    for katusha in katushas:
-        parsing_snmp_katusha(katusha)
+def update_printer_resource_regular():
+    printer_ids = list(get_polled_printers().filter(is_active=True).order_by('id').values_list('id', flat=True))
+    for i in range(0, len(printer_ids), RESOURCES_BATCH_SIZE):
+        async_update_printers_resources.delay(printer_ids[i:i + RESOURCES_BATCH_SIZE])
 
 
-@shared_task
-def parsing_avisions_page_counts():
-    from monitoring.models import Printer
+def poll_page_counts(telemetry, printers, parse_func):
+    from monitoring.models import Statistics
 
-    avisions = Printer.objects.filter(model__stamp__name='Avision', is_active=True)
-    for avision in avisions:
-        parsing_snmp_avision(avision)
+    collected_printer_ids = set(Statistics.objects.filter(
+        printer__in=printers, collect_date=timezone.localdate()).values_list('printer_id', flat=True))
+    for printer in printers:
+        if printer.id in collected_printer_ids:
+            telemetry.record(printer.id, 'skipped')
+        else:
+            telemetry.poll(printer.id, parse_func, printer, succeeded=bool)
 
 
-@shared_task
-def parsing_hps_page_counts():
-    from monitoring.models import Printer
+@shared_task(bind=True)
+def parsing_katushas_page_counts(self):
+    katushas = get_polled_printers().filter(model__stamp__name='Katusha', is_active=True)
+    with task_telemetry(self.name, self.request) as telemetry:
+        poll_page_counts(telemetry, katushas, parsing_snmp_katusha)
 
-    hps = Printer.objects.filter(model__stamp__name='Hewlett-Packard', is_active=True)
-    for hp in hps:
-        parsing_snmp_hp(hp)
 
+@shared_task(bind=True)
+def parsing_avisions_page_counts(self):
+    avisions = get_polled_printers().filter(model__stamp__name='Avision', is_active=True)
+    with task_telemetry(self.name, self.request) as telemetry:
+        poll_page_counts(telemetry, avisions, parsing_snmp_avision)
 
-@shared_task
-def parsing_kyoseras_page_counts():
-    from monitoring.models import Printer
 
-    kyoseras = Printer.objects.filter(model__stamp__name__iexact='kyocera', is_active=True)
-    for kyosera in kyoseras:
-        parsing_snmp_kyosera(kyosera)
+@shared_task(bind=True)
+def parsing_hps_page_counts(self):
+    hps = get_polled_printers().filter(model__stamp__name='Hewlett-Packard', is_active=True)
+    with task_telemetry(self.name, self.request) as telemetry:
+        poll_page_counts(telemetry, hps, parsing_snmp_hp)
 
 
-@shared_task
-def parsing_pantums_page_counts():
-    from monitoring.models import Printer
+@shared_task(bind=True)
+def parsing_kyoseras_page_counts(self):
+    kyoseras = get_polled_printers().filter(model__stamp__name__iexact='kyocera', is_active=True)
+    with task_telemetry(self.name, self.request) as telemetry:
+        poll_page_counts(telemetry, kyoseras, parsing_snmp_kyosera)
 
-    pantums = Printer.objects.filter(model__stamp__name='Pantum', is_active=True)
-    for pantum in pantums:
-        parsing_pantum(pantum)
 
+@shared_task(bind=True)
+def parsing_pantums_page_counts(self):
+    pantums = get_polled_printers().filter(model__stamp__name='Pantum', is_active=True)
+    with task_telemetry(self.name, self.request) as telemetry:
+        poll_page_counts(telemetry, pantums, parsing_pantum)
 
-@shared_task
-def parsing_sindohs_page_counts():
-    from monitoring.models import Printer
 
-    sindohs = Printer.objects.filter(model__stamp__name='SINDOH', is_active=True)
-    for sindoh in sindohs:
-        parsing_snmp_sindoh(sindoh)
+@shared_task(bind=True)
+def parsing_sindohs_page_counts(self):
+    sindohs = get_polled_printers().filter(model__stamp__name='SINDOH', is_active=True)
+    with task_telemetry(self.name, self.request) as telemetry:
+        poll_page_counts(telemetry, sindohs, parsing_snmp_sindoh)
 
 
 @shared_task
@@ -227,9 +264,7 @@ def async_detect_device_errors(printer_id):
 
 @shared_task
 def detect_device_errors_regular():
-    from monitoring.models import Printer
-
-    printer_ids = Printer.objects.values('id')
+    printer_ids = get_polled_printers().values('id')
     for printer_id in printer_ids:
         async_detect_device_errors.delay(printer_id['id'])
 
@@ -240,3 +275,13 @@ def clear_logs_files_regular():
 
     file_manager = LogsFileManager(LOGS_DIR)
     file_manager.check_size()
+
+
+@shared_task
+def compact_supply_stock_ledger_regular():
+    compact_supply_stock_ledger()
+
+
+@shared_task
+def calculate_forecast_regular():
+    calculate_forecast()
@@ -2,35 +2,48 @@ import json
 from collections import defaultdict
 from datetime import datetime, timedelta
 import time
-import locale
-from django.shortcuts import render, get_object_or_404
+from django.shortcuts import render, get_object_or_404, aget_object_or_404
 from .models import (Printer, Statistics, DailyStat, MonthlyStat, Forecast, MaintenanceCosts, ForecastChangeSupplies,
-                     ChangeSupply, PrinterError, Subnet, PrinterSupplyStatus, SupplyItem)
-from django.contrib.admin.models import LogEntry
+                     ChangeSupply, PrinterError, Subnet, PrinterSupplyStatus, SupplyItem, CollectorAgent, FleetDailyStat,
+                     SubnetDailyStat, SubnetMonthlyStat, SubnetStat, TaskRun)
+from django.contrib.admin.models import LogEntry, ADDITION, CHANGE, DELETION
 from django.db.models import Max
 from django.db.models.query import QuerySet
 from django.http import JsonResponse
 from django.shortcuts import redirect
-from django.db import connection
+from django.db import connection, close_old_connections
 import pandas as pd
 from django.db.models import F, Sum, Min, Count
 from . import forms
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST, require_GET, condition
+from django.utils.cache import patch_cache_control
+from automation.ingest import INGEST_CONTENT_TYPES, decode_readings, save_readings_to_database
+from automation.telemetry import summarize_task_runs
+from .date_labels import (format_month_year, format_weekdays, format_days_months,
+                          format_months_years)
+from .metrics import registry as metrics_registry, render_prometheus_metrics, render_task_metrics
+from django.conf import settings
 from bs4 import BeautifulSoup
 from io import StringIO, BytesIO
 from django.http import HttpResponse
 from django.utils import timezone
 import requests
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.views import View
-from django.http import HttpResponseBadRequest
-from django.db.models.functions import TruncDate, TruncMonth
+from django.http import HttpResponseBadRequest, HttpResponseForbidden
+from django.db.models.functions import TruncDate, TruncMonth, Coalesce
 from django.db.models import OuterRef, Subquery
 from dateutil.relativedelta import relativedelta
 import calendar
 import os
 import logging
-from functools import wraps
+from functools import wraps, partial, lru_cache
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async, iscoroutinefunction
 
 
 def get_variables_stats(queryset: dict, name_key: str) -> dict:
@@ -70,7 +83,7 @@ def update_info():
 
         subnet_printer_count = (
             Subnet.objects
-            .annotate(printer_count=Count('ipaddress__printer'))
+            .annotate(printer_count=Coalesce('stat__qty_printers', 0))
             .values('name', 'printer_count')
             .order_by('id'))
 
@@ -80,7 +93,7 @@ def update_info():
         latest_events = timezone.now() - timedelta(days=10)
         recent_changes_supplies = ChangeSupply.objects.filter(time_change__gte=latest_events)
         recent_errors = PrinterError.objects.filter(event_date__gte=latest_events)
-        recent_admin_log = LogEntry.objects.filter(action_time__gte=latest_events)
+        recent_admin_log = LogEntry.objects.select_related('user').filter(action_time__gte=latest_events)
         events_small = create_events(recent_changes_supplies, recent_errors, recent_admin_log)[:10]
 
     except Exception as e:
@@ -136,12 +149,36 @@ def get_report_option(nm_report: str) -> str:
     return options_dict.get(lower_str, nm_report)
 
 
+ADMIN_ACTIONS_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=ADMIN_ACTIONS_CACHE_SIZE)
+def render_admin_action(action_flag: int, change_message: str) -> str:
+    if action_flag == ADDITION:
+        return 'Добавление объекта'
+    if action_flag == CHANGE:
+        changed_fields = list()
+        for item in json.loads(change_message):
+            try:
+                changed_fields += item['changed']['fields']
+            except KeyError:
+                continue
+        return f'Изменены поля ({", ".join(changed_fields)})'
+    if action_flag == DELETION:
+        return 'Удаление объекта'
+    return 'Масоны'
+
+
+def get_printer_admin_log(printer_id) -> QuerySet[LogEntry]:
+    return LogEntry.objects.filter(content_type__app_label=Printer._meta.app_label,
+                                   content_type__model=Printer._meta.model_name, object_id=str(printer_id))
+
+
 def create_events(supplies_query: QuerySet[ChangeSupply], errors_query: QuerySet[PrinterError],
                   admin_log_query: QuerySet[LogEntry]) -> list:
     formatted_changes_supplies = []
     for event in supplies_query:
-        event.time_change += timedelta(hours=7)
-        formatted_time = event.time_change.strftime('%Y/%m/%d %H:%M')
+        formatted_time = timezone.localtime(event.time_change).strftime('%Y/%m/%d %H:%M')
         formatted_changes_supplies.append({
             'action_time': formatted_time,
             'object_repr': event.printer,
@@ -150,8 +187,7 @@ def create_events(supplies_query: QuerySet[ChangeSupply], errors_query: QuerySet
         })
     formatted_errors = []
     for event in errors_query:
-        event.event_date += timedelta(hours=7)
-        formatted_time = event.event_date.strftime('%Y/%m/%d %H:%M')
+        formatted_time = timezone.localtime(event.event_date).strftime('%Y/%m/%d %H:%M')
         formatted_errors.append({
             'action_time': formatted_time,
             'object_repr': event.printer,
@@ -161,32 +197,13 @@ def create_events(supplies_query: QuerySet[ChangeSupply], errors_query: QuerySet
 
     formatted_admin_log = []
     for event in admin_log_query:
-        change_message = event.change_message
-        if event.action_flag == 1:
-            event.change_message = 'Добавление объекта'
-        elif event.action_flag == 2:
-            event.change_message = 'Изменены поля ('
-            parsed_data = json.loads(change_message)
-            for item in parsed_data:
-                try:
-                    fields = item['changed']['fields']
-                except KeyError as e:
-                    continue
-                for field in fields:
-                    event.change_message += f'{field}, '
-            event.change_message = f'{event.change_message[:-2]})'
-        elif event.action_flag == 3:
-            event.change_message = 'Удаление объекта'
-        else:
-            event.change_message = 'Масоны'
-
-        event.action_time += timedelta(hours=7)
-        formatted_time = event.action_time.strftime('%Y/%m/%d %H:%M')
+        formatted_time = timezone.localtime(event.action_time).strftime('%Y/%m/%d %H:%M')
 
         formatted_admin_log.append({
             'action_time': formatted_time,
             'object_repr': event.object_repr,
-            'description': f'Пользователь: {event.user}, Действие: {event.change_message}',
+            'description': f'Пользователь: {event.user}, '
+                           f'Действие: {render_admin_action(event.action_flag, event.change_message)}',
             'type': 'Информация',
         })
 
@@ -199,6 +216,14 @@ def create_events(supplies_query: QuerySet[ChangeSupply], errors_query: QuerySet
 
 
 def log_user_action(view_func):
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _wrapped_async_view(request, *args, **kwargs):
+            user = await request.auser()
+            logger_user_actions.info(f'User {user.username} "GET {request.build_absolute_uri()}"')
+            return await view_func(request, *args, **kwargs)
+        return _wrapped_async_view
+
     @wraps(view_func)
     def _wrapped_view(request, *args, **kwargs):
         logger_user_actions.info(f'User {request.user.username} "GET {request.build_absolute_uri()}"')
@@ -206,48 +231,81 @@ def log_user_action(view_func):
     return _wrapped_view
 
 
-@login_required(login_url='/accounts/login')
-@log_user_action
-def index(request):
-    if 'printer_id' in request.session:
-        printer_id = request.session.pop('printer_id')
+def async_login_required(view_func):
+    @wraps(view_func)
+    async def _wrapped_view(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path(), '/accounts/login')
+        return await view_func(request, *args, **kwargs)
+    return _wrapped_view
 
-    return_dict = update_info()
+
+dashboard_executor = ThreadPoolExecutor(max_workers=settings.DASHBOARD_QUERY_WORKERS,
+                                        thread_name_prefix='dashboard-query')
+
+
+def run_context_in_own_connection(get_context) -> dict:
+    try:
+        context = get_context()
+        for value in context.values():
+            if isinstance(value, QuerySet):
+                len(value)
+        return context
+    finally:
+        close_old_connections()
+
+
+async def gather_contexts(*get_contexts) -> dict:
+    loop = asyncio.get_running_loop()
+    contexts = await asyncio.gather(*(loop.run_in_executor(dashboard_executor, contextvars.copy_context().run,
+                                                           run_context_in_own_connection, get_context)
+                                      for get_context in get_contexts))
+    return_dict = dict()
+    for context in contexts:
+        return_dict.update(context)
+    return return_dict
+
+
+def get_black_cart_context(printers) -> dict:
     printers_with_black_cart = PrinterSupplyStatus.objects.filter(supply__type='cartridge',
                                                                   supply__color='black')
-    return_dict['printers_with_black_cart'] = printers_with_black_cart
+    return_dict = {'printers_with_black_cart': printers_with_black_cart}
 
     try:
         black_cart_printer_ids = {status.printer_id for status in printers_with_black_cart}
-        printers_without_black_cart = [printer for printer in return_dict['printers'] if printer.id not in
-                                       black_cart_printer_ids]
+        printers_without_black_cart = [printer for printer in printers if printer.id not in black_cart_printer_ids]
         return_dict['printers_without_black_cart'] = printers_without_black_cart
     except Exception as e:
         logger_main.warning(f'def update_info: {e}, Lack of data in the database: printers_with_black_cart')
 
+    return return_dict
+
+
+def get_latest_stats_context() -> dict:
     latest_stats = Statistics.objects.values('printer_id').annotate(max_time=Max('time_collect')).values('printer_id',
                                                                                                          'max_time')
 
     printers_latest_stats = Statistics.objects.filter(printer_id__in=latest_stats.values('printer_id'),
                                                         time_collect__in=latest_stats.values('max_time'))
 
-    printers_total_stats = get_variables_stats(printers_latest_stats, '')
-    return_dict.update(printers_total_stats)
+    return get_variables_stats(printers_latest_stats, '')
 
+
+def get_daily_stats_context() -> dict:
     latest_daily_stats = DailyStat.objects.values('printer_id').annotate(max_time=Max('time_collect')).values(
         'printer_id', 'max_time')
 
     printers_latest_daily_stats = DailyStat.objects.filter(printer_id__in=latest_daily_stats.values('printer_id'),
                                                            time_collect__in=latest_daily_stats.values('max_time'))
     printers_total_daily_stats = get_variables_stats(printers_latest_daily_stats, 'daily_')
-    return_dict.update(printers_total_daily_stats)
+    return_dict = dict(printers_total_daily_stats)
 
     try:
         latest_time_collect = DailyStat.objects.order_by('-time_collect').values_list('time_collect',
                                                                                       flat=True).distinct()[1]
-        latest_time_collect -= timedelta(days=1)
-        formatted_latest_time_collect = latest_time_collect.strftime('%Y-%m-%d') if latest_time_collect else None
-        second_latest_stats = DailyStat.objects.filter(time_collect__date=formatted_latest_time_collect)
+        latest_collect_date = timezone.localtime(latest_time_collect).date() - timedelta(days=1)
+        second_latest_stats = DailyStat.objects.filter(collect_date=latest_collect_date)
         printers_total_yesterday_stats = get_variables_stats(second_latest_stats, 'yesterday_')
         return_dict.update(printers_total_yesterday_stats)
         return_dict['percent_daily_pages'] = calculate_percentage(printers_total_daily_stats['sum_total_daily_page'],
@@ -265,63 +323,75 @@ def index(request):
     except Exception as e:
         logger_main.warning(f'def index: {e}, Lack of data in the database: percent daily statistics')
 
-    with connection.cursor() as cursor:
-        cursor.execute('''
-                WITH ranked_stats AS (
-                    SELECT *,
-                           ROW_NUMBER() OVER (PARTITION BY printer_id ORDER BY time_collect DESC) AS rn
-                      FROM daily_statistics
-                )
-                SELECT id, page, print, copies, scan, time_collect AT TIME ZONE 'UTC' AT TIME ZONE 
-                'UTC+7' as time_collect, printer_id, rn
-                  FROM ranked_stats
-                 WHERE rn <= 7;
-            ''')
-        printer_all_week_stats = cursor.fetchall()
-    df_printer_all_week_stats = pd.DataFrame(printer_all_week_stats,
-                                                 columns=['id', 'page', 'print', 'copies',
-                                                          'scan', 'time_collect', 'printer_id', 'rn'])
-    daily_stats = df_printer_all_week_stats.groupby('time_collect').sum()
-    sum_total_weekly_page = daily_stats['page'].sum()
-    sum_total_weekly_print = daily_stats['print'].sum()
-    sum_total_weekly_scan = daily_stats['scan'].sum()
-    sum_total_weekly_copies = daily_stats['copies'].sum()
-
-    end_date_months = (DailyStat.objects.aggregate(Max('time_collect'))['time_collect__max'])
+    return return_dict
+
+
+def get_weekly_stats_context() -> dict:
+    weekly_stats = FleetDailyStat.objects.order_by('-date')[:7]
+    sum_total_weekly = FleetDailyStat.objects.filter(id__in=weekly_stats.values('id')).aggregate(
+        total_page=Sum('page'), total_print=Sum('print'), total_scan=Sum('scan'), total_copies=Sum('copies'))
+
+    return {'sum_total_weekly_page': sum_total_weekly['total_page'] or 0,
+            'sum_total_weekly_print': sum_total_weekly['total_print'] or 0,
+            'sum_total_weekly_scan': sum_total_weekly['total_scan'] or 0,
+            'sum_total_weekly_copies': sum_total_weekly['total_copies'] or 0}
+
+
+def get_monthly_total_context() -> dict:
+    end_date_months = FleetDailyStat.objects.aggregate(Max('date'))['date__max']
     if end_date_months is not None:
         start_date_months = end_date_months - timedelta(days=30)
-        start_date_months = start_date_months.replace(hour=0, minute=0, second=0, microsecond=0)
-        total_sum_all_printers = DailyStat.objects.filter(
-            time_collect__range=(start_date_months, end_date_months)).aggregate(Sum('page'))
+        total_sum_all_printers = FleetDailyStat.objects.filter(
+            date__range=(start_date_months, end_date_months)).aggregate(Sum('page'))
     else:
         total_sum_all_printers = 0
 
-    update_return_dict = {'sum_total_weekly_page': sum_total_weekly_page, 'sum_total_weekly_print':
-            sum_total_weekly_print, 'sum_total_weekly_scan': sum_total_weekly_scan, 'sum_total_weekly_copies':
-                                  sum_total_weekly_copies, 'total_sum_all_printers': total_sum_all_printers}
+    return {'total_sum_all_printers': total_sum_all_printers}
 
-    return_dict.update(update_return_dict)
 
-    return render(request, 'monitoring/printers.html', return_dict)
+def get_index_context() -> dict:
+    return_dict = update_info()
+    return_dict.update(get_black_cart_context(return_dict.get('printers')))
+    for get_context in (get_latest_stats_context, get_daily_stats_context, get_weekly_stats_context,
+                        get_monthly_total_context):
+        return_dict.update(get_context())
+    return return_dict
+
+
+async def aget_index_context() -> dict:
+    return await gather_contexts(update_info, partial(get_black_cart_context, Printer.objects.all()),
+                                 get_latest_stats_context, get_daily_stats_context, get_weekly_stats_context,
+                                 get_monthly_total_context)
 
 
 @login_required(login_url='/accounts/login')
 @log_user_action
-def single_printer(request, printer_id):
-    printer = get_object_or_404(Printer, pk=printer_id)
+def index(request):
+    if 'printer_id' in request.session:
+        printer_id = request.session.pop('printer_id')
 
-    request.session['printer_id'] = printer_id
+    return render(request, 'monitoring/printers.html', get_index_context())
 
-    return_dict = update_info()
 
-    printer_supplies = PrinterSupplyStatus.objects.filter(printer=printer)
-    return_dict['printer_supplies'] = printer_supplies
+@async_login_required
+@log_user_action
+async def index_async(request):
+    await sync_to_async(request.session.pop)('printer_id', None)
+
+    return_dict = await aget_index_context()
+
+    return await sync_to_async(render)(request, 'monitoring/printers.html', return_dict)
+
 
+def get_printer_supplies_context(printer) -> dict:
+    return {'printer_supplies': PrinterSupplyStatus.objects.filter(printer=printer)}
+
+
+def get_printer_daily_stats_context(printer_id) -> dict:
     printer_stats = Statistics.objects.filter(printer_id=printer_id).order_by('-time_collect')[:1]
     printer_daily_stats = DailyStat.objects.filter(printer_id=printer_id).order_by('-time_collect')[:1]
     printer_yesterday_daily_stats = DailyStat.objects.filter(printer_id=printer_id).order_by('-time_collect')[1:2]
-    printer_weekly_stats = DailyStat.objects.filter(printer_id=printer_id).order_by('-time_collect')[:7]
-    last_monthly_stats = DailyStat.objects.filter(printer_id=printer_id).order_by('-time_collect')[:30]
+    return_dict = {'printer_stats': printer_stats, 'printer_daily_stats': printer_daily_stats}
 
     printers_total_daily_stats = get_variables_stats(printer_daily_stats, 'daily_')
     return_dict.update(printers_total_daily_stats)
@@ -337,22 +407,29 @@ def single_printer(request, printer_id):
                                               printers_total_yesterday_stats['sum_total_yesterday_scan'])
     return_dict['percent_daily_copies'] = calculate_percentage(printers_total_daily_stats['sum_total_daily_copies'],
                                                 printers_total_yesterday_stats['sum_total_yesterday_copies'])
+    return return_dict
 
-    printers_weekly_stats = get_variables_stats(printer_weekly_stats, 'weekly_')
-    return_dict.update(printers_weekly_stats)
 
-    total_month_sum = last_monthly_stats.aggregate(total_sum=Sum(F('page')))['total_sum']
+def get_printer_period_stats_context(printer_id) -> dict:
+    printer_weekly_stats = DailyStat.objects.filter(printer_id=printer_id).order_by('-time_collect')[:7]
+    last_monthly_stats = DailyStat.objects.filter(printer_id=printer_id).order_by('-time_collect')[:30]
 
-    update_return_dict = {'printer': printer, 'printer_stats': printer_stats, 'printer_daily_stats':
-        printer_daily_stats, 'total_month_sum': total_month_sum}
+    return_dict = get_variables_stats(printer_weekly_stats, 'weekly_')
+    return_dict['total_month_sum'] = last_monthly_stats.aggregate(total_sum=Sum(F('page')))['total_sum']
+    return return_dict
 
+
+def get_printer_events_context(printer) -> dict:
     latest_events = timezone.now() - timedelta(days=30)
-    recent_changes_supplies = ChangeSupply.objects.filter(printer_id=printer_id, time_change__gte=latest_events)
-    recent_errors = PrinterError.objects.filter(printer_id=printer_id, event_date__gte=latest_events)
-    recent_admin_log = LogEntry.objects.filter(object_repr=printer, action_time__gte=latest_events)
+    recent_changes_supplies = ChangeSupply.objects.filter(printer_id=printer.id, time_change__gte=latest_events)
+    recent_errors = PrinterError.objects.filter(printer_id=printer.id, event_date__gte=latest_events)
+    recent_admin_log = get_printer_admin_log(printer.id).select_related('user').filter(action_time__gte=latest_events)
     events_single_printer_small = create_events(recent_changes_supplies, recent_errors, recent_admin_log)[:10]
-    return_dict['events_single_printer_small'] = events_single_printer_small
+    return {'events_single_printer_small': events_single_printer_small}
+
 
+def get_printer_forecast_context(printer_id) -> dict:
+    return_dict = dict()
     try:
         printer_cost = MaintenanceCosts.objects.filter(
             printer_id=printer_id).order_by('id')[0]
@@ -362,36 +439,95 @@ def single_printer(request, printer_id):
             total_pages=Sum('daily_pages'))
 
         first_forecast_date = Forecast.objects.aggregate(first_forecast_date=Min('forecast_date'))['first_forecast_date']
-        month_forecast = first_forecast_date.strftime("%B %Y")
+        month_forecast = format_month_year(first_forecast_date)
 
-        update_return_dict['printer_cost'] = printer_cost
-        update_return_dict['printer_forecast'] = printer_forecast
-        update_return_dict['month_forecast'] = month_forecast
+        return_dict['printer_cost'] = printer_cost
+        return_dict['printer_forecast'] = printer_forecast
+        return_dict['month_forecast'] = month_forecast
 
     except Exception as e:
         logger_main.warning(f'def single_printer: {e}, Lack of data in the database: forecast info')
 
-    return_dict.update(update_return_dict)
+    return return_dict
+
+
+def get_printer_contexts(printer) -> tuple:
+    return (update_info, partial(get_printer_supplies_context, printer),
+            partial(get_printer_daily_stats_context, printer.id), partial(get_printer_period_stats_context, printer.id),
+            partial(get_printer_events_context, printer), partial(get_printer_forecast_context, printer.id))
+
+
+@login_required(login_url='/accounts/login')
+@log_user_action
+def single_printer(request, printer_id):
+    printer = get_object_or_404(Printer, pk=printer_id)
+
+    request.session['printer_id'] = printer_id
+
+    return_dict = {'printer': printer}
+    for get_context in get_printer_contexts(printer):
+        return_dict.update(get_context())
 
     return render(request, 'monitoring/single_printer.html', return_dict)
 
 
+@async_login_required
+@log_user_action
+async def single_printer_async(request, printer_id):
+    printer = await aget_object_or_404(Printer, pk=printer_id)
+
+    await sync_to_async(request.session.__setitem__)('printer_id', printer_id)
+
+    return_dict = await gather_contexts(*get_printer_contexts(printer))
+    return_dict['printer'] = printer
+
+    return await sync_to_async(render)(request, 'monitoring/single_printer.html', return_dict)
+
+
+def get_data_in_js_version(request, nm_data) -> tuple:
+    if not hasattr(request, 'data_in_js_version'):
+        printer_id = request.session.get('printer_id')
+        if nm_data in ('week-stats', 'month-stats'):
+            if printer_id:
+                version = DailyStat.objects.filter(printer_id=printer_id).aggregate(
+                    last_modified=Max('time_collect'), last_id=Max('id'))
+            else:
+                version = FleetDailyStat.objects.aggregate(last_modified=Max('time_update'), last_id=Max('id'))
+        elif nm_data in ('year-print-stats', 'three-months-print-stats'):
+            version = MonthlyStat.objects.aggregate(last_modified=Max('time_collect'), last_id=Max('id'))
+        else:
+            version = Forecast.objects.aggregate(last_id=Max('id'))
+        request.data_in_js_version = (version.get('last_modified'), version['last_id'])
+    return request.data_in_js_version
+
+
+def data_in_js_last_modified(request, nm_data):
+    return get_data_in_js_version(request, nm_data)[0]
+
+
+def data_in_js_etag(request, nm_data):
+    last_modified, last_id = get_data_in_js_version(request, nm_data)
+    timestamp = last_modified.timestamp() if last_modified else ''
+    return f"{nm_data}-{request.session.get('printer_id') or 'all'}-{last_id}-{timestamp}"
+
+
 @login_required(login_url='/accounts/login')
+@condition(etag_func=data_in_js_etag, last_modified_func=data_in_js_last_modified)
 def data_in_js(request, nm_data):
     def switch_case(value: str):
         printer_id = request.session.get('printer_id')
         switcher = {
-            'week-stats': lambda: process_few_days_printer_stats(printer_id, 7, '%A'),
-            'month-stats': lambda: process_few_days_printer_stats(printer_id, 30, '%d.%m'),
+            'week-stats': lambda: process_few_days_printer_stats(printer_id, 7, format_weekdays),
+            'month-stats': lambda: process_few_days_printer_stats(printer_id, 30, format_days_months),
             'year-print-stats': lambda: get_few_months_print_stats(12),
             'three-months-print-stats': lambda: get_few_months_print_stats(3),
             'forecast': lambda: get_forecast_stats(printer_id)
         }
         return switcher.get(value, lambda: {"error": "Invalid value", "code": 400})()
 
-    def process_few_days_printer_stats(printer_id, qty_days: int, time_format: str) -> dict:
+    def process_few_days_printer_stats(printer_id, qty_days: int, format_days) -> dict:
         stats = create_printer_stats(qty_days)
-        filling_printer_stats(printer_id, stats, qty_days, time_format)
+        filling_printer_stats(printer_id, stats, qty_days, format_days)
 
         if qty_days == 30:
             return {'data_monthly_page': stats}
@@ -406,24 +542,24 @@ def data_in_js(request, nm_data):
             stats['total'] = []
         return stats
 
-    def filling_printer_stats(printer_id, stats: dict, qty_days: int, time_format: str):
+    def filling_printer_stats(printer_id, stats: dict, qty_days: int, format_days):
         if printer_id:
             printer_stats = DailyStat.objects.filter(printer_id=printer_id).order_by('-time_collect')[:qty_days]
-            process_printer_stats(printer_stats, stats, time_format)
+            process_printer_stats(printer_stats, stats, format_days)
         else:
             printers_stats = get_all_printer_stats(qty_days)
-            process_all_printers_stats(printers_stats, stats, time_format, qty_days)
+            process_all_printers_stats(printers_stats, stats, format_days)
 
-    def process_printer_stats(queryset: dict, stats: dict, time_format: str):
+    def process_printer_stats(queryset: dict, stats: dict, format_days):
+        days = list()
         for stat in reversed(queryset):
             if 'total' in stats:
                 stats['total'].append(stat.page)
             stats['print'].append(stat.print)
             stats['scan'].append(stat.scan)
             stats['copies'].append(stat.copies)
-            str_day = str(stat.time_collect)
-            datetime_obj = datetime.fromisoformat(str_day) + timedelta(hours=7)
-            stats['day'].append(datetime_obj.strftime(time_format).capitalize())
+            days.append(stat.collect_date)
+        stats['day'] += format_days(days)
         if len(stats['print']) < 7:
             missing_count = 7 - len(stats['print'])
             zero_fill = [0] * missing_count
@@ -431,19 +567,8 @@ def data_in_js(request, nm_data):
                 stats[key] += zero_fill
 
     def get_all_printer_stats(qty_days):
-        with connection.cursor() as cursor:
-            cursor.execute(f'''
-                WITH ranked_stats AS (
-                    SELECT *,
-                           ROW_NUMBER() OVER (PARTITION BY printer_id ORDER BY time_collect DESC) AS rn
-                      FROM daily_statistics
-                )
-                SELECT id, page, print, copies, scan, time_collect AT TIME ZONE 'UTC' AT TIME ZONE 
-                'UTC+7' as time_collect, printer_id, rn
-                  FROM ranked_stats
-                 WHERE rn <= {qty_days};
-            ''')
-            return cursor.fetchall()
+        return reversed(list(FleetDailyStat.objects.order_by('-date').values(
+            'date', 'page', 'print', 'copies', 'scan')[:qty_days]))
 
     def calculate_max_values(week_stats):
         return {
@@ -451,31 +576,16 @@ def data_in_js(request, nm_data):
             for key, val in week_stats.items()
         }
 
-    def process_all_printers_stats(queryset: dict, stats: dict, time_format: str, qty_days: int):
-        df_printer_all_stats = pd.DataFrame(queryset, columns=['id', 'page', 'print', 'copies',
-                                                               'scan', 'time_collect', 'printer_id', 'rn'])
-
-        df_printer_all_stats['time_collect'] = pd.to_datetime(df_printer_all_stats['time_collect']).dt.strftime(
-            '%Y-%m-%d')
-        daily_stats = df_printer_all_stats.groupby('time_collect').sum()
-
-        daily_stats = check_compliance_qty_days(daily_stats, qty_days)
-
-        if 'total' in stats:
-            stats['total'] = daily_stats['page'].tolist()
-        stats['print'] = daily_stats['print'].tolist()
-        stats['scan'] = daily_stats['scan'].tolist()
-        stats['copies'] = daily_stats['copies'].tolist()
-        day_stats_res = daily_stats.index.tolist()
-        for day in day_stats_res:
-            str_day = str(day)
-            datetime_obj = datetime.fromisoformat(str_day)
-            stats['day'].append(datetime_obj.strftime(time_format).capitalize())
-
-    def check_compliance_qty_days(statistics, qty_days):
-        if len(statistics) > qty_days:
-            statistics = statistics.iloc[1:]
-        return statistics
+    def process_all_printers_stats(queryset, stats: dict, format_days):
+        days = list()
+        for stat in queryset:
+            if 'total' in stats:
+                stats['total'].append(stat['page'])
+            stats['print'].append(stat['print'])
+            stats['scan'].append(stat['scan'])
+            stats['copies'].append(stat['copies'])
+            days.append(stat['date'])
+        stats['day'] += format_days(days)
 
     def prepare_weekly_stats(week_stats, max_val):
         data_weekly_stats = {}
@@ -512,25 +622,22 @@ def data_in_js(request, nm_data):
     def fetch_few_months_print_stats(qty_months):
         with connection.cursor() as cursor:
             cursor.execute(f'''
-                SELECT DATE_TRUNC('month', time_collect) AS month_date, SUM(print) AS total_sum
+                SELECT DATE_TRUNC('month', collect_date) AS month_date, SUM(print) AS total_sum
                 FROM (
-                    SELECT printer_id, print, time_collect,
+                    SELECT printer_id, print, collect_date,
                            ROW_NUMBER() OVER (PARTITION BY printer_id ORDER BY time_collect DESC) AS rn
                     FROM public.monthly_statistics
                 ) AS sub
                 WHERE rn <= {qty_months}
-                GROUP BY DATE_TRUNC('month', time_collect)
-                ORDER BY DATE_TRUNC('month', time_collect) DESC;
+                GROUP BY DATE_TRUNC('month', collect_date)
+                ORDER BY DATE_TRUNC('month', collect_date) DESC;
             ''')
             return cursor.fetchall()
 
     def process_few_months_print_stats(year_print_stats):
         df_year_print_stats = pd.DataFrame(year_print_stats, columns=['month_date', 'total_sum'])
 
-        labels = [
-            f"{months_map[datetime.fromisoformat(str(day)).month - 1]} {datetime.fromisoformat(str(day)).year}"
-            for day in reversed(df_year_print_stats['month_date'].tolist())
-        ]
+        labels = format_months_years(reversed(df_year_print_stats['month_date'].tolist()))
 
         values = [str(value) for value in reversed(df_year_print_stats['total_sum'].tolist())]
 
@@ -570,15 +677,14 @@ def data_in_js(request, nm_data):
 
         df_printer_forecast = pd.DataFrame(printer_forecast, columns=['forecast_date', value_field])
         forecast_stats['total'] = df_printer_forecast[value_field].tolist()
-        day_month_forecast_res = df_printer_forecast['forecast_date'].tolist()
-        for day in day_month_forecast_res:
-            str_day = str(day)
-            datetime_obj = datetime.fromisoformat(str_day)
-            forecast_stats['day'].append(datetime_obj.strftime('%d.%m').capitalize())
+        forecast_stats['day'] = format_days_months(df_printer_forecast['forecast_date'].tolist())
 
         return {'forecast_data_chart': forecast_stats}
 
-    return JsonResponse(switch_case(nm_data))
+    response = JsonResponse(switch_case(nm_data))
+    patch_cache_control(response, private=True, no_cache=True)
+
+    return response
 
 
 @login_required(login_url='/accounts/login')
@@ -601,12 +707,16 @@ def reports(request):
                 selected_area = form_printers.cleaned_data['area']
                 if selected_area != 'all':
                     html_name_report += f'({get_area_name(selected_area)})'
+                    subnet_ids = list(Subnet.objects.filter(name=selected_area).values_list('id', flat=True))
                     printers_supplies = PrinterSupplyStatus.objects.filter(
-                        printer__ip_address__subnet__name=selected_area
+                        printer__ip_address__subnet_id__in=subnet_ids
                     )
-                    printers_without_supplies = Printer.objects.annotate(
-                        supplies_count=Count('printersupplystatus')
-                    ).filter(supplies_count=0, ip_address__subnet__name=selected_area)
+                    if SubnetStat.objects.filter(subnet_id__in=subnet_ids,
+                                                 qty_printers_without_supplies__gt=0).exists():
+                        printers_without_supplies = Printer.objects.filter(
+                            ip_address__subnet_id__in=subnet_ids, printersupplystatus__isnull=True)
+                    else:
+                        printers_without_supplies = Printer.objects.none()
                 else:
                     printers_supplies = PrinterSupplyStatus.objects.all()
                     printers_without_supplies = Printer.objects.annotate(
@@ -633,8 +743,8 @@ def reports(request):
                 selected_option = form_statistics.cleaned_data['option']
                 date_field = form_statistics.cleaned_data['date_field']
 
-                first_time_collect = Statistics.objects.earliest('time_collect').time_collect.date()
-                last_time_collect = Statistics.objects.latest('time_collect').time_collect.date()
+                first_time_collect = Statistics.objects.earliest('time_collect').collect_date
+                last_time_collect = Statistics.objects.latest('time_collect').collect_date
 
                 if first_time_collect <= date_field <= last_time_collect:
                     context = dict()
@@ -644,14 +754,14 @@ def reports(request):
                             printers = Printer.objects.filter(ip_address__subnet__name=selected_area)
                             printers_list = list()
                             for printer in printers:
-                                stats = Statistics.objects.filter(printer_id=printer, time_collect__date=date_field)
+                                stats = Statistics.objects.filter(printer_id=printer, collect_date=date_field)
                                 printers_list.append({'printer': printer, 'stats': stats})
                                 context['printers'] = printers_list
                         else:
                             html_name_report += f' на {date_field}'
                             printers_list = list()
                             for printer in return_dict['printers']:
-                                stats = Statistics.objects.filter(printer_id=printer, time_collect__date=date_field)
+                                stats = Statistics.objects.filter(printer_id=printer, collect_date=date_field)
                                 printers_list.append({'printer': printer, 'stats': stats})
                             context['printers'] = printers_list
                         context['html_name_report'] = html_name_report
@@ -664,7 +774,7 @@ def reports(request):
                             printers_list = list()
                             for printer in printers:
                                 stats = Statistics.objects.filter(printer_id=printer,
-                                                                  time_collect__date=date_field).annotate(
+                                                                  collect_date=date_field).annotate(
                                     page_count=F(selected_option)).values('page_count')
                                 printers_list.append({'printer': printer, 'stats': stats})
                             context['printers'] = printers_list
@@ -673,7 +783,7 @@ def reports(request):
                             printers_list = list()
                             for printer in return_dict['printers']:
                                 stats = Statistics.objects.filter(printer_id=printer,
-                                                                  time_collect__date=date_field).annotate(
+                                                                  collect_date=date_field).annotate(
                                     page_count=F(selected_option)).values('page_count')
                                 printers_list.append({'printer': printer, 'stats': stats})
                             context['printers'] = printers_list
@@ -701,8 +811,8 @@ def reports(request):
                     context = {'error': 'Дата начала периода не может быть позже даты конца. Повторите ввод.'}
                     return render(request, 'monitoring/single_report/report-errors.html', context)
 
-                first_time_collect = Statistics.objects.earliest('time_collect').time_collect.date()
-                last_time_collect = Statistics.objects.latest('time_collect').time_collect.date()
+                first_time_collect = Statistics.objects.earliest('time_collect').collect_date
+                last_time_collect = Statistics.objects.latest('time_collect').collect_date
 
                 if (first_time_collect <= date_start <= last_time_collect
                         and first_time_collect <= date_end <= last_time_collect):
@@ -754,12 +864,12 @@ def reports(request):
                                 {'printer': printer, 'page': page_generator, 'total_page': sum(page_generator)})
                         context['printers'] = printers_list
 
-                        total_stats = DailyStat.objects.filter(
-                            time_collect__range=(start_datetime, end_datetime),
-                            printer__ip_address__subnet__name=selected_area
-                        ).values('time_collect__date').annotate(
+                        total_stats = SubnetDailyStat.objects.filter(
+                            date__range=(date_start, date_end),
+                            subnet__name=selected_area
+                        ).values('date').annotate(
                             total_pages=Sum(selected_option)
-                        ).order_by('time_collect__date')
+                        ).order_by('date')
                         total_sum = total_stats.aggregate(total=Sum('total_pages'))['total']
                         context['total_stats'] = total_stats
                         context['total_sum'] = total_sum
@@ -790,10 +900,10 @@ def reports(request):
                                 {'printer': printer, 'page': page_generator, 'total_page': sum(page_generator)})
                         context['printers'] = printers_list
 
-                        total_stats = DailyStat.objects.filter(time_collect__range=(start_datetime, end_datetime)) \
-                            .values('time_collect__date') \
+                        total_stats = FleetDailyStat.objects.filter(date__range=(date_start, date_end)) \
+                            .values('date') \
                             .annotate(total_pages=Sum(selected_option)) \
-                            .order_by('time_collect__date')
+                            .order_by('date')
                         total_sum = total_stats.aggregate(total=Sum('total_pages'))['total']
                         context['total_stats'] = total_stats
                         context['total_sum'] = total_sum
@@ -825,21 +935,14 @@ def reports(request):
 
                 context = dict()
 
-                month_start_index = date_start.month - 1
-                formated_month_start = months_map[month_start_index]
-                month_end_index = date_end.month - 1
-                formated_month_end = months_map[month_end_index]
                 html_name_report += (f'{get_report_option(selected_option)} за период '
-                                     f'с {formated_month_start} {date_start.year} по {formated_month_end} '
-                                     f'{date_end.year} ')
+                                     f'с {format_month_year(date_start)} по {format_month_year(date_end)} ')
 
                 formatted_dates = []
                 current_date = date_start
 
                 while current_date <= date_end:
-                    month_index = current_date.month - 1
-                    formated_month = months_map[month_index]
-                    formatted_dates.append(f"{formated_month} {current_date.year}")
+                    formatted_dates.append(format_month_year(current_date))
                     current_date += relativedelta(months=1)
 
                 context['dates'] = formatted_dates
@@ -853,14 +956,12 @@ def reports(request):
                     ).order_by('id').values('printer_id', selected_option, 'time_collect')
                     return_dict['printers'] = Printer.objects.filter(ip_address__subnet__name=selected_area)
 
-                    total_stats = MonthlyStat.objects.filter(
-                        time_collect__range=(date_start, end_datetime),
-                        printer__ip_address__subnet__name=selected_area
-                    ).annotate(
-                        month=TruncMonth('time_collect')
-                    ).values('month').annotate(
+                    total_stats = SubnetMonthlyStat.objects.filter(
+                        date__range=(date_start.replace(day=1), end_datetime.date()),
+                        subnet__name=selected_area
+                    ).values('date').annotate(
                         total_pages=Sum(selected_option)
-                    ).order_by('month')
+                    ).order_by('date')
                     total_sum = total_stats.aggregate(total=Sum('total_pages'))['total']
                     context['total_stats'] = total_stats
                     context['total_sum'] = total_sum
@@ -911,8 +1012,8 @@ def reports(request):
                     context = {'error': 'Дата начала периода не может быть позже даты конца. Повторите ввод.'}
                     return render(request, 'monitoring/single_report/report-errors.html', context)
 
-                first_time_collect = Statistics.objects.earliest('time_collect').time_collect.date()
-                last_time_collect = Statistics.objects.latest('time_collect').time_collect.date()
+                first_time_collect = Statistics.objects.earliest('time_collect').collect_date
+                last_time_collect = Statistics.objects.latest('time_collect').collect_date
 
                 if (first_time_collect <= date_start <= last_time_collect
                         and first_time_collect <= date_end <= last_time_collect):
@@ -971,9 +1072,9 @@ def reports(request):
                             printer_id=printer,
                             time_change__gte=start_datetime,
                             time_change__lte=end_datetime
-                        ).annotate(time_change_adjusted=F('time_change') + timedelta(hours=7))
+                        ).annotate(change_date=TruncDate('time_change'))
                         for change in changes:
-                            key = change.time_change_adjusted.strftime('%d.%m.%Y')
+                            key = change.change_date.strftime('%d.%m.%Y')
                             dict_change[key] += ', ' if dict_change[key] != '' else ''
                             dict_change[key] += f"{change.supply}"
                         dicts_all_change.append(dict_change)
@@ -1047,7 +1148,7 @@ def single_report(request, nm_report, qty_days):
         if nm_report == 'event-log':
             all_changes_supplies = ChangeSupply.objects.all()
             all_errors = PrinterError.objects.all()
-            all_admin_log = LogEntry.objects.all()
+            all_admin_log = LogEntry.objects.select_related('user')
 
             context['events_all'] = create_events(all_changes_supplies, all_errors, all_admin_log)
             context['html_name_report'] = 'Отчёт ' + str_nm_report + str_time
@@ -1074,8 +1175,8 @@ def single_report(request, nm_report, qty_days):
 
         else:
             try:
-                first_time_collect = DailyStat.objects.earliest('time_collect').time_collect.date()
-                last_time_collect = DailyStat.objects.latest('time_collect').time_collect.date()
+                first_time_collect = DailyStat.objects.earliest('time_collect').collect_date
+                last_time_collect = DailyStat.objects.latest('time_collect').collect_date
 
                 start_datetime = datetime.strptime(first_time_collect.strftime('%Y-%m-%d'), '%Y-%m-%d')
                 end_datetime = datetime.strptime(last_time_collect.strftime('%Y-%m-%d'), '%Y-%m-%d')
@@ -1115,10 +1216,10 @@ def single_report(request, nm_report, qty_days):
                         {'printer': printer, 'page': page_generator, 'total_page': sum(page_generator)})
                 context['printers'] = printers_list
 
-                total_stats = DailyStat.objects.filter(time_collect__range=(start_datetime, end_datetime)) \
-                    .values('time_collect__date') \
+                total_stats = FleetDailyStat.objects.filter(date__range=(first_time_collect, last_time_collect)) \
+                    .values('date') \
                     .annotate(total_pages=Sum(nm_report)) \
-                    .order_by('time_collect__date')
+                    .order_by('date')
 
                 total_sum = total_stats.aggregate(total=Sum('total_pages'))['total']
                 context['total_stats'] = total_stats
@@ -1136,7 +1237,7 @@ def single_report(request, nm_report, qty_days):
 
             recent_changes_supplies = ChangeSupply.objects.filter(time_change__gte=last_days)
             recent_errors = PrinterError.objects.filter(event_date__gte=last_days)
-            recent_admin_log = LogEntry.objects.filter(action_time__gte=last_days)
+            recent_admin_log = LogEntry.objects.select_related('user').filter(action_time__gte=last_days)
 
             context['html_name_report'] = 'Отчёт ' + str_nm_report + str_time
             context['events_all'] = create_events(recent_changes_supplies, recent_errors, recent_admin_log)
@@ -1169,8 +1270,8 @@ def single_report(request, nm_report, qty_days):
                 return render(request, 'monitoring/single_report/report-errors.html', context)
         else:
             try:
-                first_time_collect = DailyStat.objects.earliest('time_collect').time_collect.date()
-                last_time_collect = DailyStat.objects.latest('time_collect').time_collect.date()
+                first_time_collect = DailyStat.objects.earliest('time_collect').collect_date
+                last_time_collect = DailyStat.objects.latest('time_collect').collect_date
 
                 difference = last_time_collect - first_time_collect
 
@@ -1404,7 +1505,7 @@ def events(request):
 
     recent_changes_supplies = ChangeSupply.objects.filter(time_change__gte=date_90_days)
     recent_errors = PrinterError.objects.filter(event_date__gte=date_90_days)
-    recent_admin_log = LogEntry.objects.filter(action_time__gte=date_90_days)
+    recent_admin_log = LogEntry.objects.select_related('user').filter(action_time__gte=date_90_days)
 
     return_dict['events_all'] = create_events(recent_changes_supplies, recent_errors, recent_admin_log)
 
@@ -1423,7 +1524,7 @@ def forecast(request):
         first_forecast_date=Min('forecast_date'))['first_forecast_date']
 
     try:
-        month_forecast = first_forecast_date.strftime("%B %Y")
+        month_forecast = format_month_year(first_forecast_date)
         return_dict['month_forecast'] = month_forecast
 
     except Exception as e:
@@ -1444,15 +1545,56 @@ def forecast(request):
     return render(request, 'monitoring/forecast.html', return_dict)
 
 
-locale.setlocale(locale.LC_TIME, 'ru_RU')
-logger_user_actions = logging.getLogger('user_actions')
-logger_main = logging.getLogger('django')
+def get_collector(request):
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme == 'Token' and token:
+        return CollectorAgent.objects.filter(token=token, is_active=True).first()
+
 
-months_map = [
-                'Январь', 'Февраль', 'Март', 'Апрель', 'Май', 'Июнь', 'Июль', 'Август', 'Сентябрь', 'Октябрь',
-                'Ноябрь', 'Декабрь'
-            ]
+@require_GET
+def collector_config(request):
+    collector = get_collector(request)
+    if collector is None:
+        return JsonResponse({'error': 'Invalid collector token'}, status=401)
 
+    subnets = [f'{subnet.address}/{subnet.mask}' for subnet in collector.subnets.order_by('address')]
+    return JsonResponse({'name': collector.name, 'subnets': subnets})
+
+
+@csrf_exempt
+@require_POST
+def ingest_readings(request):
+    collector = get_collector(request)
+    if collector is None:
+        return JsonResponse({'error': 'Invalid collector token'}, status=401)
+
+    if request.content_type not in INGEST_CONTENT_TYPES:
+        return JsonResponse({'error': f'Unsupported content type {request.content_type}'}, status=415)
+
+    try:
+        readings = decode_readings(request.body, request.content_type, request.headers.get('Content-Encoding', ''))
+    except ValueError as e:
+        logger_main.warning(f'def ingest_readings: {collector}: {e}')
+        return JsonResponse({'error': str(e)}, status=400)
+
+    result = save_readings_to_database(readings)
+    CollectorAgent.objects.filter(pk=collector.pk).update(last_seen=timezone.now())
+
+    return JsonResponse(result)
+
+
+@require_GET
+def metrics(request):
+    if not request.user.is_staff and request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+
+    task_summary = summarize_task_runs(TaskRun.objects.defer('device_timings'))
+    return HttpResponse(render_prometheus_metrics(metrics_registry.snapshot()) + render_task_metrics(task_summary),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+logger_user_actions = logging.getLogger('user_actions')
+logger_main = logging.getLogger('django')
 
 class CustomErrorView(View):
     def get(self, request, *args, **kwargs):
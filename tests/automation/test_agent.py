@@ -0,0 +1,135 @@
+import gzip
+import json
+import requests
+from django.test import SimpleTestCase
+from unittest.mock import patch, MagicMock
+from automation.agent import (AgentPrinter, ReadingsBuffer, collect_readings, ship_readings, fetch_subnets,
+                              DEFAULT_CONFIG)
+
+
+class AgentPrinterTest(SimpleTestCase):
+    def test_known_stamp(self):
+        printer = AgentPrinter('192.168.1.10', 'Hewlett-Packard', 'LaserJet M283fdn', 'SN1')
+
+        self.assertEqual(printer.model.stamp.name, 'Hewlett-Packard')
+        self.assertEqual(printer.ip_address.address, '192.168.1.10')
+
+    def test_unknown_stamp(self):
+        printer = AgentPrinter('192.168.1.10', 'KATUSHA_M247', 'M247', 'SN1')
+
+        self.assertEqual(printer.model.stamp.name, 'Katusha')
+
+
+class ReadingsBufferTest(SimpleTestCase):
+    def setUp(self):
+        self.buffer = ReadingsBuffer(':memory:')
+
+    def test_append_and_remove(self):
+        self.buffer.append([{'serial_number': 'SN1'}, {'serial_number': 'SN2'}])
+
+        pending = self.buffer.pending(10)
+        self.assertEqual([json.loads(payload)['serial_number'] for _, payload in pending], ['SN1', 'SN2'])
+
+        self.buffer.remove([pending[0][0]])
+        self.assertEqual(self.buffer.count(), 1)
+
+    def test_state(self):
+        self.assertEqual(self.buffer.get_state('subnets', []), [])
+
+        self.buffer.set_state('subnets', ['10.0.0.0/24'])
+
+        self.assertEqual(self.buffer.get_state('subnets'), ['10.0.0.0/24'])
+
+
+@patch('automation.agent.fetch_device_error', return_value=None)
+@patch('automation.agent.fetch_counters', return_value={'page': 10, 'print': 10, 'copies': 0, 'scan': 0})
+@patch('automation.agent.fetch_supply_levels', return_value=[{'color': 'black', 'type': 'cartridge', 'remaining': 50}])
+@patch('automation.agent.checking_activity', return_value=True)
+class CollectReadingsTest(SimpleTestCase):
+    def setUp(self):
+        self.buffer = ReadingsBuffer(':memory:')
+        self.printer = AgentPrinter('192.168.1.10', 'Avision', 'AM30A', 'SN1')
+
+    def test_collect_readings(self, mock_activity, mock_supplies, mock_counters, mock_error):
+        readings = collect_readings([self.printer], self.buffer, counters_hour=0)
+
+        self.assertEqual(readings[0]['page'], 10)
+        self.assertEqual(readings[0]['supplies'][0]['remaining'], 50)
+        self.assertEqual(self.buffer.count(), 1)
+
+    def test_collect_counters_once_a_day(self, mock_activity, mock_supplies, mock_counters, mock_error):
+        collect_readings([self.printer], self.buffer, counters_hour=0)
+        readings = collect_readings([self.printer], self.buffer, counters_hour=0)
+
+        mock_counters.assert_called_once()
+        self.assertNotIn('page', readings[0])
+        self.assertEqual(self.buffer.count(), 2)
+
+    def test_collect_readings_inactive_printer(self, mock_activity, mock_supplies, mock_counters, mock_error):
+        mock_activity.return_value = False
+
+        readings = collect_readings([self.printer], self.buffer, counters_hour=0)
+
+        self.assertEqual(len(readings), 1)
+        self.assertIs(readings[0]['online'], False)
+        self.assertNotIn('supplies', readings[0])
+        mock_supplies.assert_not_called()
+        self.assertEqual(self.buffer.count(), 1)
+
+
+class ShipReadingsTest(SimpleTestCase):
+    def setUp(self):
+        self.buffer = ReadingsBuffer(':memory:')
+        self.buffer.append([{'serial_number': 'SN1'}, {'serial_number': 'SN2'}, {'serial_number': 'SN3'}])
+        self.config = {**DEFAULT_CONFIG, 'server_url': 'http://server/', 'token': 'token', 'batch_size': 2}
+
+    @patch('automation.agent.requests.post')
+    def test_ship_readings(self, mock_post):
+        mock_post.return_value = MagicMock(status_code=200, json=lambda: {'unknown': []})
+
+        shipped = ship_readings(self.buffer, self.config)
+
+        self.assertEqual(shipped, 3)
+        self.assertEqual(self.buffer.count(), 0)
+        self.assertEqual(mock_post.call_count, 2)
+        args, kwargs = mock_post.call_args_list[0]
+        self.assertEqual(args[0], 'http://server/api/ingest')
+        self.assertEqual(kwargs['headers']['Authorization'], 'Token token')
+        self.assertEqual(len(gzip.decompress(kwargs['data']).splitlines()), 2)
+
+    @patch('automation.agent.requests.post', side_effect=requests.ConnectionError('unreachable'))
+    def test_ship_readings_server_unreachable(self, mock_post):
+        shipped = ship_readings(self.buffer, self.config)
+
+        self.assertEqual(shipped, 0)
+        self.assertEqual(self.buffer.count(), 3)
+
+    @patch('automation.agent.requests.post')
+    def test_ship_readings_server_error(self, mock_post):
+        mock_post.return_value = MagicMock(status_code=503)
+
+        ship_readings(self.buffer, self.config)
+
+        self.assertEqual(self.buffer.count(), 3)
+
+    @patch('automation.agent.requests.post')
+    def test_ship_readings_rejects_only_malformed_readings(self, mock_post):
+        def post(url, data, headers, timeout):
+            if b'SN2' in gzip.decompress(data):
+                return MagicMock(status_code=400, text='Reading 1: supply must be an object')
+            return MagicMock(status_code=200, json=lambda: {'unknown': []})
+        mock_post.side_effect = post
+
+        shipped = ship_readings(self.buffer, self.config)
+
+        self.assertEqual(shipped, 2)
+        self.assertEqual(self.buffer.count(), 0)
+        self.assertEqual(self.buffer.count_rejected(), 1)
+        self.assertEqual(json.loads(self.buffer.connection.execute(
+            'SELECT payload FROM rejected_readings').fetchone()[0])['serial_number'], 'SN2')
+
+    @patch('automation.agent.requests.get', side_effect=requests.ConnectionError('unreachable'))
+    def test_fetch_subnets_uses_cache(self, mock_get):
+        self.buffer.set_state('subnets', ['10.0.0.0/24'])
+
+        self.assertEqual(fetch_subnets(self.config, self.buffer), ['10.0.0.0/24'])
@@ -0,0 +1,66 @@
+import socket
+from django.test import TestCase, SimpleTestCase
+from monitoring import models
+from automation.benchmark import seed_synthetic_fleet, get_simulated_devices, compare_with_baseline
+from automation.rollups import find_rollup_mismatches
+from automation.snmp_simulator import (SimulatedSnmpAgents, build_get_request, decode_tlv, decode_sequence,
+                                       decode_oid, get_device_oid_values, TAG_GET_RESPONSE, TAG_NO_SUCH_OBJECT)
+from automation.snmp_oid_map import device_snmp_map
+
+
+class SimulatedSnmpAgentsTest(SimpleTestCase):
+    def setUp(self):
+        self.values = get_device_oid_values('hewlett-packard', 'LaserJet', 'SN1', {'print': 12345})
+
+    def send_request(self, agents, oids):
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(1)
+            sock.sendto(build_get_request(b'public', 7, oids), ('127.0.0.1', agents.port))
+            data, _ = sock.recvfrom(65535)
+        _, message, _ = decode_tlv(data)
+        pdu_tag, pdu = decode_sequence(message)[2]
+        self.assertEqual(pdu_tag, TAG_GET_RESPONSE)
+        return [decode_sequence(varbind) for _, varbind in decode_sequence(decode_sequence(pdu)[3][1])]
+
+    def test_agent_answers_device_oids(self):
+        with SimulatedSnmpAgents({'127.0.0.1': self.values}, port=16161) as agents:
+            varbinds = self.send_request(agents, [device_snmp_map['hewlett-packard']['print'], '1.2.3'])
+
+        (_, oid), (_, value) = varbinds[0]
+        self.assertEqual(decode_oid(oid), device_snmp_map['hewlett-packard']['print'].strip('.'))
+        self.assertEqual(int.from_bytes(value, 'big'), 12345)
+        self.assertEqual(varbinds[1][1][0], TAG_NO_SUCH_OBJECT)
+
+    def test_agent_drops_requests(self):
+        with SimulatedSnmpAgents({'127.0.0.1': self.values}, port=16162, loss=1) as agents:
+            with self.assertRaises(socket.timeout):
+                self.send_request(agents, [device_snmp_map['hewlett-packard']['print']])
+
+        self.assertEqual(agents.qty_dropped, 1)
+
+
+class SyntheticFleetTest(TestCase):
+    def test_seed_synthetic_fleet(self):
+        counts = seed_synthetic_fleet(6, 10)
+
+        self.assertEqual(models.Printer.objects.count(), 6)
+        self.assertEqual(models.Statistics.objects.count(), counts['statistics'])
+        self.assertEqual(counts['statistics'], 60)
+        self.assertEqual(counts['daily_stats'], 60)
+        self.assertEqual(models.MonthlyStat.objects.count(), counts['monthly_stats'])
+        self.assertEqual(find_rollup_mismatches(), [])
+
+        snmp_devices, _ = get_simulated_devices(models.Printer.objects.select_related('model__stamp', 'ip_address'))
+        self.assertEqual(len(snmp_devices), 6)
+
+
+class CompareWithBaselineTest(SimpleTestCase):
+    def test_compare_with_baseline(self):
+        baseline = {'views': {'index': {'p50_ms': 100, 'queries': 20}, 'events': {'p50_ms': 50}}}
+        results = {'views': {'index': {'p50_ms': 130, 'queries': 20}, 'events': {'p50_ms': 55},
+                             'forecast': {'p50_ms': 10}}}
+
+        regressions = compare_with_baseline(results, baseline, tolerance=0.2)
+
+        self.assertEqual(regressions, [{'section': 'views', 'name': 'index', 'metric': 'p50_ms', 'baseline': 100,
+                                        'current': 130, 'ratio': 1.3}])
@@ -10,13 +10,15 @@ from monitoring import models
 from automation.snmp_oid_map import device_snmp_map
 from automation.data_extractor import (printer_init_resource, update_printer_resource, create_new_supply_item,
                                        split_nm_supply, create_new_supply_details, get_printer_stamp,
-                                       add_supply_in_printer, update_printer_resource, get_printer_supply_status,
-                                       update_printer_supply_status, update_qty_supply, create_change_supply,
-                                       calculate_average_printer_supply_consumption, parsing_snmp_avision,
+                                       add_supply_in_printer, update_printer_resource, parsing_snmp_avision,
                                        parsing_snmp_hp, parsing_snmp_kyosera, parsing_snmp_sindoh, parsing_pantum,
-                                       save_printer_stats_to_database, add_printer_parsing_snmp, parsing_snmp, parsing_snmp_katusha, add_missing_statistics_to_db, detect_device_errors, fetch_snmp_data_to_str, fetch_snmp_data_to_int, checking_activity)
+                                       save_printer_stats_to_database, add_printer_parsing_snmp, parsing_snmp, parsing_snmp_katusha, add_missing_statistics_to_db, detect_device_errors, fetch_snmp_data_to_str, fetch_snmp_data_to_int, checking_activity,
+                                       update_printers_resources, fetch_printer_resource, read_printer_resource,
+                                       get_printer_supply_status_index, apply_printer_supply_readings,
+                                       update_consumption_estimate)
 from django.db.models.signals import post_save
 from monitoring.signals import printer_created
+from automation.telemetry import TaskTelemetry
 from django.utils import timezone
 
 
@@ -278,306 +280,209 @@ class AddSupplyInPrinterTest(TestCase):
 
 
 class UpdatePrinterResourceTest(TestCase):
+    @patch('automation.data_extractor.update_printers_resources')
+    def test_update_printer_resource_calls_batch(self, mock_update_printers_resources):
+        update_printer_resource(1)
+
+        mock_update_printers_resources.assert_called_once_with([1])
 
-    @patch('monitoring.models.Printer.objects.get')
     @patch('automation.data_extractor.get_printer_stamp')
     @patch('automation.data_extractor.Engine')
     @patch('automation.data_extractor.fetch_snmp_data_to_int')
-    @patch('automation.data_extractor.get_printer_supply_status')
-    @patch('automation.data_extractor.update_printer_supply_status')
-    @patch('automation.data_extractor.logger_main')
-    def test_update_printer_resource_success(self, mock_logger, mock_get_supply_status,
-                                             mock_update_supply_status, mock_fetch_snmp_data,
-                                             mock_engine, mock_get_printer_stamp, mock_get):
+    def test_fetch_printer_resource_success(self, mock_fetch_snmp_data, mock_engine, mock_get_printer_stamp):
         mock_printer = MagicMock()
-        mock_printer.is_active = True
+        mock_printer.id = 1
         mock_printer.ip_address.address = "192.168.1.1"
-        mock_get.return_value = mock_printer
         mock_get_printer_stamp.return_value = "hewlett-packard"
-
-        mock_engine.return_value.__enter__.return_value.Manager.return_value = MagicMock()
-        mock_engine.return_value.__enter__.return_value.Manager.return_value = MagicMock()
-
-        printer_supplies_dict = {'supply': ['black_cartridge']}
-        device_snmp_map = {'hewlett-packard': ['resource_black_cartridge']}
         mock_fetch_snmp_data.return_value = 50
-        mock_get_supply_status.return_value = MagicMock()
+        mock_supply_status = MagicMock()
 
-        update_printer_resource(1)
+        readings = fetch_printer_resource(mock_printer, {(1, 'black', 'cartridge'): mock_supply_status})
 
-        mock_get.assert_called_once_with(pk=1)
-        mock_get_printer_stamp.assert_called_once_with(mock_printer)
         mock_engine.assert_called_once_with(SNMPv2c, defaultCommunity=b"public")
         mock_fetch_snmp_data.assert_called_once_with(
             mock_engine.return_value.__enter__.return_value.Manager.return_value,
             "hewlett-packard",
             'resource_black_cartridge'
         )
-        mock_get_supply_status.assert_called_once()
-        mock_update_supply_status.assert_called_once()
-
-    @patch('monitoring.models.Printer.objects.get')
-    @patch('automation.data_extractor.logger_main')
-    def test_update_printer_resource_inactive_printer(self, mock_logger, mock_get):
-        mock_printer = MagicMock()
-        mock_printer.is_active = False
-        mock_get.return_value = mock_printer
-
-        update_printer_resource(1)
-
-        mock_get.assert_called_once_with(pk=1)
+        self.assertEqual(readings, [(mock_supply_status, 50)])
 
-    @patch('monitoring.models.Printer.objects.get')
     @patch('automation.data_extractor.get_printer_stamp')
     @patch('automation.data_extractor.Engine')
     @patch('automation.data_extractor.logger_main')
-    def test_update_printer_resource_exception(self, mock_logger, mock_engine, mock_get_printer_stamp, mock_get):
+    def test_fetch_printer_resource_exception(self, mock_logger, mock_engine, mock_get_printer_stamp):
         mock_printer = MagicMock()
-        mock_printer.is_active = True
         mock_printer.ip_address.address = "192.168.1.1"
-        mock_get.return_value = mock_printer
         mock_get_printer_stamp.return_value = "hewlett-packard"
         mock_engine.side_effect = Exception("SNMP error")
 
-        update_printer_resource(1)
+        readings = fetch_printer_resource(mock_printer, {})
 
+        self.assertEqual(readings, [])
         mock_logger.error.assert_called_once_with(
             f"{mock_printer}: SNMP error - Error in launching the SNMP engine in the update_printer_resource function"
         )
 
+    @patch('automation.data_extractor.get_printer_stamp')
+    @patch('automation.data_extractor.Engine')
+    def test_read_printer_resource_raises(self, mock_engine, mock_get_printer_stamp):
+        mock_get_printer_stamp.return_value = "hewlett-packard"
+        mock_engine.side_effect = Exception("SNMP error")
 
-class GetPrinterSupplyStatusTest(TestCase):
-    @patch('automation.data_extractor.split_nm_supply')
-    @patch('monitoring.models.PrinterSupplyStatus.objects.filter')
-    def test_get_printer_supply_status_found(self, mock_filter, mock_split_nm_supply):
-        mock_printer = MagicMock()
-        nm_supply_oid = "black_cartridge"
-        mock_split_nm_supply.return_value = ("black", "cartridge")
-
-        mock_supply_status = MagicMock()
-        mock_filter.return_value.first.return_value = mock_supply_status
-
-        result = get_printer_supply_status(mock_printer, nm_supply_oid)
-
-        mock_filter.assert_called_once_with(
-            printer=mock_printer,
-            supply__type="cartridge",
-            supply__color="black"
-        )
-
-        self.assertEqual(result, mock_supply_status)
-
-    @patch('automation.data_extractor.split_nm_supply')
-    @patch('monitoring.models.PrinterSupplyStatus.objects.filter')
-    def test_get_printer_supply_status_not_found(self, mock_filter, mock_split_nm_supply):
-        mock_printer = MagicMock()
-        nm_supply_oid = "black_cartridge"
-        mock_split_nm_supply.return_value = ("black", "cartridge")
-
-        mock_filter.return_value.first.return_value = None
-
-        result = get_printer_supply_status(mock_printer, nm_supply_oid)
-
-        mock_filter.assert_called_once_with(
-            printer=mock_printer,
-            supply__type="cartridge",
-            supply__color="black"
-        )
-
-        self.assertIsNone(result)
-
-
-class UpdatePrinterSupplyStatusTest(TestCase):
-    @patch('automation.data_extractor.update_qty_supply')
-    @patch('automation.data_extractor.create_change_supply')
-    @patch('automation.data_extractor.calculate_average_printer_supply_consumption')
-    def test_update_printer_supply_status_increase(self, mock_calculate, mock_create_change, mock_update_qty):
-        mock_supply = MagicMock()
-        mock_printer = MagicMock()
-        mock_printer_supply_status = MagicMock()
-        mock_printer_supply_status.remaining_supply_percentage = 50
-        mock_printer_supply_status.supply = mock_supply
-        mock_printer_supply_status.printer = mock_printer
-        mock_printer_supply_status.consumption = 100
-
-        new_remaining_supply_percentage = 75
-        mock_calculate.return_value = 150
-
-        update_printer_supply_status(mock_printer_supply_status, new_remaining_supply_percentage)
+        with self.assertRaisesMessage(Exception, 'SNMP error'):
+            read_printer_resource(MagicMock(), {})
 
-        mock_update_qty.assert_called_once_with(mock_supply)
-        mock_create_change.assert_called_once_with(mock_printer, mock_supply)
 
-        self.assertEqual(mock_printer_supply_status.consumption, 150)
-        self.assertEqual(mock_printer_supply_status.remaining_supply_percentage, 75)
+class UpdatePrintersResourcesTest(TestCase):
+    def setUp(self):
+        self.subnet = models.Subnet.objects.create(name='Test Subnet', address='192.168.1.0', mask=24)
+        self.stamp = models.PrinterStamp.objects.create(name='HP')
+        self.model = models.PrinterModel.objects.create(stamp=self.stamp, name='LaserJet')
+        self.supply_item = models.SupplyItem.objects.create(name='Black Cart test', type='cartridge', color='black',
+                                                            price=1500.00)
+        self.supply_details = models.SupplyDetails.objects.create(supply=self.supply_item, qty=10)
+        post_save.disconnect(printer_created, sender=models.Printer)
+        self.printers = list()
+        self.supply_statuses = list()
+        for i in range(5):
+            ip_address = models.IPAddress.objects.create(address=f'192.168.1.{i + 10}', subnet=self.subnet)
+            printer = models.Printer.objects.create(ip_address=ip_address, model=self.model,
+                                                    serial_number=f'SN{i}')
+            self.printers.append(printer)
+            self.supply_statuses.append(models.PrinterSupplyStatus.objects.create(
+                printer=printer, supply=self.supply_item, remaining_supply_percentage=20, consumption=3000))
+
+    def test_get_printer_supply_status_index(self):
+        printer_ids = [printer.id for printer in self.printers]
 
-        mock_printer_supply_status.save.assert_called_once()
+        with self.assertNumQueries(1):
+            index = get_printer_supply_status_index(printer_ids)
+
+        self.assertEqual(len(index), 5)
+        self.assertEqual(index[(self.printers[0].id, 'black', 'cartridge')], self.supply_statuses[0])
 
-    @patch('automation.data_extractor.update_qty_supply')
-    @patch('automation.data_extractor.create_change_supply')
-    @patch('automation.data_extractor.calculate_average_printer_supply_consumption')
-    def test_update_printer_supply_status_decrease(self, mock_calculate, mock_create_change, mock_update_qty):
-        mock_supply = MagicMock()
-        mock_printer = MagicMock()
-        mock_printer_supply_status = MagicMock()
-        mock_printer_supply_status.remaining_supply_percentage = 75
-        mock_printer_supply_status.supply = mock_supply
-        mock_printer_supply_status.printer = mock_printer
-        mock_printer_supply_status.consumption = 100
+    def test_apply_printer_supply_readings_replacements(self):
+        readings = [(supply_status, 100) for supply_status in self.supply_statuses]
 
-        new_remaining_supply_percentage = 50
+        apply_printer_supply_readings(readings)
 
-        update_printer_supply_status(mock_printer_supply_status, new_remaining_supply_percentage)
+        self.supply_details.refresh_from_db()
+        self.assertEqual(self.supply_details.qty, 5)
+        self.assertEqual(models.ChangeSupply.objects.filter(supply=self.supply_item).count(), 5)
+        for supply_status in self.supply_statuses:
+            supply_status.refresh_from_db()
+            self.assertEqual(supply_status.remaining_supply_percentage, 100)
 
-        mock_update_qty.assert_not_called()
-        mock_create_change.assert_not_called()
+    def test_apply_printer_supply_readings_consumption(self):
+        printer = self.printers[0]
+        models.SupplyConsumptionStat.objects.create(printer=printer, supply=self.supply_item, ewma=3000,
+                                                    last_counter=4000)
+        models.ForecastStat.objects.create(printer=printer, copies_printing=9000, time_collect='2025-01-20')
 
-        self.assertEqual(mock_printer_supply_status.consumption, 100)
-        self.assertEqual(mock_printer_supply_status.remaining_supply_percentage, 50)
+        apply_printer_supply_readings([(self.supply_statuses[0], 100)])
 
-        mock_printer_supply_status.save.assert_called_once()
+        self.supply_statuses[0].refresh_from_db()
+        consumption_stat = models.SupplyConsumptionStat.objects.get(printer=printer, supply=self.supply_item)
+        self.assertEqual(self.supply_statuses[0].consumption, 3600)
+        self.assertEqual(consumption_stat.qty_changes, 1)
+        self.assertEqual(consumption_stat.last_counter, 9000)
 
-    @patch('automation.data_extractor.update_qty_supply')
-    @patch('automation.data_extractor.create_change_supply')
-    @patch('automation.data_extractor.calculate_average_printer_supply_consumption')
-    def test_update_printer_supply_status_no_change(self, mock_calculate, mock_create_change, mock_update_qty):
-        mock_supply = MagicMock()
-        mock_printer = MagicMock()
-        mock_printer_supply_status = MagicMock()
-        mock_printer_supply_status.remaining_supply_percentage = 75
-        mock_printer_supply_status.supply = mock_supply
-        mock_printer_supply_status.printer = mock_printer
-        mock_printer_supply_status.consumption = 100
+    def test_apply_printer_supply_readings_creates_consumption_stats(self):
+        apply_printer_supply_readings([(supply_status, 100) for supply_status in self.supply_statuses])
 
-        new_remaining_supply_percentage = 75
+        self.assertEqual(models.SupplyConsumptionStat.objects.filter(ewma=3000, qty_changes=0).count(), 5)
 
-        update_printer_supply_status(mock_printer_supply_status, new_remaining_supply_percentage)
+    def test_apply_printer_supply_readings_decrease(self):
+        apply_printer_supply_readings([(self.supply_statuses[0], 15)])
 
-        mock_update_qty.assert_not_called()
-        mock_create_change.assert_not_called()
+        self.supply_details.refresh_from_db()
+        self.supply_statuses[0].refresh_from_db()
+        self.assertEqual(self.supply_details.qty, 10)
+        self.assertEqual(self.supply_statuses[0].remaining_supply_percentage, 15)
+        self.assertFalse(models.ChangeSupply.objects.exists())
 
-        self.assertEqual(mock_printer_supply_status.consumption, 100)
-        self.assertEqual(mock_printer_supply_status.remaining_supply_percentage, 75)
+    @patch('monitoring.signals.notify_low_supply')
+    def test_apply_printer_supply_readings_notifies_low_supply(self, mock_notify_low_supply):
+        apply_printer_supply_readings([(self.supply_statuses[0], 1), (self.supply_statuses[1], 15)])
 
-        mock_printer_supply_status.save.assert_called_once()
+        mock_notify_low_supply.assert_called_once_with(self.supply_statuses[0])
 
+    def test_apply_printer_supply_readings_constant_queries(self):
+        for printer in self.printers:
+            models.ChangeSupply.objects.create(printer=printer, supply=self.supply_item, time_change='2025-01-11')
+        readings = [(supply_status, 100) for supply_status in self.supply_statuses]
 
-class UpdateQtySupplyTest(TestCase):
-    @patch('monitoring.models.SupplyDetails.objects.get')
-    def test_update_qty_supply_success(self, mock_get):
-        mock_supply = MagicMock()
-        mock_supply_details = MagicMock()
-        mock_supply_details.qty = 5
+        with self.assertNumQueries(12):
+            apply_printer_supply_readings(readings)
 
-        mock_get.return_value = mock_supply_details
+    @patch('automation.data_extractor.fetch_printer_resource')
+    def test_update_printers_resources(self, mock_fetch_printer_resource):
+        mock_fetch_printer_resource.side_effect = lambda printer, index: [
+            (index[(printer.id, 'black', 'cartridge')], 15)]
 
-        update_qty_supply(mock_supply)
+        update_printers_resources([printer.id for printer in self.printers])
 
-        self.assertEqual(mock_supply_details.qty, 4)
+        self.assertEqual(mock_fetch_printer_resource.call_count, 5)
+        self.assertEqual(models.PrinterSupplyStatus.objects.filter(remaining_supply_percentage=15).count(), 5)
 
-        mock_supply_details.save.assert_called_once()
+    @patch('automation.data_extractor.read_printer_resource')
+    def test_update_printers_resources_records_telemetry(self, mock_read_printer_resource):
+        mock_read_printer_resource.side_effect = lambda printer, index: [
+            (index[(printer.id, 'black', 'cartridge')], 15)]
+        telemetry = TaskTelemetry('monitoring.tasks.async_update_printers_resources')
 
-    @patch('monitoring.models.SupplyDetails.objects.get')
-    def test_update_qty_supply_not_found(self, mock_get):
-        mock_get.side_effect = models.SupplyDetails.DoesNotExist
+        update_printers_resources([printer.id for printer in self.printers], telemetry)
 
-        with self.assertRaises(models.SupplyDetails.DoesNotExist):
-            update_qty_supply("non_existent_supply")
+        self.assertEqual(sorted(timing[0] for timing in telemetry.device_timings),
+                         sorted(printer.id for printer in self.printers))
+        self.assertTrue(all(timing[2] == 'succeeded' and timing[1] is not None for timing in telemetry.device_timings))
+        self.assertEqual(models.PrinterSupplyStatus.objects.filter(remaining_supply_percentage=15).count(), 5)
 
+    @patch('automation.data_extractor.read_printer_resource')
+    def test_update_printers_resources_records_failed_polls(self, mock_read_printer_resource):
+        def read_resource(printer, index):
+            if printer.id == self.printers[0].id:
+                raise ValueError('no response')
+            return [(index[(printer.id, 'black', 'cartridge')], 15)]
+        mock_read_printer_resource.side_effect = read_resource
+        telemetry = TaskTelemetry('monitoring.tasks.async_update_printers_resources')
 
-class CreateChangeSupplyTest(TestCase):
-    def setUp(self):
-        self.supply_item = models.SupplyItem.objects.create(
-            name='Black Cart test',
-            type='cartridge',
-            color='black',
-            price=1500.00
-        )
-        self.subnet = models.Subnet.objects.create(name='Test Subnet', address='192.168.1.0', mask=24)
-        self.ip_address = models.IPAddress.objects.create(address='192.168.1.123', subnet=self.subnet)
-        self.stamp = models.PrinterStamp.objects.create(name='HP')
-        self.model = models.PrinterModel.objects.create(stamp=self.stamp, name='LaserJet')
-        post_save.disconnect(printer_created, sender=models.Printer)
-        self.printer = models.Printer.objects.create(
-            ip_address=self.ip_address,
-            model=self.model,
-            serial_number='SN123456',
-        )
+        update_printers_resources([printer.id for printer in self.printers], telemetry)
 
-    @patch('monitoring.models.ChangeSupply.save')
-    def test_create_change_supply(self, mock_save):
-        create_change_supply(self.printer, self.supply_item)
+        statuses = {printer_id: status for printer_id, _, status in telemetry.device_timings}
+        self.assertEqual(statuses.pop(self.printers[0].id), 'failed')
+        self.assertEqual(set(statuses.values()), {'succeeded'})
+        self.assertEqual(models.PrinterSupplyStatus.objects.filter(remaining_supply_percentage=15).count(), 4)
 
-        new_change_supply = models.ChangeSupply(printer=self.printer, supply=self.supply_item)
-        new_change_supply.save.assert_called_once()
 
-        self.assertEqual(new_change_supply.printer, self.printer)
-        self.assertEqual(new_change_supply.supply, self.supply_item)
+class UpdateConsumptionEstimateTest(TestCase):
+    def test_first_observation(self):
+        consumption_stat = models.SupplyConsumptionStat(last_counter=1000)
 
+        update_consumption_estimate(consumption_stat, 4000, timezone.now())
 
-class CalculateAveragePrinterSupplyConsumptionTest(TestCase):
-    def setUp(self):
-        self.supply_item = models.SupplyItem.objects.create(
-            name='Black Cart test',
-            type='cartridge',
-            color='black',
-            price=1500.00
-        )
-        self.subnet = models.Subnet.objects.create(name='Test Subnet', address='192.168.1.0', mask=24)
-        self.ip_address = models.IPAddress.objects.create(address='192.168.1.123', subnet=self.subnet)
-        self.stamp = models.PrinterStamp.objects.create(name='HP')
-        self.model = models.PrinterModel.objects.create(stamp=self.stamp, name='LaserJet')
-        post_save.disconnect(printer_created, sender=models.Printer)
-        self.printer = models.Printer.objects.create(
-            ip_address=self.ip_address,
-            model=self.model,
-            serial_number='SN123456',
-        )
-        self.printer_supply = models.PrinterSupplyStatus.objects.create(
-            printer=self.printer,
-            supply=self.supply_item,
-            remaining_supply_percentage=100,
-            consumption=6000
-        )
-        models.ChangeSupply.objects.create(
-            printer=self.printer,
-            supply=self.supply_item,
-            time_change=f'2025-01-11'
-        )
-        models.ChangeSupply.objects.create(
-            printer=self.printer,
-            supply=self.supply_item,
-            time_change=f'2025-01-12'
-        )
-        models.ForecastStat.objects.create(
-            printer=self.printer,
-            copies_printing=4000,
-            time_collect='2025-01-10'
-        )
-        models.ForecastStat.objects.create(
-            printer=self.printer,
-            copies_printing=9000,
-            time_collect='2025-01-11'
-        )
+        self.assertEqual(consumption_stat.qty_changes, 1)
+        self.assertEqual(consumption_stat.ewma, 3000)
+        self.assertEqual(consumption_stat.variance, 0)
+        self.assertEqual(consumption_stat.last_counter, 4000)
 
-    def test_calculate_average_consumption(self):
-        result = calculate_average_printer_supply_consumption(self.printer_supply.printer, self.supply_item, self.printer_supply.consumption)
+    def test_next_observation(self):
+        consumption_stat = models.SupplyConsumptionStat(qty_changes=1, ewma=3000, variance=0, last_counter=4000)
 
-        expected_consumption = (6000 + (9000 - 4000)) // 2
-        self.assertEqual(result, expected_consumption)
+        update_consumption_estimate(consumption_stat, 9000, timezone.now())
 
-    @patch('monitoring.models.ChangeSupply.objects.filter')
-    @patch('monitoring.models.ForecastStat.objects.filter')
-    def test_calculate_average_consumption_not_enough_data(self, mock_forecast_filter, mock_change_filter):
-        mock_printer = MagicMock()
-        mock_supply = MagicMock()
-        average_consumption = 100
+        self.assertEqual(consumption_stat.qty_changes, 2)
+        self.assertAlmostEqual(consumption_stat.ewma, 3600)
+        self.assertAlmostEqual(consumption_stat.variance, 840000)
 
-        mock_change_filter.return_value.order_by.return_value[:2] = [MagicMock()]
+    def test_counter_reset_is_ignored(self):
+        consumption_stat = models.SupplyConsumptionStat(qty_changes=1, ewma=3000, variance=0, last_counter=4000)
 
-        result = calculate_average_printer_supply_consumption(mock_printer, mock_supply, average_consumption)
+        update_consumption_estimate(consumption_stat, 100, timezone.now())
 
-        self.assertIsNone(result)
+        self.assertEqual(consumption_stat.qty_changes, 1)
+        self.assertEqual(consumption_stat.ewma, 3000)
+        self.assertEqual(consumption_stat.last_counter, 100)
 
 
 class SavePrinterStatsToDatabaseTests(TestCase):
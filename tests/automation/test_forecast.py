@@ -0,0 +1,106 @@
+from datetime import date, datetime, timedelta
+from django.test import TestCase
+from django.utils import timezone
+from django.db.models.signals import post_save
+from monitoring import models
+from monitoring.signals import printer_created
+from automation.forecast import (fit_weekday_profile, forecast_daily_pages, predict_supply_change_days,
+                                 get_next_month_range, calculate_forecast)
+import numpy as np
+
+
+class ForecastFunctionsTest(TestCase):
+    def test_get_next_month_range(self):
+        self.assertEqual(get_next_month_range(date(2025, 1, 31)), (date(2025, 2, 1), date(2025, 2, 28)))
+        self.assertEqual(get_next_month_range(date(2024, 12, 15)), (date(2025, 1, 1), date(2025, 1, 31)))
+
+    def test_fit_weekday_profile(self):
+        start_date = date(2025, 1, 6)
+        history = np.tile(np.array([10, 20, 30, 40, 50, 0, 0], dtype=float), (2, 4))
+        history[1, :] = np.nan
+
+        profile = fit_weekday_profile(history, start_date)
+
+        np.testing.assert_allclose(profile[0], [10, 20, 30, 40, 50, 0, 0])
+        np.testing.assert_allclose(profile[1], np.zeros(7))
+
+    def test_fit_weekday_profile_prefers_recent_weeks(self):
+        start_date = date(2025, 1, 6)
+        history = np.concatenate([np.full(7, 100.0), np.full(7, 200.0)]).reshape(1, -1)
+
+        profile = fit_weekday_profile(history, start_date, half_life_weeks=1)
+
+        self.assertTrue(np.all(profile > 150))
+
+    def test_forecast_daily_pages(self):
+        profile = np.array([[10, 20, 30, 40, 50, 0, 0]], dtype=float)
+
+        daily_pages = forecast_daily_pages(profile, date(2025, 1, 11), 3)
+
+        np.testing.assert_array_equal(daily_pages, [[0, 0, 10]])
+
+    def test_predict_supply_change_days(self):
+        cumulative_pages = np.cumsum(np.full(10, 100))
+
+        change_days = predict_supply_change_days(cumulative_pages, 250, 400)
+
+        np.testing.assert_array_equal(change_days, [2, 6])
+
+    def test_predict_supply_change_days_without_consumption(self):
+        self.assertEqual(len(predict_supply_change_days(np.cumsum(np.full(10, 100)), 250, 0)), 0)
+
+
+class CalculateForecastTest(TestCase):
+    def setUp(self):
+        self.subnet = models.Subnet.objects.create(name='Test Subnet', address='192.168.1.0', mask=24)
+        self.ip_address = models.IPAddress.objects.create(address='192.168.1.123', subnet=self.subnet)
+        self.stamp = models.PrinterStamp.objects.create(name='HP')
+        self.model = models.PrinterModel.objects.create(stamp=self.stamp, name='LaserJet')
+        post_save.disconnect(printer_created, sender=models.Printer)
+        self.printer = models.Printer.objects.create(ip_address=self.ip_address, model=self.model,
+                                                     serial_number='SN123456')
+        self.supply_item = models.SupplyItem.objects.create(name='Black Cart test', type='cartridge', color='black',
+                                                            price=1500.00)
+        models.PrinterSupplyStatus.objects.create(printer=self.printer, supply=self.supply_item,
+                                                  remaining_supply_percentage=50, consumption=1000)
+        models.ForecastStat.objects.create(printer=self.printer, copies_printing=5000, time_collect='2025-01-15')
+        for day in range(2, 16):
+            models.DailyStat.objects.create(printer=self.printer, page=130, print=80, copies=20, scan=30,
+                                            time_collect=timezone.make_aware(datetime(2025, 1, day, 12)))
+
+    def test_calculate_forecast(self):
+        calculate_forecast(date(2025, 1, 15))
+
+        forecasts = models.Forecast.objects.filter(printer=self.printer).order_by('forecast_date')
+        self.assertEqual(forecasts.count(), 28)
+        self.assertEqual(forecasts[0].forecast_date, date(2025, 2, 1))
+        self.assertEqual(forecasts[0].daily_pages, 100)
+        self.assertEqual(forecasts[0].qty_pages, 6700)
+
+        change_dates = list(models.ForecastChangeSupplies.objects.order_by('forecast_date').values_list(
+            'forecast_date', flat=True))
+        self.assertEqual(change_dates, [date(2025, 1, 20), date(2025, 1, 30), date(2025, 2, 9),
+                                        date(2025, 2, 19)])
+
+        costs = models.MaintenanceCosts.objects.get(printer=self.printer)
+        self.assertAlmostEqual(costs.paper_cost, 1960)
+        self.assertAlmostEqual(costs.supplies_cost, 3000)
+
+    def test_calculate_forecast_replaces_previous_forecast(self):
+        models.Forecast.objects.create(printer=self.printer, qty_pages=1, daily_pages=1,
+                                       forecast_date=date(2024, 12, 1))
+
+        calculate_forecast(date(2025, 1, 15))
+        calculate_forecast(date(2025, 1, 15))
+
+        self.assertFalse(models.Forecast.objects.filter(forecast_date=date(2024, 12, 1)).exists())
+        self.assertEqual(models.Forecast.objects.count(), 28)
+        self.assertEqual(models.MaintenanceCosts.objects.count(), 1)
+
+    def test_calculate_forecast_without_history(self):
+        models.DailyStat.objects.all().delete()
+
+        calculate_forecast(date(2025, 1, 15) + timedelta(days=1))
+
+        self.assertFalse(models.Forecast.objects.exclude(daily_pages=0).exists())
+        self.assertFalse(models.ForecastChangeSupplies.objects.exists())
@@ -0,0 +1,186 @@
+import gzip
+import json
+from datetime import datetime
+from unittest.mock import patch
+from django.test import TestCase
+from django.utils import timezone
+from django.db.models.signals import post_save
+from monitoring import models
+from monitoring.signals import printer_created
+from automation.ingest import decode_readings, validate_reading, save_readings_to_database
+
+
+def make_reading(time_collect, page=1000, **kwargs):
+    reading = {'serial_number': 'SN123456', 'time_collect': time_collect.isoformat(), 'page': page, 'print': page,
+               'copies': 0, 'scan': 0}
+    reading.update(kwargs)
+    return reading
+
+
+class DecodeReadingsTest(TestCase):
+    def setUp(self):
+        self.time_collect = timezone.make_aware(datetime(2025, 1, 10, 12))
+        self.body = '\n'.join(json.dumps(make_reading(self.time_collect, page)) for page in (1000, 1100)).encode()
+
+    def test_decode_ndjson(self):
+        readings = decode_readings(self.body, 'application/x-ndjson')
+
+        self.assertEqual(len(readings), 2)
+        self.assertEqual(readings[1]['page'], 1100)
+        self.assertEqual(readings[0]['time_collect'], self.time_collect)
+
+    def test_decode_gzip_ndjson(self):
+        readings = decode_readings(gzip.compress(self.body), 'application/x-ndjson', 'gzip')
+
+        self.assertEqual(len(readings), 2)
+
+    def test_decode_invalid_json(self):
+        with self.assertRaisesMessage(ValueError, 'Line 2'):
+            decode_readings(b'{}\n{', 'application/x-ndjson')
+
+    def test_decode_unsupported_content_type(self):
+        with self.assertRaises(ValueError):
+            decode_readings(self.body, 'text/plain')
+
+    def test_validate_reading(self):
+        reading = validate_reading({'serial_number': 'SN1', 'time_collect': '2025-01-10T12:00:00+07:00',
+                                    'page': 10, 'print': 5,
+                                    'supplies': [{'color': 'black', 'type': 'cartridge', 'remaining': 50}],
+                                    'errors': ['paper jam']})
+
+        self.assertEqual(reading['copies'], 0)
+        self.assertEqual(reading['supplies'][0]['remaining'], 50)
+        self.assertEqual(reading['errors'], ['paper jam'])
+
+    def test_validate_reading_invalid_counter(self):
+        with self.assertRaises(ValueError):
+            validate_reading({'serial_number': 'SN1', 'time_collect': '2025-01-10T12:00:00+07:00', 'page': -1,
+                              'print': 5})
+
+    def test_validate_reading_invalid_supplies(self):
+        for supplies in (['x'], 'abc', [None], {'remaining': 50}):
+            with self.subTest(supplies=supplies), self.assertRaises(ValueError):
+                validate_reading({'serial_number': 'SN1', 'time_collect': '2025-01-10T12:00:00+07:00', 'page': 10,
+                                  'print': 5, 'supplies': supplies})
+
+    def test_decode_malformed_supplies(self):
+        body = json.dumps(make_reading(self.time_collect, supplies=['x'])).encode()
+
+        with self.assertRaisesMessage(ValueError, 'Reading 1'):
+            decode_readings(body, 'application/x-ndjson')
+
+    def test_validate_reading_invalid_online(self):
+        with self.assertRaises(ValueError):
+            validate_reading({'serial_number': 'SN1', 'time_collect': '2025-01-10T12:00:00+07:00', 'online': 'no'})
+
+    def test_validate_reading_without_time(self):
+        with self.assertRaises(ValueError):
+            validate_reading({'serial_number': 'SN1', 'page': 1, 'print': 1})
+
+
+class SaveReadingsToDatabaseTest(TestCase):
+    def setUp(self):
+        self.subnet = models.Subnet.objects.create(name='Test Subnet', address='192.168.1.0', mask=24)
+        self.ip_address = models.IPAddress.objects.create(address='192.168.1.123', subnet=self.subnet)
+        self.stamp = models.PrinterStamp.objects.create(name='HP')
+        self.model = models.PrinterModel.objects.create(stamp=self.stamp, name='LaserJet')
+        post_save.disconnect(printer_created, sender=models.Printer)
+        self.printer = models.Printer.objects.create(ip_address=self.ip_address, model=self.model,
+                                                     serial_number='SN123456')
+        self.supply_item = models.SupplyItem.objects.create(name='Black Cart test', type='cartridge', color='black',
+                                                            price=1500.00)
+        self.supply_status = models.PrinterSupplyStatus.objects.create(printer=self.printer, supply=self.supply_item,
+                                                                       remaining_supply_percentage=80)
+        self.first_time = timezone.make_aware(datetime(2025, 1, 10, 12))
+        self.second_time = timezone.make_aware(datetime(2025, 1, 11, 12))
+        notify_patcher = patch('monitoring.signals.notify_printer_error')
+        self.mock_notify_printer_error = notify_patcher.start()
+        self.addCleanup(notify_patcher.stop)
+
+    def test_save_readings(self):
+        readings = [
+            validate_reading(make_reading(self.second_time, 1150, errors=['paper jam'],
+                                          supplies=[{'color': 'black', 'type': 'cartridge', 'remaining': 70}])),
+            validate_reading(make_reading(self.first_time, 1000)),
+        ]
+
+        result = save_readings_to_database(readings)
+
+        self.assertEqual(result, {'accepted': 2, 'duplicates': 0, 'unknown': []})
+        self.assertEqual(models.Statistics.objects.filter(printer=self.printer).count(), 2)
+        self.assertEqual(models.DailyStat.objects.filter(printer=self.printer).order_by('time_collect').last().page,
+                         150)
+        self.assertEqual(models.MonthlyStat.objects.get(printer=self.printer).page, 150)
+        self.assertEqual(models.ForecastStat.objects.filter(printer=self.printer).count(), 2)
+        self.assertTrue(models.PrinterError.objects.filter(printer=self.printer, description='paper jam').exists())
+        self.supply_status.refresh_from_db()
+        self.assertEqual(self.supply_status.remaining_supply_percentage, 70)
+
+    def test_save_readings_is_idempotent(self):
+        readings = [validate_reading(make_reading(self.first_time, 1000)),
+                    validate_reading(make_reading(self.second_time, 1150))]
+
+        save_readings_to_database(readings)
+        result = save_readings_to_database(readings)
+
+        self.assertEqual(result['accepted'], 0)
+        self.assertEqual(result['duplicates'], 2)
+        self.assertEqual(models.Statistics.objects.filter(printer=self.printer).count(), 2)
+        self.assertEqual(models.MonthlyStat.objects.get(printer=self.printer).page, 150)
+
+    def test_save_readings_unknown_printer(self):
+        result = save_readings_to_database([validate_reading(make_reading(self.first_time,
+                                                                          serial_number='UNKNOWN'))])
+
+        self.assertEqual(result, {'accepted': 0, 'duplicates': 0, 'unknown': ['UNKNOWN']})
+        self.assertFalse(models.Statistics.objects.exists())
+
+    def test_save_status_readings(self):
+        reading = validate_reading({'serial_number': 'SN123456', 'time_collect': self.first_time.isoformat(),
+                                    'supplies': [{'color': 'black', 'type': 'cartridge', 'remaining': 70}],
+                                    'errors': ['paper jam']})
+
+        save_readings_to_database([reading])
+        result = save_readings_to_database([reading])
+
+        self.assertEqual(result['accepted'], 1)
+        self.assertFalse(models.Statistics.objects.exists())
+        self.assertEqual(models.PrinterError.objects.filter(printer=self.printer).count(), 1)
+        self.mock_notify_printer_error.assert_called_once_with(models.PrinterError.objects.get(printer=self.printer))
+        self.supply_status.refresh_from_db()
+        self.assertEqual(self.supply_status.remaining_supply_percentage, 70)
+
+    def test_save_offline_readings(self):
+        save_readings_to_database([validate_reading({'serial_number': 'SN123456',
+                                                     'time_collect': self.first_time.isoformat(),
+                                                     'online': False})])
+
+        self.printer.refresh_from_db()
+        self.assertFalse(self.printer.is_active)
+        self.assertFalse(models.Statistics.objects.exists())
+
+        result = save_readings_to_database([validate_reading(make_reading(self.second_time, 1000))])
+
+        self.printer.refresh_from_db()
+        self.assertTrue(self.printer.is_active)
+        self.assertEqual(result['accepted'], 1)
+
+    def test_save_readings_skips_stale_supply_levels(self):
+        save_readings_to_database([validate_reading({
+            'serial_number': 'SN123456', 'time_collect': self.second_time.isoformat(),
+            'supplies': [{'color': 'black', 'type': 'cartridge', 'remaining': 70}]})])
+        save_readings_to_database([validate_reading({
+            'serial_number': 'SN123456', 'time_collect': self.first_time.isoformat(),
+            'supplies': [{'color': 'black', 'type': 'cartridge', 'remaining': 90}]})])
+
+        self.supply_status.refresh_from_db()
+        self.assertEqual(self.supply_status.remaining_supply_percentage, 70)
+        self.assertEqual(self.supply_status.time_update, self.second_time)
+        self.assertFalse(models.ChangeSupply.objects.exists())
+
+    def test_save_readings_stamps_replacements_with_reading_time(self):
+        save_readings_to_database([validate_reading({
+            'serial_number': 'SN123456', 'time_collect': self.first_time.isoformat(),
+            'supplies': [{'color': 'black', 'type': 'cartridge', 'remaining': 100}]})])
+
+        self.assertEqual(models.ChangeSupply.objects.get(printer=self.printer).time_change, self.first_time)
@@ -0,0 +1,160 @@
+from datetime import date, datetime, timezone as dt_timezone
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+from django.db.models.signals import post_save
+from monitoring import models
+from monitoring.signals import printer_created
+from automation.data_extractor import save_printer_stats_to_database
+from automation.ingest import validate_reading, save_readings_to_database
+from automation.rollups import add_daily_stats_to_rollups, rebuild_daily_rollups, find_rollup_mismatches
+
+
+class DailyRollupsTest(TestCase):
+    def setUp(self):
+        self.subnet = models.Subnet.objects.create(name='Test Subnet', address='192.168.1.0', mask=24)
+        self.stamp = models.PrinterStamp.objects.create(name='HP')
+        self.model = models.PrinterModel.objects.create(stamp=self.stamp, name='LaserJet')
+        post_save.disconnect(printer_created, sender=models.Printer)
+        self.printers = list()
+        for i in range(2):
+            ip_address = models.IPAddress.objects.create(address=f'192.168.1.{i + 10}', subnet=self.subnet)
+            self.printers.append(models.Printer.objects.create(ip_address=ip_address, model=self.model,
+                                                               serial_number=f'SN{i}'))
+        self.printer_without_ip = models.Printer.objects.create(model=self.model, serial_number='SN_NO_IP')
+        self.time_collect = timezone.make_aware(datetime(2025, 1, 10, 12))
+
+    def create_daily_stat(self, printer, page, time_collect=None):
+        return models.DailyStat.objects.create(printer=printer, page=page, print=page, copies=0, scan=0,
+                                               time_collect=time_collect or self.time_collect)
+
+    def test_add_daily_stats_to_rollups(self):
+        daily_stats = [self.create_daily_stat(printer, 100) for printer in self.printers]
+        daily_stats.append(self.create_daily_stat(self.printer_without_ip, 50))
+
+        add_daily_stats_to_rollups(daily_stats)
+        add_daily_stats_to_rollups([self.create_daily_stat(self.printers[0], 10)])
+
+        fleet_stat = models.FleetDailyStat.objects.get(date=date(2025, 1, 10))
+        subnet_stat = models.SubnetDailyStat.objects.get(subnet=self.subnet, date=date(2025, 1, 10))
+        self.assertEqual(fleet_stat.page, 260)
+        self.assertEqual(subnet_stat.page, 210)
+        self.assertEqual(find_rollup_mismatches(), [])
+
+    def test_rollups_use_local_date(self):
+        add_daily_stats_to_rollups([self.create_daily_stat(
+            self.printers[0], 100, timezone.make_aware(datetime(2025, 1, 10, 20), dt_timezone.utc))])
+
+        self.assertEqual(models.FleetDailyStat.objects.get().date, date(2025, 1, 11))
+
+    def test_save_printer_stats_updates_rollups(self):
+        save_printer_stats_to_database(self.printers[0], 1000, 700, 200, 100)
+        save_printer_stats_to_database(self.printers[0], 1100, 760, 230, 110)
+
+        fleet_stat = models.FleetDailyStat.objects.get()
+        self.assertEqual((fleet_stat.page, fleet_stat.print, fleet_stat.copies, fleet_stat.scan), (100, 60, 30, 10))
+        self.assertEqual(find_rollup_mismatches(), [])
+
+    def test_ingest_updates_rollups(self):
+        readings = [validate_reading({'serial_number': 'SN0', 'time_collect': time_collect.isoformat(),
+                                      'page': page, 'print': page})
+                    for time_collect, page in ((self.time_collect, 1000),
+                                               (timezone.make_aware(datetime(2025, 1, 11, 12)), 1150))]
+
+        save_readings_to_database(readings)
+
+        self.assertEqual(models.FleetDailyStat.objects.get(date=date(2025, 1, 11)).page, 150)
+        self.assertEqual(find_rollup_mismatches(), [])
+
+    def test_rebuild_daily_rollups(self):
+        for printer in self.printers:
+            self.create_daily_stat(printer, 100)
+        models.FleetDailyStat.objects.create(date=date(2025, 1, 10), page=1)
+
+        self.assertEqual(len(find_rollup_mismatches()), 3)
+
+        self.assertEqual(rebuild_daily_rollups(), (1, 1))
+        self.assertEqual(models.FleetDailyStat.objects.get().page, 200)
+        self.assertEqual(find_rollup_mismatches(), [])
+
+    def test_check_daily_rollups_command(self):
+        self.create_daily_stat(self.printers[0], 100)
+
+        with self.assertRaises(CommandError):
+            call_command('check_daily_rollups', start=date(2025, 1, 1), stdout=StringIO())
+
+        call_command('check_daily_rollups', start=date(2025, 1, 1), fix=True, stdout=StringIO())
+        self.assertEqual(find_rollup_mismatches(), [])
+
+
+class SubnetRollupsTest(TestCase):
+    def setUp(self):
+        self.subnet = models.Subnet.objects.create(name='Test Subnet', address='192.168.1.0', mask=24)
+        self.subnet_new = models.Subnet.objects.create(name='Test Subnet 2', address='192.168.2.0', mask=24)
+        self.ip_address = models.IPAddress.objects.create(address='192.168.1.10', subnet=self.subnet)
+        self.stamp = models.PrinterStamp.objects.create(name='HP')
+        self.model = models.PrinterModel.objects.create(stamp=self.stamp, name='LaserJet')
+        post_save.disconnect(printer_created, sender=models.Printer)
+        self.printer = models.Printer.objects.create(ip_address=self.ip_address, model=self.model,
+                                                     serial_number='SN1')
+        self.supply_item = models.SupplyItem.objects.create(name='Black Cart test', type='cartridge', color='black',
+                                                            price=1500.00)
+        daily_stats = [
+            models.DailyStat.objects.create(printer=self.printer, page=page, print=page, copies=0, scan=0,
+                                            time_collect=timezone.make_aware(datetime(2025, 1, day, 12)))
+            for day, page in ((30, 100), (31, 50))
+        ]
+        daily_stats.append(models.DailyStat.objects.create(
+            printer=self.printer, page=70, print=70, copies=0, scan=0,
+            time_collect=timezone.make_aware(datetime(2025, 2, 1, 12))))
+        add_daily_stats_to_rollups(daily_stats)
+
+    def test_subnet_monthly_rollups(self):
+        monthly_stats = dict(models.SubnetMonthlyStat.objects.filter(subnet=self.subnet).values_list('date', 'page'))
+
+        self.assertEqual(monthly_stats, {date(2025, 1, 1): 150, date(2025, 2, 1): 70})
+
+    def test_subnet_stat_counts(self):
+        subnet_stat = models.SubnetStat.objects.get(subnet=self.subnet)
+        self.assertEqual((subnet_stat.qty_printers, subnet_stat.qty_supplies,
+                          subnet_stat.qty_printers_without_supplies), (1, 0, 1))
+
+        supply_status = models.PrinterSupplyStatus.objects.create(printer=self.printer, supply=self.supply_item,
+                                                                  remaining_supply_percentage=80)
+        subnet_stat.refresh_from_db()
+        self.assertEqual((subnet_stat.qty_supplies, subnet_stat.qty_printers_without_supplies), (1, 0))
+
+        supply_status.delete()
+        subnet_stat.refresh_from_db()
+        self.assertEqual((subnet_stat.qty_supplies, subnet_stat.qty_printers_without_supplies), (0, 1))
+
+    def test_printer_moves_to_another_subnet(self):
+        new_ip_address = models.IPAddress.objects.create(address='192.168.2.10', subnet=self.subnet_new)
+
+        self.printer.ip_address = new_ip_address
+        self.printer.save()
+
+        self.assertEqual(models.SubnetMonthlyStat.objects.get(subnet=self.subnet_new, date=date(2025, 1, 1)).page,
+                         150)
+        self.assertEqual(models.SubnetDailyStat.objects.get(subnet=self.subnet, date=date(2025, 1, 30)).page, 0)
+        self.assertEqual(models.SubnetStat.objects.get(subnet=self.subnet).qty_printers, 0)
+        self.assertEqual(models.SubnetStat.objects.get(subnet=self.subnet_new).qty_printers, 1)
+        self.assertEqual(find_rollup_mismatches(), [])
+
+    def test_ip_address_moves_to_another_subnet(self):
+        self.ip_address.subnet = self.subnet_new
+        self.ip_address.save()
+
+        self.assertEqual(models.SubnetDailyStat.objects.get(subnet=self.subnet_new, date=date(2025, 2, 1)).page, 70)
+        self.assertEqual(models.SubnetStat.objects.get(subnet=self.subnet_new).qty_printers, 1)
+        self.assertEqual(find_rollup_mismatches(), [])
+
+    def test_rebuild_subnet_monthly_rollups(self):
+        models.SubnetMonthlyStat.objects.all().delete()
+
+        rebuild_daily_rollups(date(2025, 1, 31), date(2025, 1, 31))
+
+        self.assertEqual(models.SubnetMonthlyStat.objects.get(date=date(2025, 1, 1)).page, 150)
+        self.assertEqual(find_rollup_mismatches(date(2025, 1, 1), date(2025, 1, 31)), [])
@@ -0,0 +1,69 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from unittest.mock import patch
+from monitoring import models
+from automation.supply_stock import (record_supply_stock_movements, record_supply_stock_movement,
+                                     compact_supply_stock_ledger)
+
+
+class RecordSupplyStockMovementsTests(TestCase):
+    def setUp(self):
+        self.cartridge = models.SupplyItem.objects.create(name='Black Cart test', type='cartridge', color='black',
+                                                          price=1500.00)
+        self.drum_unit = models.SupplyItem.objects.create(name='Drum test', type='drum_unit', color='black',
+                                                          price=3000.00)
+        self.cartridge_details = models.SupplyDetails.objects.create(supply=self.cartridge, qty=10)
+
+    def test_record_movements_updates_balance(self):
+        record_supply_stock_movements({self.cartridge.id: -3, self.drum_unit.id: 5}, 'adjustment')
+
+        self.cartridge_details.refresh_from_db()
+        self.assertEqual(self.cartridge_details.qty, 7)
+        self.assertEqual(models.SupplyDetails.objects.get(supply=self.drum_unit).qty, 5)
+        self.assertEqual(models.SupplyStockMovement.objects.count(), 2)
+
+    def test_record_movements_uses_current_balance(self):
+        models.SupplyDetails.objects.filter(pk=self.cartridge_details.pk).update(qty=4)
+
+        record_supply_stock_movement(self.cartridge, -1, 'replacement')
+
+        self.cartridge_details.refresh_from_db()
+        self.assertEqual(self.cartridge_details.qty, 3)
+
+    def test_record_movements_skips_zero(self):
+        record_supply_stock_movements({self.cartridge.id: 0}, 'adjustment')
+
+        self.assertFalse(models.SupplyStockMovement.objects.exists())
+
+
+class CompactSupplyStockLedgerTests(TestCase):
+    def setUp(self):
+        self.cartridge = models.SupplyItem.objects.create(name='Black Cart test', type='cartridge', color='black',
+                                                          price=1500.00)
+        models.SupplyDetails.objects.create(supply=self.cartridge, qty=0)
+        record_supply_stock_movements({self.cartridge.id: 10}, 'adjustment')
+        record_supply_stock_movements({self.cartridge.id: -1}, 'replacement')
+        record_supply_stock_movements({self.cartridge.id: -2}, 'replacement')
+        models.SupplyStockMovement.objects.update(time_change=timezone.now() - timedelta(days=60))
+        record_supply_stock_movements({self.cartridge.id: -1}, 'replacement')
+
+    @patch('automation.supply_stock.logger_main')
+    def test_compact_supply_stock_ledger(self, mock_logger):
+        compact_supply_stock_ledger(days=30)
+
+        movements = models.SupplyStockMovement.objects.order_by('time_change')
+        self.assertEqual(movements.count(), 2)
+        self.assertEqual(movements[0].reason, 'compaction')
+        self.assertEqual(movements[0].qty, 7)
+        self.assertEqual(movements[1].qty, -1)
+        self.assertEqual(models.SupplyDetails.objects.get(supply=self.cartridge).qty, 6)
+        mock_logger.warning.assert_not_called()
+
+    @patch('automation.supply_stock.logger_main')
+    def test_compact_supply_stock_ledger_detects_mismatch(self, mock_logger):
+        models.SupplyDetails.objects.filter(supply=self.cartridge).update(qty=100)
+
+        compact_supply_stock_ledger(days=30)
+
+        mock_logger.warning.assert_called_once()
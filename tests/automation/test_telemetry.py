@@ -0,0 +1,96 @@
+import time
+from types import SimpleNamespace
+from unittest.mock import patch, Mock
+from django.test import TestCase
+from django.db.models.signals import post_save
+from monitoring import models
+from monitoring.signals import printer_created
+from monitoring.tasks import parsing_hps_page_counts
+from automation.telemetry import (TaskTelemetry, task_telemetry, trim_task_runs, get_queue_lag,
+                                  summarize_task_runs, summarize_device_timings)
+
+
+class TaskTelemetryTest(TestCase):
+    def setUp(self):
+        self.subnet = models.Subnet.objects.create(name='Test Subnet', address='192.168.1.0', mask=24)
+        self.stamp = models.PrinterStamp.objects.create(name='Hewlett-Packard')
+        self.model = models.PrinterModel.objects.create(stamp=self.stamp, name='LaserJet')
+        post_save.disconnect(printer_created, sender=models.Printer)
+        self.printers = list()
+        for i in range(2):
+            ip_address = models.IPAddress.objects.create(address=f'192.168.1.{i + 10}', subnet=self.subnet)
+            self.printers.append(models.Printer.objects.create(ip_address=ip_address, model=self.model,
+                                                               serial_number=f'SN{i}', is_active=True))
+
+    def test_poll_records_device_statuses(self):
+        telemetry = TaskTelemetry('test_task')
+
+        self.assertEqual(telemetry.poll(1, lambda: 'ok'), 'ok')
+        telemetry.poll(2, Mock(side_effect=ValueError('no response')))
+        telemetry.poll(3, lambda: False, succeeded=bool)
+        telemetry.record(4, 'skipped')
+        with patch('automation.telemetry.DEVICE_TIMEOUT_SECONDS', 0):
+            telemetry.poll(5, Mock(side_effect=ValueError('timeout')))
+
+        statuses = [status for _, _, status in telemetry.device_timings]
+        self.assertEqual(statuses, ['succeeded', 'failed', 'timed_out', 'skipped', 'timed_out'])
+        self.assertIsNone(telemetry.device_timings[3][1])
+
+    def test_task_telemetry_saves_run(self):
+        with task_telemetry('test_task') as telemetry:
+            telemetry.poll(1, lambda: 'ok')
+            telemetry.record(2, 'skipped')
+
+        task_run = models.TaskRun.objects.get()
+        self.assertEqual(task_run.task_name, 'test_task')
+        self.assertEqual(task_run.qty_attempted, 1)
+        self.assertEqual(task_run.qty_succeeded, 1)
+        self.assertEqual(task_run.qty_skipped, 1)
+        self.assertIsNone(task_run.queue_lag)
+        self.assertEqual(len(task_run.device_timings), 2)
+
+    def test_trim_task_runs_keeps_history_size(self):
+        for _ in range(5):
+            models.TaskRun.objects.create(task_name='test_task', duration=1)
+        models.TaskRun.objects.create(task_name='other_task', duration=1)
+
+        trim_task_runs('test_task', history_size=3)
+
+        self.assertEqual(models.TaskRun.objects.filter(task_name='test_task').count(), 3)
+        self.assertEqual(models.TaskRun.objects.filter(task_name='other_task').count(), 1)
+
+    def test_get_queue_lag(self):
+        request = SimpleNamespace(headers={'published_at': time.time() - 5})
+
+        self.assertGreaterEqual(get_queue_lag(request), 5)
+        self.assertIsNone(get_queue_lag(SimpleNamespace(headers=None)))
+        self.assertIsNone(get_queue_lag(None))
+
+    def test_summaries(self):
+        models.TaskRun.objects.create(task_name='test_task', duration=1, device_timings=[
+            [self.printers[0].id, 0.5, 'succeeded'], [self.printers[1].id, 1.5, 'succeeded']])
+        models.TaskRun.objects.create(task_name='test_task', duration=3, queue_lag=2, device_timings=[
+            [self.printers[0].id, None, 'skipped']])
+        task_runs = models.TaskRun.objects.all()
+
+        task_summary = summarize_task_runs(task_runs)
+        stamp_summary = summarize_device_timings(task_runs, 'model__stamp__name')
+
+        self.assertEqual(task_summary[0]['runs'], 2)
+        self.assertEqual(task_summary[0]['duration']['p50'], 2)
+        self.assertEqual(task_summary[0]['queue_lag']['max'], 2)
+        self.assertEqual(stamp_summary[0]['group'], 'Hewlett-Packard')
+        self.assertEqual(stamp_summary[0]['statuses']['skipped'], 1)
+        self.assertEqual(stamp_summary[0]['rtt']['max'], 1.5)
+        self.assertEqual(stamp_summary[0]['time_share'], 100)
+
+    @patch('monitoring.tasks.parsing_snmp_hp')
+    def test_parsing_task_skips_printers_collected_today(self, mock_parsing_snmp_hp):
+        models.Statistics.objects.create(printer=self.printers[0], page=10, print=10, copies=0, scan=0)
+
+        parsing_hps_page_counts()
+
+        mock_parsing_snmp_hp.assert_called_once_with(self.printers[1])
+        task_run = models.TaskRun.objects.get(task_name='monitoring.tasks.parsing_hps_page_counts')
+        self.assertEqual(task_run.qty_skipped, 1)
+        self.assertEqual(task_run.qty_succeeded, 1)
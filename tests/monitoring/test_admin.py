@@ -1,8 +1,10 @@
 from django.contrib.admin.sites import site
+from django.forms import modelform_factory
 from django.test import TestCase
 from unittest.mock import patch, MagicMock
 from monitoring import models
-from monitoring.admin import SubnetAdmin, check_or_add_printer, check_printer, IPAddressAdmin, PrinterAdmin
+from monitoring.admin import (SubnetAdmin, check_or_add_printer, check_printer, IPAddressAdmin, PrinterAdmin,
+                              SupplyDetailsAdmin)
 from django.core.exceptions import ObjectDoesNotExist
 
 
@@ -131,3 +133,43 @@ class IPAddressAdminTest(TestCase):
         mock_add_printer_parsing_snmp.assert_not_called()
         mock_check_or_add_printer.assert_not_called()
 
+
+class SupplyDetailsAdminTest(TestCase):
+    def setUp(self):
+        self.admin = SupplyDetailsAdmin(models.SupplyDetails, site)
+        self.supply_item = models.SupplyItem.objects.create(name='Black Cart test', type='cartridge', color='black',
+                                                            price=1500.00)
+
+    def test_save_model_create_records_movement(self):
+        supply_details = models.SupplyDetails(supply=self.supply_item, qty=7)
+
+        self.admin.save_model(None, supply_details, MagicMock(), change=False)
+
+        self.assertEqual(models.SupplyDetails.objects.get(supply=self.supply_item).qty, 7)
+        movement = models.SupplyStockMovement.objects.get(supply=self.supply_item)
+        self.assertEqual(movement.qty, 7)
+        self.assertEqual(movement.reason, 'adjustment')
+
+    def test_save_model_change_records_difference(self):
+        supply_details = models.SupplyDetails.objects.create(supply=self.supply_item, qty=10)
+        models.SupplyDetails.objects.filter(pk=supply_details.pk).update(qty=8)
+        supply_details.qty = 15
+
+        self.admin.save_model(None, supply_details, MagicMock(), change=True)
+
+        self.assertEqual(models.SupplyDetails.objects.get(pk=supply_details.pk).qty, 15)
+        self.assertEqual(models.SupplyStockMovement.objects.get(supply=self.supply_item).qty, 7)
+
+    def test_form_rejects_duplicate_supply(self):
+        models.SupplyDetails.objects.create(supply=self.supply_item, qty=10)
+        form = modelform_factory(models.SupplyDetails, fields=['supply', 'qty'])(
+            data={'supply': self.supply_item.id, 'qty': 3})
+
+        self.assertFalse(form.is_valid())
+        self.assertEqual(models.SupplyDetails.objects.filter(supply=self.supply_item).count(), 1)
+
+    def test_supply_is_readonly_on_change(self):
+        supply_details = models.SupplyDetails.objects.create(supply=self.supply_item, qty=10)
+
+        self.assertEqual(self.admin.get_readonly_fields(None, supply_details), ('supply',))
+        self.assertEqual(self.admin.get_readonly_fields(None), ())
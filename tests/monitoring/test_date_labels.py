@@ -0,0 +1,32 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from django.test import SimpleTestCase
+from monitoring.date_labels import (format_month_year, format_weekday, format_day_month, format_weekdays,
+                                    format_days_months, format_months_years)
+
+
+class DateLabelsTest(SimpleTestCase):
+    def test_single_labels(self):
+        self.assertEqual(format_month_year(date(2024, 10, 22)), 'Октябрь 2024')
+        self.assertEqual(format_weekday(date(2024, 10, 22)), 'Вторник')
+        self.assertEqual(format_day_month(date(2024, 1, 5)), '05.01')
+
+    def test_vectorized_labels(self):
+        days = [date(2024, 10, 21) + timedelta(days=i) for i in range(7)]
+
+        self.assertEqual(format_weekdays(days), ['Понедельник', 'Вторник', 'Среда', 'Четверг', 'Пятница', 'Суббота',
+                                                 'Воскресенье'])
+        self.assertEqual(format_days_months(days[:2]), ['21.10', '22.10'])
+        self.assertEqual(format_months_years([datetime(2024, 12, 1, tzinfo=dt_timezone.utc),
+                                              datetime(2025, 1, 1, tzinfo=dt_timezone.utc)]),
+                         ['Декабрь 2024', 'Январь 2025'])
+        self.assertEqual(format_weekdays([]), [])
+
+    def test_labels_in_threads(self):
+        days = [date(2024, 1, 1) + timedelta(days=i) for i in range(366)]
+        expected = format_weekdays(days)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(format_weekdays, [days] * 32))
+
+        self.assertTrue(all(result == expected for result in results))
@@ -15,6 +15,7 @@ import time
 import pandas as pd
 from selenium.webdriver.chrome.options import Options
 from core.settings import BASE_DIR
+from automation.rollups import rebuild_daily_rollups
 
 
 class CreateDataForTestDatabase(TestCase):
@@ -68,6 +69,7 @@ class CreateDataForTestDatabase(TestCase):
             [models.SupplyDetails(**sup_detail) for sup_detail in cls.supply_details])
         models.Statistics.objects.bulk_create([models.Statistics(**stat) for stat in cls.statistics])
         models.DailyStat.objects.bulk_create([models.DailyStat(**daily_stat) for daily_stat in cls.daily_stats])
+        rebuild_daily_rollups()
         models.MonthlyStat.objects.bulk_create(
             [models.MonthlyStat(**monthly_stat) for monthly_stat in cls.monthly_stats])
         models.ChangeSupply.objects.bulk_create([models.ChangeSupply(**change) for change in cls.change_supplies])
@@ -200,6 +202,7 @@ class TestLoginFunctionality(StaticLiveServerTestCase, TransactionTestCase):
             [models.SupplyDetails(**sup_detail) for sup_detail in cls.supply_details])
         models.Statistics.objects.bulk_create([models.Statistics(**stat) for stat in cls.statistics])
         models.DailyStat.objects.bulk_create([models.DailyStat(**daily_stat) for daily_stat in cls.daily_stats])
+        rebuild_daily_rollups()
         models.MonthlyStat.objects.bulk_create(
             [models.MonthlyStat(**monthly_stat) for monthly_stat in cls.monthly_stats])
         models.ChangeSupply.objects.bulk_create([models.ChangeSupply(**change) for change in cls.change_supplies])
@@ -293,6 +296,7 @@ class TestLogoutFunctionality(StaticLiveServerTestCase, TransactionTestCase):
             [models.SupplyDetails(**sup_detail) for sup_detail in cls.supply_details])
         models.Statistics.objects.bulk_create([models.Statistics(**stat) for stat in cls.statistics])
         models.DailyStat.objects.bulk_create([models.DailyStat(**daily_stat) for daily_stat in cls.daily_stats])
+        rebuild_daily_rollups()
         models.MonthlyStat.objects.bulk_create(
             [models.MonthlyStat(**monthly_stat) for monthly_stat in cls.monthly_stats])
         models.ChangeSupply.objects.bulk_create([models.ChangeSupply(**change) for change in cls.change_supplies])
@@ -388,6 +392,7 @@ class TestChangePasswordFunctionality(StaticLiveServerTestCase, TransactionTestC
             [models.SupplyDetails(**sup_detail) for sup_detail in cls.supply_details])
         models.Statistics.objects.bulk_create([models.Statistics(**stat) for stat in cls.statistics])
         models.DailyStat.objects.bulk_create([models.DailyStat(**daily_stat) for daily_stat in cls.daily_stats])
+        rebuild_daily_rollups()
         models.MonthlyStat.objects.bulk_create(
             [models.MonthlyStat(**monthly_stat) for monthly_stat in cls.monthly_stats])
         models.ChangeSupply.objects.bulk_create([models.ChangeSupply(**change) for change in cls.change_supplies])
@@ -497,6 +502,7 @@ class TestMainPageValues(StaticLiveServerTestCase, TransactionTestCase):
             [models.SupplyDetails(**sup_detail) for sup_detail in cls.supply_details])
         models.Statistics.objects.bulk_create([models.Statistics(**stat) for stat in cls.statistics])
         models.DailyStat.objects.bulk_create([models.DailyStat(**daily_stat) for daily_stat in cls.daily_stats])
+        rebuild_daily_rollups()
         models.MonthlyStat.objects.bulk_create(
             [models.MonthlyStat(**monthly_stat) for monthly_stat in cls.monthly_stats])
         models.ChangeSupply.objects.bulk_create([models.ChangeSupply(**change) for change in cls.change_supplies])
@@ -658,6 +664,7 @@ class TestNavigationFromMainToSinglePrinter(StaticLiveServerTestCase, Transactio
             [models.SupplyDetails(**sup_detail) for sup_detail in cls.supply_details])
         models.Statistics.objects.bulk_create([models.Statistics(**stat) for stat in cls.statistics])
         models.DailyStat.objects.bulk_create([models.DailyStat(**daily_stat) for daily_stat in cls.daily_stats])
+        rebuild_daily_rollups()
         models.MonthlyStat.objects.bulk_create(
             [models.MonthlyStat(**monthly_stat) for monthly_stat in cls.monthly_stats])
         models.ChangeSupply.objects.bulk_create([models.ChangeSupply(**change) for change in cls.change_supplies])
@@ -767,6 +774,7 @@ class TestNavigationFromMainToReports(StaticLiveServerTestCase, TransactionTestC
             [models.SupplyDetails(**sup_detail) for sup_detail in cls.supply_details])
         models.Statistics.objects.bulk_create([models.Statistics(**stat) for stat in cls.statistics])
         models.DailyStat.objects.bulk_create([models.DailyStat(**daily_stat) for daily_stat in cls.daily_stats])
+        rebuild_daily_rollups()
         models.MonthlyStat.objects.bulk_create(
             [models.MonthlyStat(**monthly_stat) for monthly_stat in cls.monthly_stats])
         models.ChangeSupply.objects.bulk_create([models.ChangeSupply(**change) for change in cls.change_supplies])
@@ -863,6 +871,7 @@ class TestNavigationFromMainToEvents(StaticLiveServerTestCase, TransactionTestCa
             [models.SupplyDetails(**sup_detail) for sup_detail in cls.supply_details])
         models.Statistics.objects.bulk_create([models.Statistics(**stat) for stat in cls.statistics])
         models.DailyStat.objects.bulk_create([models.DailyStat(**daily_stat) for daily_stat in cls.daily_stats])
+        rebuild_daily_rollups()
         models.MonthlyStat.objects.bulk_create(
             [models.MonthlyStat(**monthly_stat) for monthly_stat in cls.monthly_stats])
         models.ChangeSupply.objects.bulk_create([models.ChangeSupply(**change) for change in cls.change_supplies])
@@ -1000,6 +1009,7 @@ class TestExportReport(StaticLiveServerTestCase, TransactionTestCase):
             [models.SupplyDetails(**sup_detail) for sup_detail in cls.supply_details])
         models.Statistics.objects.bulk_create([models.Statistics(**stat) for stat in cls.statistics])
         models.DailyStat.objects.bulk_create([models.DailyStat(**daily_stat) for daily_stat in cls.daily_stats])
+        rebuild_daily_rollups()
         models.MonthlyStat.objects.bulk_create(
             [models.MonthlyStat(**monthly_stat) for monthly_stat in cls.monthly_stats])
         models.ChangeSupply.objects.bulk_create([models.ChangeSupply(**change) for change in cls.change_supplies])
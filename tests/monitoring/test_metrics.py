@@ -0,0 +1,125 @@
+from django.test import TestCase, SimpleTestCase, TransactionTestCase, Client, AsyncRequestFactory, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from types import SimpleNamespace
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from monitoring.metrics import (RequestMetrics, ViewMetricsRegistry, registry, render_prometheus_metrics,
+                                render_task_metrics, current_request_metrics)
+from monitoring.middleware import RequestMetricsMiddleware
+from monitoring.views import gather_contexts
+
+
+class RenderPrometheusMetricsTest(SimpleTestCase):
+    def test_render_prometheus_metrics(self):
+        view_registry = ViewMetricsRegistry()
+        summary = {'queries': 5, 'db_time': 0.02, 'python_time': 0.05, 'template_time': 0.01, 'total_time': 0.08}
+
+        view_registry.observe('monitoring:index', summary)
+        view_registry.observe('monitoring:index', {**summary, 'total_time': 3}, budget_exceeded=True)
+        text = render_prometheus_metrics(view_registry.snapshot())
+
+        self.assertIn('printer_monitoring_http_requests_total{view="monitoring:index"} 2', text)
+        self.assertIn('printer_monitoring_db_queries_total{view="monitoring:index"} 10', text)
+        self.assertIn('printer_monitoring_query_budget_exceeded_total{view="monitoring:index"} 1', text)
+        self.assertIn('printer_monitoring_http_request_duration_seconds_bucket{view="monitoring:index",le="0.1"} 1',
+                      text)
+        self.assertIn('printer_monitoring_http_request_duration_seconds_bucket{view="monitoring:index",le="+Inf"} 2',
+                      text)
+
+    def test_render_task_metrics(self):
+        last_run = SimpleNamespace(qty_attempted=3, qty_succeeded=2, qty_timed_out=1, qty_skipped=4, qty_failed=0)
+        task_summary = [{'task_name': 'monitoring.tasks.parsing_hps_page_counts', 'runs': 2, 'last_run': last_run,
+                         'duration': {'p50': 1.5, 'p95': 2.9, 'max': 3}, 'queue_lag': {'p50': None, 'p95': None,
+                                                                                       'max': None}}]
+        text = render_task_metrics(task_summary)
+
+        self.assertIn('printer_monitoring_task_duration_seconds{task="monitoring.tasks.parsing_hps_page_counts",'
+                      'quantile="0.95"} 2.9', text)
+        self.assertIn('printer_monitoring_task_queue_lag_seconds_count{task="monitoring.tasks.parsing_hps_page_counts"} 2',
+                      text)
+        self.assertIn('printer_monitoring_task_last_run_devices{task="monitoring.tasks.parsing_hps_page_counts",'
+                      'status="timed_out"} 1', text)
+
+    def test_request_metrics_counts_queries(self):
+        metrics = RequestMetrics()
+
+        metrics(lambda sql, params, many, context: None, 'SELECT 1', None, False, {})
+        summary = metrics.get_summary()
+
+        self.assertEqual(summary['queries'], 1)
+        self.assertGreaterEqual(summary['total_time'], summary['db_time'])
+
+
+class RequestMetricsMiddlewareTest(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='12345!"№', is_staff=True)
+        self.client.login(username='testuser', password='12345!"№')
+
+    def test_middleware_records_view_metrics(self):
+        self.client.get(reverse('monitoring:events'))
+
+        view = registry.snapshot()['monitoring:events']
+        self.assertEqual(view['requests'], 1)
+        self.assertGreater(view['queries'], 0)
+        self.assertGreater(view['template_time'], 0)
+
+    @override_settings(VIEW_QUERY_BUDGETS={'monitoring:events': 0})
+    def test_middleware_logs_exceeded_budget(self):
+        with self.assertLogs('metrics', level='WARNING') as logs:
+            self.client.get(reverse('monitoring:events'))
+
+        self.assertIn('"view": "monitoring:events"', logs.output[0])
+        self.assertEqual(registry.snapshot()['monitoring:events']['budget_exceeded'], 1)
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('monitoring:events'))
+
+        response = self.client.get(reverse('monitoring:metrics'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn('printer_monitoring_http_requests_total{view="monitoring:events"} 1', response.content.decode())
+
+    @override_settings(METRICS_ALLOWED_IPS=[])
+    def test_metrics_endpoint_forbidden(self):
+        self.client.logout()
+
+        response = self.client.get(reverse('monitoring:metrics'))
+
+        self.assertEqual(response.status_code, 403)
+
+
+class AsyncRequestMetricsTest(TestCase):
+    def setUp(self):
+        registry.reset()
+
+    async def test_async_middleware_records_queries(self):
+        async def get_response(request):
+            await sync_to_async(User.objects.count)()
+            return HttpResponse()
+
+        middleware = RequestMetricsMiddleware(get_response)
+        request = AsyncRequestFactory().get('/')
+        request.resolver_match = SimpleNamespace(view_name='monitoring:index')
+
+        self.assertTrue(iscoroutinefunction(middleware))
+        await middleware(request)
+
+        self.assertEqual(registry.snapshot()['monitoring:index']['queries'], 1)
+
+
+class GatherContextsMetricsTest(TransactionTestCase):
+    async def test_worker_queries_are_recorded(self):
+        metrics = RequestMetrics()
+        token = current_request_metrics.set(metrics)
+        try:
+            context = await gather_contexts(lambda: {'qty_users': User.objects.count()},
+                                            lambda: {'users': User.objects.all()})
+        finally:
+            current_request_metrics.reset(token)
+
+        self.assertEqual(context['qty_users'], 0)
+        self.assertGreaterEqual(metrics.queries, 2)
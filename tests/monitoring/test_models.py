@@ -419,6 +419,17 @@ class BaseStatModelTests(BaseSetUpPrinterModelTest):
         )
         self.assertEqual(monthly_stat.formatted_time_collect(), monthly_stat.time_collect.strftime('%m-%Y'))
 
+    def test_collect_date_uses_local_date(self):
+        models.DailyStat.objects.create(
+            printer=self.printer,
+            page=50,
+            print=100,
+            time_collect=timezone.make_aware(datetime(2024, 10, 22, 20, 0, 0), timezone.get_fixed_timezone(0))
+        )
+        daily_stat = models.DailyStat.objects.get()
+        self.assertEqual(daily_stat.collect_date, date(2024, 10, 23))
+        self.assertTrue(models.DailyStat.objects.filter(collect_date=date(2024, 10, 23)).exists())
+
     def test_statistics_meta(self):
         self.assertEqual(models.Statistics._meta.db_table, 'statistics')
         self.assertEqual(models.Statistics._meta.db_table_comment, 'Таблица для хранения информации о статистике '
@@ -1,5 +1,5 @@
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import TestCase, Client
 from django.contrib.sessions.models import Session
 from django.utils import timezone
 from django.contrib.auth.signals import user_logged_in
@@ -25,6 +25,24 @@ class UserLoginTest(TestCase):
 
         self.assertFalse(Session.objects.filter(session_key=session_key).exists())
 
+    def test_login_evicts_session_from_other_client(self):
+        other_client = Client()
+        other_client.login(username='user1', password='password')
+        other_session_key = other_client.session.session_key
+
+        self.client.login(username='user1', password='password')
+
+        self.assertFalse(Session.objects.filter(session_key=other_session_key).exists())
+        self.assertEqual(models.UserSession.objects.get(user=self.user1).session_key,
+                         self.client.session.session_key)
+
+    def test_logout_forgets_user_session(self):
+        self.client.login(username='user1', password='password')
+
+        self.client.logout()
+
+        self.assertFalse(models.UserSession.objects.filter(user=self.user1).exists())
+
 
 class PrinterNotificationTest(TestCase):
     @patch('monitoring.signals.send_msg')
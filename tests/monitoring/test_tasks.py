@@ -1,16 +1,21 @@
 from django.test import TestCase, Client
 from django.utils import timezone
 from django.contrib.sessions.models import Session
+from django.contrib.auth import get_user_model
 from monitoring.tasks import (delete_expired_sessions, scan_subnets_regular, checking_activity_regular,
                               update_printer_resource_regular, parsing_katushas_page_counts,
                               parsing_avisions_page_counts, parsing_hps_page_counts, parsing_kyoseras_page_counts,
                               parsing_pantums_page_counts, parsing_sindohs_page_counts, async_detect_device_errors,
-                              detect_device_errors_regular, async_update_printer_resource)
+                              detect_device_errors_regular, async_update_printer_resource,
+                              async_update_printers_resources)
 from unittest.mock import patch
+from automation.telemetry import TaskTelemetry
 from monitoring import models
 from django.db.models.signals import post_save
 from monitoring.signals import printer_created
 
+User = get_user_model()
+
 
 class DeleteExpiredSessionsTests(TestCase):
     def test_delete_expired_sessions(self):
@@ -39,6 +44,17 @@ class DeleteExpiredSessionsTests(TestCase):
         self.assertIn(valid_session.session_key, session_keys)
         self.assertNotIn(expired_session.session_key, session_keys)
 
+    def test_delete_expired_sessions_in_batches(self):
+        user = User.objects.create_user(username='user1', password='password')
+        for session_key in range(5):
+            Session.objects.create(session_key=session_key, expire_date=timezone.now() - timezone.timedelta(days=1))
+        models.UserSession.objects.create(user=user, session_key='3')
+
+        self.assertEqual(delete_expired_sessions(batch_size=2), 5)
+
+        self.assertFalse(Session.objects.exists())
+        self.assertFalse(models.UserSession.objects.exists())
+
 
 class ScanSubnetsRegularTests(TestCase):
     def setUp(self):
@@ -154,15 +170,43 @@ class UpdatePrinterResourceRegularTests(TestCase):
         async_update_printer_resource(printer_id)
         mock_update.assert_called_once_with(printer_id)
 
-    @patch('monitoring.tasks.async_update_printer_resource')
+    @patch('monitoring.tasks.update_printers_resources')
+    def test_async_update_printers_resources(self, mock_update):
+        async_update_printers_resources([1, 2])
+        self.assertEqual(mock_update.call_args[0][0], [1, 2])
+        self.assertIsInstance(mock_update.call_args[0][1], TaskTelemetry)
+
+    @patch('monitoring.tasks.async_update_printers_resources')
     def test_update_printer_resource_regular_calls_async_update(self, mock_async_update):
         update_printer_resource_regular()
 
-        mock_async_update.delay.assert_any_call(self.printer1.id)
-        mock_async_update.delay.assert_any_call(self.printer2.id)
+        mock_async_update.delay.assert_called_once_with([self.printer1.id, self.printer2.id])
+
+    @patch('monitoring.tasks.RESOURCES_BATCH_SIZE', 1)
+    @patch('monitoring.tasks.async_update_printers_resources')
+    def test_update_printer_resource_regular_splits_into_batches(self, mock_async_update):
+        update_printer_resource_regular()
+
+        mock_async_update.delay.assert_any_call([self.printer1.id])
+        mock_async_update.delay.assert_any_call([self.printer2.id])
 
         self.assertEqual(mock_async_update.delay.call_count, 2)
 
+    @patch('monitoring.tasks.async_update_printers_resources')
+    def test_update_printer_resource_regular_skips_collector_subnets(self, mock_async_update):
+        collector = models.CollectorAgent.objects.create(name='Branch collector')
+        collector.subnets.add(self.subnet)
+
+        update_printer_resource_regular()
+
+        mock_async_update.delay.assert_not_called()
+
+        collector.is_active = False
+        collector.save()
+        update_printer_resource_regular()
+
+        mock_async_update.delay.assert_called_once_with([self.printer1.id, self.printer2.id])
+
 
 class ParsingKatushasPageCountsTests(TestCase):
     def setUp(self):
@@ -1,4 +1,4 @@
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client, AsyncRequestFactory
 from django.urls import reverse
 from django.contrib.auth.models import User
 from monitoring import models
@@ -8,16 +8,26 @@ from django.utils import timezone
 from datetime import datetime, timedelta
 from django.contrib.auth import logout, login
 import json
-from django.contrib.admin.models import LogEntry, ADDITION
+from django.contrib.admin.models import LogEntry, ADDITION, CHANGE
 from django.contrib.contenttypes.models import ContentType
 from unittest.mock import patch
 from io import BytesIO
 import pandas as pd
 import unittest
 from monitoring.views import (get_variables_stats, calculate_percentage, update_info, get_area_name, get_report_option,
-                              create_events)
+                              create_events, get_index_context, aget_index_context, index_async, single_printer_async,
+                              render_admin_action)
+from asgiref.sync import sync_to_async
+from functools import partial
+from django.http import Http404
+from django.contrib.auth import get_user
+from django.contrib.sessions.backends.db import SessionStore
 from django.contrib.auth.signals import user_logged_out
 from monitoring.signals import log_user_logout
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from automation.rollups import rebuild_daily_rollups, add_daily_stats_to_rollups
 
 
 class TestGetVariablesStats(unittest.TestCase):
@@ -245,6 +255,7 @@ class CreateDBTest(TestCase):
             event_date=timezone.make_aware(datetime(2024, 10, 19, 8, 0, 0)),
             description="Ошибка печати"
         )
+        rebuild_daily_rollups()
 
 
 class UpdateInfoTests(CreateDBTest):
@@ -352,6 +363,12 @@ class UpdateInfoTests(CreateDBTest):
         self.assertEqual(len(result['events_small']), 1)
         self.assertIn('events_small', result)
 
+    def test_update_info_subnet_printer_count(self):
+        result = update_info()
+
+        self.assertEqual([(subnet['name'], subnet['printer_count']) for subnet in result['subnet_printer_count']],
+                         [('Test Subnet 1', 1), ('Test Subnet 2', 2)])
+
     def test_update_info_low_toner(self):
         result = update_info()
         self.assertIn('printers_low_toner', result)
@@ -404,6 +421,23 @@ class CreateEventsTest(CreateDBTest):
         events = create_events(changes_supplies, errors, admin_log)
         self.assertEqual(len(events), 0)
 
+    def test_admin_change_message_is_parsed_once(self):
+        render_admin_action.cache_clear()
+        change_message = json.dumps([{'changed': {'fields': ['IP-адрес', 'Комментарий']}}])
+        for _ in range(3):
+            LogEntry.objects.create(user=self.user, content_type=ContentType.objects.get_for_model(models.Printer),
+                                    object_id=str(self.printer.id), object_repr=str(self.printer),
+                                    action_flag=CHANGE, change_message=change_message)
+        admin_log = LogEntry.objects.filter(action_flag=CHANGE)
+
+        with patch('monitoring.views.json.loads', wraps=json.loads) as mock_loads:
+            events = create_events([], [], admin_log)
+            create_events([], [], admin_log)
+
+        mock_loads.assert_called_once_with(change_message)
+        self.assertEqual(events[0]['description'],
+                         'Пользователь: testuser, Действие: Изменены поля (IP-адрес, Комментарий)')
+
 
 class EmptyDatabaseViewTests(TestCase):
     def setUp(self):
@@ -611,6 +645,19 @@ class SinglePrinterViewTests(CreateDBTest):
         self.assertEqual(response.status_code, 200)
         self.assertIn('events_single_printer_small', response.context)
 
+    def test_admin_log_is_matched_by_object_id(self):
+        LogEntry.objects.create(user=self.user, content_type=ContentType.objects.get_for_model(models.Printer),
+                                object_id=str(self.printer.id), object_repr='HP 1010 192.168.0.1',
+                                action_flag=ADDITION)
+        LogEntry.objects.create(user=self.user, content_type=ContentType.objects.get_for_model(models.SupplyItem),
+                                object_id=str(self.printer.id), object_repr=str(self.printer), action_flag=ADDITION)
+
+        response = self.client.get(reverse('monitoring:printer', args=[self.printer.id]))
+
+        admin_events = [event for event in response.context['events_single_printer_small']
+                        if event['type'] == 'Информация']
+        self.assertEqual([event['object_repr'] for event in admin_events], ['HP 1010 192.168.0.1'])
+
     def test_delete_maintenance_costs(self):
         models.MaintenanceCosts.objects.all().delete()
         response = self.client.get(reverse('monitoring:printer', args=[self.printer.id]))
@@ -716,6 +763,7 @@ class DataInJsTests(CreateDBTest):
             )
             daily_stats.append(stat)
         models.DailyStat.objects.bulk_create(daily_stats)
+        rebuild_daily_rollups()
 
         response_printers = self.client.get(reverse('monitoring:data_in_js',
                                                     kwargs={'nm_data': 'week-stats'}))
@@ -807,6 +855,18 @@ class ReportsViewTests(CreateDBTest):
         self.assertContains(response, 'Страниц')
         self.assertContains(response, '7000')
 
+    def test_statistics_report_uses_local_collect_date(self):
+        models.Statistics.objects.create(printer=self.printer, page=12345, print=12345, copies=0, scan=0,
+                                         time_collect=timezone.make_aware(datetime(2024, 10, 23, 0, 30)))
+        response = self.client.post(reverse('monitoring:reports'), {
+            'area': 'all',
+            'option': 'print',
+            'date_field': '2024-10-23',
+            'statistics_report': True,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '12345')
+
     def test_statistics_report_area_valid(self):
         models.Subnet.objects.create(name='sayanogorsk', address='192.168.2.0', mask=24)
         response = self.client.post(reverse('monitoring:reports'), {
@@ -1232,4 +1292,183 @@ class ForecastViewTests(CreateDBTest):
         self.assertTemplateUsed(response, 'monitoring/forecast.html')
         self.assertIn('month_forecast', response.context)
         self.assertIn('total_daily_pages', response.context)
-        self.assertIn('total_costs', response.context)
\ No newline at end of file
+        self.assertIn('total_costs', response.context)
+
+class IngestReadingsViewTests(CreateDBTest):
+    def setUp(self):
+        super().setUp()
+        self.collector = models.CollectorAgent.objects.create(name='Branch collector')
+        self.body = json.dumps({'serial_number': 'SN9876543', 'time_collect': timezone.now().isoformat(),
+                                'page': 100000, 'print': 100000, 'copies': 0, 'scan': 0}).encode()
+
+    def post_readings(self, body, token=None, content_type='application/x-ndjson'):
+        return self.client.post(reverse('monitoring:ingest_readings'), data=body, content_type=content_type,
+                                HTTP_AUTHORIZATION=f'Token {token or self.collector.token}')
+
+    def test_ingest_readings(self):
+        response = self.post_readings(self.body)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['accepted'], 1)
+        self.collector.refresh_from_db()
+        self.assertIsNotNone(self.collector.last_seen)
+
+    def test_ingest_readings_invalid_token(self):
+        response = self.post_readings(self.body, token='invalid')
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_ingest_readings_inactive_collector(self):
+        self.collector.is_active = False
+        self.collector.save()
+
+        response = self.post_readings(self.body)
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_ingest_readings_unsupported_content_type(self):
+        response = self.post_readings(self.body, content_type='text/plain')
+
+        self.assertEqual(response.status_code, 415)
+
+    def test_ingest_readings_invalid_batch(self):
+        response = self.post_readings(b'{"serial_number": "SN9876543"}')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Reading 1', response.json()['error'])
+
+    def test_collector_config(self):
+        self.collector.subnets.add(self.printer.ip_address.subnet)
+
+        response = self.client.get(reverse('monitoring:collector_config'),
+                                   HTTP_AUTHORIZATION=f'Token {self.collector.token}')
+
+        self.assertEqual(response.status_code, 200)
+        subnet = self.printer.ip_address.subnet
+        self.assertEqual(response.json()['subnets'], [f'{subnet.address}/{subnet.mask}'])
+
+    def test_collector_config_invalid_token(self):
+        response = self.client.get(reverse('monitoring:collector_config'), HTTP_AUTHORIZATION='Token invalid')
+
+        self.assertEqual(response.status_code, 401)
+
+
+class DataInJsConditionalTests(CreateDBTest):
+    def test_week_stats_aggregated_by_day(self):
+        models.DailyStat.objects.all().delete()
+        for day in range(10):
+            for page in (100, 50):
+                models.DailyStat.objects.create(printer=self.printer, page=page, print=page, copies=0, scan=0,
+                                                time_collect=timezone.make_aware(datetime(2024, 10, 10 + day, 12)))
+        rebuild_daily_rollups()
+
+        response = self.client.get(reverse('monitoring:data_in_js', kwargs={'nm_data': 'week-stats'}))
+
+        data_weekly_stats = json.loads(response.content)['data_weekly_stats']
+        self.assertEqual(data_weekly_stats['total']['datasets'][0]['data'], [150] * 7)
+        self.assertEqual(len(data_weekly_stats['total']['labels']), 7)
+
+    def test_data_in_js_not_modified(self):
+        response = self.client.get(reverse('monitoring:data_in_js', kwargs={'nm_data': 'month-stats'}))
+        self.assertIn('ETag', response)
+        self.assertIn('private', response['Cache-Control'])
+
+        response_cached = self.client.get(reverse('monitoring:data_in_js', kwargs={'nm_data': 'month-stats'}),
+                                          HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response_cached.status_code, 304)
+
+    def test_data_in_js_modified_after_new_stats(self):
+        response = self.client.get(reverse('monitoring:data_in_js', kwargs={'nm_data': 'month-stats'}))
+        add_daily_stats_to_rollups([models.DailyStat.objects.create(printer=self.printer, page=1, print=1, copies=0,
+                                                                    scan=0)])
+
+        response_new = self.client.get(reverse('monitoring:data_in_js', kwargs={'nm_data': 'month-stats'}),
+                                       HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response_new.status_code, 200)
+
+
+class QueryBudgetTests(CreateDBTest):
+    def assertWithinQueryBudget(self, view_name, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        budget = settings.VIEW_QUERY_BUDGETS[view_name]
+        self.assertLessEqual(len(queries), budget, f'{view_name} ran {len(queries)} queries, the budget is {budget}')
+
+    def test_index_query_budget(self):
+        self.assertWithinQueryBudget('monitoring:index', reverse('monitoring:index'))
+
+    def test_single_printer_query_budget(self):
+        self.assertWithinQueryBudget('monitoring:printer', reverse('monitoring:printer', args=[self.printer.id]))
+
+    def test_reports_query_budget(self):
+        self.assertWithinQueryBudget('monitoring:reports', reverse('monitoring:reports'))
+
+    def test_single_report_query_budget(self):
+        self.assertWithinQueryBudget('monitoring:report', reverse('monitoring:report', args=['page', '7days']))
+
+    def test_data_in_js_query_budget(self):
+        self.assertWithinQueryBudget('monitoring:data_in_js',
+                                     reverse('monitoring:data_in_js', kwargs={'nm_data': 'week-stats'}))
+
+    def test_events_query_budget(self):
+        self.assertWithinQueryBudget('monitoring:events', reverse('monitoring:events'))
+
+    def test_forecast_query_budget(self):
+        self.assertWithinQueryBudget('monitoring:forecast', reverse('monitoring:forecast'))
+
+
+class AsyncDashboardViewTests(TransactionTestCase):
+    setUp = CreateDBTest.setUp
+
+    def get_async_request(self, path):
+        async def auser():
+            return self.user
+
+        request = AsyncRequestFactory().get(path)
+        request.user = self.user
+        request.auser = auser
+        request.session = SessionStore()
+        return request
+
+    async def test_index_context_matches_sync(self):
+        sync_context = await sync_to_async(get_index_context)()
+        async_context = await aget_index_context()
+
+        self.assertEqual(set(async_context), set(sync_context))
+        for key in ('sum_total_page', 'sum_total_daily_page', 'sum_total_weekly_page', 'total_sum_all_printers',
+                    'qty_printers'):
+            self.assertEqual(async_context[key], sync_context[key])
+        self.assertEqual(async_context['printers_without_black_cart'], [])
+
+    async def test_index_async_view(self):
+        request = self.get_async_request('/')
+        request.session['printer_id'] = self.printer.id
+
+        response = await index_async(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('printer_id', request.session)
+
+    async def test_single_printer_async_view(self):
+        request = self.get_async_request(f'/{self.printer.id}')
+
+        response = await single_printer_async(request, self.printer.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(request.session['printer_id'], self.printer.id)
+        self.assertIn(self.printer.serial_number, response.content.decode())
+
+    async def test_single_printer_async_view_invalid_printer(self):
+        with self.assertRaises(Http404):
+            await single_printer_async(self.get_async_request('/0'), 0)
+
+    async def test_async_views_require_login(self):
+        request = self.get_async_request('/')
+        request.auser = partial(sync_to_async(get_user), request)
+
+        response = await index_async(request)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, '/accounts/login?next=/')
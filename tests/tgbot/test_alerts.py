@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+from django.test import SimpleTestCase
+from tgbot.alerts import group_by, render_low_supply_messages
+from tgbot.read_model import build_supply_rows
+
+
+class FakePrinter(SimpleNamespace):
+    def get_subnet_name(self):
+        return self.subnet
+
+
+class LowSupplyMessagesTest(SimpleTestCase):
+    def test_render_messages_at_10k_rows(self):
+        printers = [FakePrinter(id=i, model=f'HP LaserJet {i}', subnet='Subnet1', location='IT')
+                    for i in range(5000)]
+        supplies = [SimpleNamespace(printer_id=i % 5000, supply=f'Картридж {i}', remaining_supply_percentage=i % 10)
+                    for i in range(10000)]
+
+        messages = render_low_supply_messages(printers, group_by(supplies, 'printer_id'))
+
+        self.assertEqual(len(messages), 5000)
+        self.assertEqual(messages[7], '📢 <b>УВЕДОМЛЕНИЕ</b>\n\n'
+                                      'Принтер: HP LaserJet 7\n'
+                                      'Местоположение: Subnet1, IT\n'
+                                      'Остаток Картридж 7 - 7%\n'
+                                      'Остаток Картридж 5007 - 7%')
+
+    def test_printer_without_supplies(self):
+        printer = FakePrinter(id=1, model='HP LaserJet', subnet='Subnet1', location='IT')
+
+        self.assertEqual(render_low_supply_messages([printer], {}),
+                         ['📢 <b>УВЕДОМЛЕНИЕ</b>\n\nПринтер: HP LaserJet\nМестоположение: Subnet1, IT'])
+
+
+class SupplyRowsTest(SimpleTestCase):
+    def test_build_supply_rows_at_10k_rows(self):
+        supplies = [SimpleNamespace(id=i, supply_id=i, qty=i % 50,
+                                    supply=SimpleNamespace(name=f'BM {i}', type='cartridge', price=1500))
+                    for i in range(10000)]
+        printer_models = {i: f'HP LaserJet {i}' for i in range(0, 10000, 2)}
+
+        rows = build_supply_rows(supplies, printer_models)
+
+        self.assertEqual(len(rows), 10000)
+        self.assertEqual(rows[4]['printer'], 'HP LaserJet 4')
+        self.assertIsNone(rows[5]['printer'])
+        self.assertEqual(rows[5]['name'], 'BM 5')
@@ -9,14 +9,17 @@ from tgbot.management.commands.bot import (start, help_command_main, end_input,
                                            wrap_text, handle_text_input_printer, handle_text_input_supplies,
                                            handle_text_input_printer_events, all_printers, single_printer, all_events,
                                            single_printer_events, events_supplies, all_supplies, single_supplies,
-                                           init_first_users, check_supplies_every_3days, check_supplies_every_7_days,
-                                           check_supplies_every_2_weeks)
+                                           greet_new_users, known_users, check_supplies_every_3days, check_supplies_every_7_days,
+                                           check_supplies_every_2_weeks, handle_pagination,
+                                           get_latest_printer_stats)
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler, CallbackQueryHandler, MessageHandler, filters, JobQueue
 from unittest.mock import AsyncMock
 from tgbot.models import TelegramUser
+from tgbot.read_model import read_model
 from asgiref.sync import sync_to_async
 import re
+from tgbot.alerts import send_to_chats
 from tests.monitoring.test_models import BaseSetUpPrinterModelTest, SupplyDetailsModelTest, PrinterErrorModelTest
 from datetime import timedelta
 
@@ -60,6 +63,45 @@ class TestWrapText(TestCase):
         self.assertEqual(wrap_text("😊😊😊😊😊😊", 3), "😊😊😊\n😊😊😊")
 
 
+class TestHandlePagination(TestCase):
+    def setUp(self):
+        self.rows = list(range(45))
+
+    def get_page(self, context, data, nm_page='all_printers'):
+        return handle_pagination(Mock(data=data), context, self.rows, nm_page)
+
+    def test_pages_are_stored_per_user(self):
+        first_context = Mock(user_data=dict())
+        second_context = Mock(user_data=dict())
+
+        self.get_page(first_context, '5')
+        self.get_page(first_context, 'next_page_all_printers')
+        self.assertEqual(self.get_page(second_context, '5')['current_page'], 0)
+
+        info = self.get_page(first_context, 'next_page_all_printers')
+        self.assertEqual(info['current_page'], 2)
+        self.assertEqual(info['total_pages'], 3)
+        self.assertEqual(info['qty_lines'], list(range(40, 45)))
+        self.assertEqual(info['keyboard'][0][0].callback_data, 'prev_page_all_printers')
+        self.assertEqual(first_context.user_data['pages'], {'all_printers': 2})
+
+    def test_pages_are_stored_per_list(self):
+        context = Mock(user_data={'pages': {'all_printers': 1}})
+
+        info = self.get_page(context, 'next_page_all_supplies', 'all_supplies')
+
+        self.assertEqual(info['current_page'], 1)
+        self.assertEqual(context.user_data['pages'], {'all_printers': 1, 'all_supplies': 1})
+
+    def test_page_is_clamped_to_last_page(self):
+        context = Mock(user_data={'pages': {'all_printers': 10}})
+
+        info = self.get_page(context, 'next_page_all_printers')
+
+        self.assertEqual(info['current_page'], 2)
+        self.assertEqual(info['qty_lines'], list(range(40, 45)))
+
+
 class StartTelegramApp(TestCase):
     def setUp(self):
         token = config('TELEGRAM_BOT_TOKEN')
@@ -71,6 +113,8 @@ class StartTelegramAppUnauthenticatedUser(StartTelegramApp):
         super().setUp()
         self.update = Mock(spec=Update)
         self.context = Mock(spec=ContextTypes.DEFAULT_TYPE)
+        self.context.user_data = dict()
+        read_model.invalidate('allowed_users')
         self.update.message.from_user.first_name = 'Иван'
         self.update.message.from_user.last_name = 'Иванов'
         self.update.effective_chat.id = 123456789
@@ -361,6 +405,7 @@ class TelegramBotSendNotifyTest(TestCase):
         self.mock_context.job.chat_id = 12345
 
         self.mock_printer = MagicMock()
+        self.mock_printer.id = 1
         self.mock_printer.model = "HP LaserJet"
         self.mock_printer.get_subnet_name.return_value = "Subnet1"
         self.mock_printer.location = "1, отдел - IT"
@@ -369,6 +414,7 @@ class TelegramBotSendNotifyTest(TestCase):
         self.mock_supply.supply = "Черный"
         self.mock_supply.remaining_supply_percentage = 5
         self.mock_supply.printer = self.mock_printer
+        self.mock_supply.printer_id = 1
 
         self.mock_supply_details = MagicMock()
         self.mock_supply_details.supply = "Черный"
@@ -376,6 +422,7 @@ class TelegramBotSendNotifyTest(TestCase):
 
     @patch('monitoring.models.PrinterSupplyStatus.objects.select_related')
     @patch('monitoring.models.Printer.objects.select_related')
+    @patch('tgbot.management.commands.bot.active_chats_notify', {12345})
     async def test_check_every_3days(self, mock_select_printer, mock_select_printer_supply):
         mock_select_printer.return_value.filter.return_value = [self.mock_printer]
         mock_select_printer_supply.return_value.filter.return_value = [self.mock_supply]
@@ -393,6 +440,7 @@ class TelegramBotSendNotifyTest(TestCase):
 
     @patch('monitoring.models.PrinterSupplyStatus.objects.select_related')
     @patch('monitoring.models.Printer.objects.select_related')
+    @patch('tgbot.management.commands.bot.active_chats_notify', {12345})
     async def test_check_every_7days(self, mock_select_printer, mock_select_printer_supply):
         mock_select_printer.return_value.filter.return_value = [self.mock_printer]
         mock_select_printer_supply.return_value.filter.return_value = [self.mock_supply]
@@ -409,6 +457,7 @@ class TelegramBotSendNotifyTest(TestCase):
         )
 
     @patch('monitoring.models.SupplyDetails.objects.select_related')
+    @patch('tgbot.management.commands.bot.active_chats_notify', {12345})
     async def test_check_every_2week(self, mock_select_supply_details):
         mock_select_supply_details.return_value.filter.return_value = [self.mock_supply_details]
 
@@ -423,6 +472,45 @@ class TelegramBotSendNotifyTest(TestCase):
         )
 
 
+class TelegramBotSharedNotifyTest(TestCase):
+    @patch('tgbot.management.commands.bot.active_chats_notify', {1, 2, 3})
+    @patch('tgbot.management.commands.bot.load_low_supply_messages', return_value=['first', 'second'])
+    async def test_check_runs_once_for_all_chats(self, mock_load_messages):
+        context = AsyncMock()
+
+        await check_supplies_every_3days(context)
+
+        mock_load_messages.assert_called_once_with('cartridge', 10)
+        self.assertEqual(context.bot.send_message.await_count, 6)
+        self.assertEqual({call.kwargs['chat_id'] for call in context.bot.send_message.await_args_list}, {1, 2, 3})
+
+    @patch('tgbot.management.commands.bot.active_chats_notify', set())
+    @patch('tgbot.management.commands.bot.load_low_supply_messages')
+    async def test_check_skipped_without_subscribers(self, mock_load_messages):
+        context = AsyncMock()
+
+        await check_supplies_every_7_days(context)
+
+        mock_load_messages.assert_not_called()
+        context.bot.send_message.assert_not_awaited()
+
+    @patch('tgbot.alerts.asyncio.sleep')
+    async def test_send_to_chats_in_batches(self, mock_sleep):
+        def send_message(chat_id, text, parse_mode):
+            if chat_id == 3:
+                raise RuntimeError('Forbidden')
+
+        bot = AsyncMock()
+        bot.send_message.side_effect = send_message
+
+        qty_sent = await send_to_chats(bot, [1, 2, 3], ['first', 'second'], batch_size=2, interval=0.5)
+
+        self.assertEqual(qty_sent, 4)
+        self.assertEqual(bot.send_message.await_count, 6)
+        self.assertEqual(mock_sleep.await_count, 3)
+        mock_sleep.assert_awaited_with(0.5)
+
+
 class HandleTextInputPrinterTest(BaseSetUpPrinterModelTest):
     async def test_handle_text_input_printer_invalid_id(self):
         update = AsyncMock()
@@ -473,6 +561,9 @@ class HandleTextInputPrinterTest(BaseSetUpPrinterModelTest):
         self.assertIn(self.printer.location.department.name, str_text)
         self.assertIn(self.printer.location.cabinet.number, str_text)
 
+    async def test_latest_printer_stats_missing(self):
+        self.assertIsNone(await get_latest_printer_stats(self.printer.id))
+
 
 class HandleTextInputSuppliesTest(SupplyDetailsModelTest):
     async def test_handle_text_input_supplies_invalid_id(self):
@@ -878,17 +969,28 @@ class TelegramBotPagesTests(StartTelegramBotAuthenticatedUser):
         self.assertIn('Для удобного отображения таблицы переверните устройство', str_text)
 
 
-class InitFirstUsersNotCalled(StartTelegramAppUnauthenticatedUser):
+class AllowedUsersCacheTest(StartTelegramAppUnauthenticatedUser):
     def setUp(self):
         super().setUp()
-        mock_job_queue = Mock()
-        mock_job = Mock()
-        mock_job_queue.jobs.return_value = [mock_job]
-
-        self.mock_context = Mock()
-        self.mock_context.job_queue = mock_job_queue
-        self.mock_context.bot.send_message = AsyncMock()
+        known_users.clear()
+        self.bot = AsyncMock()
 
     async def test_not_allowed_users(self):
-        await init_first_users(self.mock_context)
-        self.mock_context.bot.send_message.assert_not_called()
\ No newline at end of file
+        self.assertEqual(await greet_new_users(self.bot), set())
+        self.bot.send_message.assert_not_called()
+
+    async def test_new_users_are_greeted_once(self):
+        await sync_to_async(TelegramUser.objects.create)(chat_id=123456789, username='Иван')
+
+        self.assertEqual(await greet_new_users(self.bot), {123456789})
+        await greet_new_users(self.bot)
+
+        self.bot.send_message.assert_awaited_once_with(chat_id=123456789, text='Доступ к боту открыт ✅',
+                                                       parse_mode='HTML')
+
+    async def test_user_changes_invalidate_cache(self):
+        self.assertNotIn(123456789, await read_model.get_rows('allowed_users'))
+
+        await sync_to_async(TelegramUser.objects.create)(chat_id=123456789, username='Иван')
+
+        self.assertIn(123456789, await read_model.get_rows('allowed_users'))
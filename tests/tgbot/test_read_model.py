@@ -0,0 +1,76 @@
+import time
+from django.test import SimpleTestCase
+from unittest.mock import Mock, AsyncMock
+from tgbot.read_model import ReadModel, read_model, load_printer_rows, load_supply_rows
+from tgbot.management.commands.bot import all_printers, ALL_OBJECTS
+from tests.monitoring.test_models import BaseSetUpPrinterSupplyStatusModelTest
+
+
+class ReadModelTest(SimpleTestCase):
+    async def test_rows_are_cached_until_invalidated(self):
+        loader = Mock(return_value=[{'id': 1}])
+        model = ReadModel({'printers': loader})
+
+        self.assertEqual(await model.get_rows('printers'), [{'id': 1}])
+        await model.get_rows('printers')
+        loader.assert_called_once()
+
+        model.invalidate('printers')
+        await model.get_rows('printers')
+        self.assertEqual(loader.call_count, 2)
+
+    async def test_rows_expire_after_ttl(self):
+        loader = Mock(return_value=[])
+        model = ReadModel({'printers': loader}, ttl=0)
+
+        await model.get_rows('printers')
+        await model.get_rows('printers')
+
+        self.assertEqual(loader.call_count, 2)
+
+
+class ReadModelRowsTest(BaseSetUpPrinterSupplyStatusModelTest):
+    def setUp(self):
+        super().setUp()
+        read_model.invalidate()
+
+    def test_printer_rows(self):
+        self.assertEqual(load_printer_rows(), [{
+            'id': self.printer.id,
+            'model': 'HP LaserJet',
+            'status': '🟢',
+            'ip_address': '192.168.1.123',
+            'location': f'{self.printer.get_subnet_name()}, {self.location}',
+        }])
+
+    def test_supply_rows(self):
+        rows = load_supply_rows()
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['id'], self.supply_details.id)
+        self.assertEqual(rows[0]['qty'], 100)
+        self.assertEqual(rows[0]['printer'], 'HP LaserJet')
+
+    def test_changes_invalidate_rows(self):
+        read_model.entries['printers'] = (time.monotonic(), [])
+        read_model.entries['supplies'] = (time.monotonic(), [])
+
+        self.supply_details.save()
+        self.assertIn('printers', read_model.entries)
+        self.assertNotIn('supplies', read_model.entries)
+
+        self.printer.save()
+        self.assertNotIn('printers', read_model.entries)
+
+    async def test_page_flip_uses_cached_rows(self):
+        update = Mock()
+        update.callback_query = AsyncMock()
+        update.callback_query.data = str(ALL_OBJECTS)
+
+        context = Mock(user_data=dict())
+
+        await all_printers(update, context)
+        with self.assertNumQueries(0):
+            await all_printers(update, context)
+
+        self.assertIn('HP LaserJet', update.callback_query.edit_message_text.call_args[1]['text'])
@@ -0,0 +1,105 @@
+import asyncio
+import json
+from django.test import TestCase, SimpleTestCase
+from unittest.mock import AsyncMock, Mock, patch
+from tgbot.management.commands.bot import build_application
+from tgbot.update_sources import (LocalReplaySource, OfflineRequest, WebhookSource, ALLOWED_UPDATES, WEBHOOK_PATH)
+
+
+def get_command_update(update_id, user_id, text):
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'Иван'},
+            'text': text,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(text)}],
+        },
+    }
+
+
+class LocalReplaySourceTest(TestCase):
+    def test_replay_updates_offline(self):
+        request = OfflineRequest()
+        updates = [get_command_update(i, 100 + i % 3, '/help') for i in range(9)]
+
+        result = LocalReplaySource(updates, concurrency=3).run(build_application(request))
+
+        self.assertEqual(result['updates'], 9)
+        self.assertEqual(result['users'], 3)
+        self.assertEqual(request.calls['getMe'], 1)
+        self.assertEqual(request.calls['sendMessage'], 9)
+
+
+class WebhookSourceTest(SimpleTestCase):
+    def setUp(self):
+        self.source = WebhookSource('https://example.com/tgbot/webhook', 'secret')
+        self.django_application = AsyncMock()
+        self.application = Mock(bot=None)
+
+    async def call(self, scope, body=b''):
+        messages = list()
+        receive = AsyncMock(return_value={'type': 'http.request', 'body': body, 'more_body': False})
+
+        async def send(message):
+            messages.append(message)
+
+        await self.source.wrap_asgi(self.application, self.django_application)(scope, receive, send)
+        return messages
+
+    def get_scope(self, method='POST', path=WEBHOOK_PATH, secret=b'secret'):
+        return {'type': 'http', 'method': method, 'path': path,
+                'headers': [(b'x-telegram-bot-api-secret-token', secret)]}
+
+    async def test_update_is_queued(self):
+        self.application.update_queue = asyncio.Queue()
+
+        messages = await self.call(self.get_scope(), json.dumps(get_command_update(1, 100, '/start')).encode())
+
+        self.assertEqual(messages[0]['status'], 200)
+        update = self.application.update_queue.get_nowait()
+        self.assertEqual(update.message.text, '/start')
+        self.django_application.assert_not_awaited()
+
+    async def test_invalid_requests(self):
+        self.assertEqual((await self.call(self.get_scope(secret=b'wrong')))[0]['status'], 403)
+        self.assertEqual((await self.call(self.get_scope(secret=b'')))[0]['status'], 403)
+        self.assertEqual((await self.call(self.get_scope(method='GET')))[0]['status'], 405)
+        self.assertEqual((await self.call(self.get_scope(), b'not json'))[0]['status'], 400)
+
+    async def test_oversized_requests(self):
+        self.source.max_body_size = 10
+        scope = self.get_scope()
+
+        self.assertEqual((await self.call(scope, b'x' * 11))[0]['status'], 413)
+        scope['headers'].append((b'content-length', b'11'))
+        self.assertEqual((await self.call(scope))[0]['status'], 413)
+
+    def test_secret_is_required(self):
+        with self.assertRaises(ValueError):
+            WebhookSource('https://example.com/tgbot/webhook', '')
+
+    async def test_other_paths_go_to_django(self):
+        scope = self.get_scope(method='GET', path='/')
+
+        await self.call(scope)
+
+        self.django_application.assert_awaited_once()
+        self.assertIs(self.django_application.await_args[0][0], scope)
+
+    async def test_lifespan_sets_webhook(self):
+        self.application = AsyncMock()
+        receive = AsyncMock(side_effect=[{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+        send = AsyncMock()
+
+        await self.source.wrap_asgi(self.application, self.django_application)({'type': 'lifespan'}, receive, send)
+
+        self.application.bot.set_webhook.assert_awaited_once_with('https://example.com/tgbot/webhook',
+                                                                  allowed_updates=ALLOWED_UPDATES,
+                                                                  secret_token='secret')
+        self.application.start.assert_awaited_once()
+        self.application.stop.assert_awaited_once()
+        self.assertEqual([call.args[0]['type'] for call in send.await_args_list],
+                         ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
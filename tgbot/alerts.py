@@ -0,0 +1,72 @@
+import asyncio
+import logging
+from collections import defaultdict
+
+
+SEND_BATCH_SIZE = 25
+SEND_BATCH_INTERVAL = 1.0
+
+logger = logging.getLogger('tgbot')
+
+
+def group_by(items, field: str) -> dict:
+    groups = defaultdict(list)
+    for item in items:
+        groups[getattr(item, field)].append(item)
+    return groups
+
+
+def render_low_supply_messages(printers, supplies_by_printer: dict) -> list:
+    messages = list()
+    for printer in printers:
+        message_text = (f'📢 <b>УВЕДОМЛЕНИЕ</b>\n\n'
+                        f'Принтер: {printer.model}\n'
+                        f'Местоположение: {printer.get_subnet_name()}, {printer.location}')
+        for supply in supplies_by_printer.get(printer.id, []):
+            message_text += f'\nОстаток {supply.supply} - {supply.remaining_supply_percentage}%'
+        messages.append(message_text)
+    return messages
+
+
+def load_low_supply_messages(supply_type: str, threshold: int) -> list:
+    from monitoring.models import Printer, PrinterSupplyStatus
+
+    low_supply_printers = PrinterSupplyStatus.objects.select_related('supply').filter(
+        supply__type=supply_type, remaining_supply_percentage__lt=threshold)
+    supplies_by_printer = group_by(low_supply_printers, 'printer_id')
+
+    printers_with_low_supplies = Printer.objects.select_related(
+        'ip_address__subnet', 'model__stamp', 'location__cabinet', 'location__department'
+    ).filter(id__in=list(supplies_by_printer))
+
+    return render_low_supply_messages(printers_with_low_supplies, supplies_by_printer)
+
+
+def load_low_stock_message() -> str:
+    from monitoring.models import SupplyDetails
+
+    message_sup = ("📢 <b>УВЕДОМЛЕНИЕ</b>\n\n"
+                   "<i>Низкие остатки расходных материалов</i>\n")
+    for supply in SupplyDetails.objects.select_related('supply').filter(qty__lt=20):
+        message_sup += f"{supply.supply} - {supply.qty}шт.\n"
+    return message_sup
+
+
+async def send_to_chats(bot, chat_ids, messages, batch_size: int = SEND_BATCH_SIZE,
+                        interval: float = SEND_BATCH_INTERVAL) -> int:
+    chat_ids = list(chat_ids)
+    batches = [(message_text, chat_ids[start:start + batch_size]) for message_text in messages
+               for start in range(0, len(chat_ids), batch_size)]
+
+    qty_sent = 0
+    for number, (message_text, batch) in enumerate(batches):
+        if number:
+            await asyncio.sleep(interval)
+        results = await asyncio.gather(*(bot.send_message(chat_id=chat_id, text=message_text, parse_mode='HTML')
+                                         for chat_id in batch), return_exceptions=True)
+        for chat_id, result in zip(batch, results):
+            if isinstance(result, Exception):
+                logger.warning("Notification has not been sent to chat_id=%s: %s", chat_id, result)
+            else:
+                qty_sent += 1
+    return qty_sent
@@ -5,3 +5,6 @@ class TgbotConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tgbot'
     verbose_name = 'Телеграмм-бот'
+
+    def ready(self):
+        import tgbot.signals
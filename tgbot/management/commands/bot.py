@@ -1,4 +1,5 @@
 import asyncio
+import json
 from django.core.management.base import BaseCommand
 from django.core.exceptions import ObjectDoesNotExist
 import logging
@@ -17,12 +18,16 @@ from asgiref.sync import sync_to_async
 from prettytable import PrettyTable
 from monitoring.models import Printer, Statistics, ChangeSupply, PrinterError, SupplyDetails, PrinterSupplyStatus
 from django.contrib.admin.models import LogEntry
-from monitoring.views import get_area_name, create_events
-from datetime import timedelta
+from monitoring.views import get_area_name, create_events, get_printer_admin_log
+from django.utils import timezone
 from django.db.models import Q
 from functools import wraps
 from decouple import config
 from tgbot.models import TelegramUser
+from tgbot.read_model import read_model
+from tgbot.pubsub import ALLOWED_USERS_CHANNEL, PostgresListener
+from tgbot.update_sources import PollingSource, LocalReplaySource, OfflineRequest
+from tgbot.alerts import load_low_supply_messages, load_low_stock_message, send_to_chats
 import signal
 from easy_async_tg_notify import Notifier
 
@@ -42,26 +47,22 @@ logger = logging.getLogger('tgbot')
 
 PRINTERS, EVENTS, EVENTS_SUPPLIES, SUPPLIES, SINGLE_OBJECT, ALL_OBJECTS, HELP, EXIT, GO_BACK_START = range(9)
 
-ALLOWED_USERS = set(TelegramUser.objects.values_list('chat_id', flat=True))
-
 active_sessions = set()
 active_chats_notify = set()
+known_users = set()
 
 TABLE_SIZE = 20
-current_page = 0
+EVENTS_TABLE_SIZE = 7
 
 
-def check_user(update):
-    user_id = update.effective_user.id
-    if user_id not in ALLOWED_USERS:
-        return False
-    return True
+async def check_user(update) -> bool:
+    return update.effective_user.id in await read_model.get_rows('allowed_users')
 
 
 def user_check_access(func):
     @wraps(func)
     async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
-        if not check_user(update):
+        if not await check_user(update):
             user = update.message.from_user
 
             logger.warning("Unauthorized acces attempt - user: %s %s, chat_id: %s.",
@@ -104,19 +105,34 @@ def wrap_text(text, width):
     return '\n'.join(text[i:i + width] for i in range(0, len(text), width))
 
 
-async def handle_pagination(query: CallbackQuery, request: list, nm_page: str) -> dict:
-    global current_page
+async def alist(queryset) -> list:
+    return [obj async for obj in queryset]
+
+
+async def get_latest_printer_stats(printer_id):
+    try:
+        return await Statistics.objects.filter(printer_id=printer_id).alatest('time_collect')
+    except ObjectDoesNotExist:
+        return None
+
+
+def handle_pagination(query: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, rows: list, nm_page: str,
+                      table_size: int = TABLE_SIZE) -> dict:
+    pages = context.user_data.setdefault('pages', dict())
+    total_pages = (len(rows) + table_size - 1) // table_size
+
+    current_page = pages.get(nm_page, 0)
     if query.data == f'prev_page_{nm_page}':
         current_page = max(0, current_page - 1)
     elif query.data == f'next_page_{nm_page}':
         current_page += 1
     else:
         current_page = 0
+    current_page = min(current_page, max(0, total_pages - 1))
+    pages[nm_page] = current_page
 
-    total_pages = (len(request) + TABLE_SIZE - 1) // TABLE_SIZE
-    start_index = current_page * TABLE_SIZE
-    end_index = start_index + TABLE_SIZE
-    qty_lines = request[start_index:end_index]
+    start_index = current_page * table_size
+    qty_lines = rows[start_index:start_index + table_size]
 
     keyboard = list()
     if total_pages > 1:
@@ -147,7 +163,6 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user = update.message.from_user
 
     chat_id = update.message.chat_id
-    logger.info(ALLOWED_USERS)
     active_sessions.add(chat_id)
 
     logger.info("User %s %s started chatting", user.first_name, user.last_name)
@@ -222,13 +237,11 @@ async def all_printers(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
 
     user = update.callback_query.from_user
 
-    logger.info("User %s %s requested information about all printers on page %s.",
-                user.first_name, user.last_name, current_page + 1)
+    printers_all = await read_model.get_rows('printers')
+    info = handle_pagination(query, context, printers_all, 'all_printers')
 
-    printers_all = await sync_to_async(list)(
-        Printer.objects.select_related('ip_address__subnet', 'model__stamp', 'location__cabinet', 'location__department').all()
-    )
-    info = await handle_pagination(query, printers_all, 'all_printers')
+    logger.info("User %s %s requested information about all printers on page %s.",
+                user.first_name, user.last_name, info['current_page'] + 1)
     info['keyboard'].append([InlineKeyboardButton("🏠 Вернуться к началу", callback_data=str(GO_BACK_START))])
     info['keyboard'].append(
         [
@@ -241,14 +254,7 @@ async def all_printers(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     table = PrettyTable()
     table.field_names = ['Принтер', 'Статус', 'Ip-адрес', 'Расположение']
     for printer in info['qty_lines']:
-        table.add_row(
-            [
-                f'{printer.model}',
-                '🟢' if printer.is_active else '🔴',
-                printer.ip_address.address,
-                f'{printer.get_subnet_name()}, {printer.location}',
-            ]
-        )
+        table.add_row([printer['model'], printer['status'], printer['ip_address'], printer['location']])
 
     message = (
             f"✅ <b>Вы выбрали все принтеры | [{len(printers_all)}]</b>\n\n" +
@@ -271,25 +277,16 @@ async def single_printer(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     query = update.callback_query
     await query.answer()
 
-    printers_all = await sync_to_async(list)(
-        Printer.objects.select_related('ip_address__subnet', 'model__stamp', 'location__cabinet',
-                                       'location__department').all()
-    )
+    printers_all = await read_model.get_rows('printers')
 
-    info = await handle_pagination(query, printers_all, 'single_printer_events')
+    info = handle_pagination(query, context, printers_all, 'single_printer')
 
     reply_markup = InlineKeyboardMarkup(info['keyboard'])
 
     table = PrettyTable()
     table.field_names = ['ID', 'Принтер', 'Расположение']
     for printer in info['qty_lines']:
-        table.add_row(
-            [
-                printer.id,
-                f'{printer.model}',
-                f'{printer.get_subnet_name()}, {printer.location}',
-            ]
-        )
+        table.add_row([printer['id'], printer['model'], printer['location']])
 
     message = (
             f"✅ <b>ПРИНТЕР</b>\n\n" +
@@ -311,11 +308,9 @@ async def single_printer(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 async def handle_text_input_printer(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_input = update.message.text
 
-    printer_ids = await sync_to_async(list)(Printer.objects.values_list('id', flat=True))
-
     if user_input.isdigit():
         printer_id = int(user_input)
-        if printer_id in printer_ids:
+        if await Printer.objects.filter(id=printer_id).aexists():
             await result_single_printer(update, context, printer_id)
         else:
             await update.message.reply_text(
@@ -342,15 +337,13 @@ async def result_single_printer(update: Update, context: ContextTypes.DEFAULT_TY
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
 
-    printer = await sync_to_async(Printer.objects.select_related(
-        'ip_address__subnet', 'model__stamp', 'location__cabinet', 'location__department', 'inventory_number'
-    ).get)(id=printer_id)
-    try:
-        printer_stats = await sync_to_async(
-            lambda: Statistics.objects.filter(printer_id=printer_id).latest('time_collect')
-        )()
-    except ObjectDoesNotExist:
-        printer_stats = None
+    printer, printer_stats, printer_supplies = await asyncio.gather(
+        Printer.objects.select_related(
+            'ip_address__subnet', 'model__stamp', 'location__cabinet', 'location__department', 'inventory_number'
+        ).aget(id=printer_id),
+        get_latest_printer_stats(printer_id),
+        alist(PrinterSupplyStatus.objects.select_related('supply').filter(printer_id=printer_id)),
+    )
 
     table = PrettyTable()
     table.field_names = ['Название', 'Значение']
@@ -370,11 +363,6 @@ async def result_single_printer(update: Update, context: ContextTypes.DEFAULT_TY
                 table.add_row(['Кабинет', printer.location.cabinet])
                 table.add_row(['Отдел', printer.location.department])
 
-
-    printer_supplies = await sync_to_async(list)(
-        PrinterSupplyStatus.objects.select_related('supply').filter(printer_id=printer_id)
-    )
-
     for supply in printer_supplies:
         table.add_row([supply.supply, f'{supply.remaining_supply_percentage}%'])
 
@@ -421,25 +409,22 @@ async def all_events(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     user = update.callback_query.from_user
 
-    logger.info("User %s %s requested information about all the events on page %s.",
-                user.first_name, user.last_name, current_page + 1)
-
     await query.answer()
 
-    recent_changes_supplies = await sync_to_async(lambda: list(
-        ChangeSupply.objects.select_related('printer__ip_address', 'supply', 'printer__model__stamp').order_by('-time_change')[:35]))()
-    recent_errors = await sync_to_async(
-        lambda: list(PrinterError.objects.select_related('printer__ip_address', 'printer__model__stamp').order_by('-event_date')[:35]))()
-    recent_admin_log = await sync_to_async(lambda: LogEntry.objects.order_by('-action_time')[:35])()
-    recent_events = await sync_to_async(create_events)(recent_changes_supplies, recent_errors, recent_admin_log)
+    recent_changes_supplies, recent_errors, recent_admin_log = await asyncio.gather(
+        alist(ChangeSupply.objects.select_related('printer__ip_address', 'supply', 'printer__model__stamp')
+              .order_by('-time_change')[:35]),
+        alist(PrinterError.objects.select_related('printer__ip_address', 'printer__model__stamp')
+              .order_by('-event_date')[:35]),
+        alist(LogEntry.objects.select_related('user').order_by('-action_time')[:35]),
+    )
+    recent_events = create_events(recent_changes_supplies, recent_errors, recent_admin_log)
     new_recent_events = recent_events[:35]
 
-    global TABLE_SIZE
-    TABLE_SIZE = 7
-
-    info = await handle_pagination(query, new_recent_events, 'all_events')
+    info = handle_pagination(query, context, new_recent_events, 'all_events', EVENTS_TABLE_SIZE)
 
-    TABLE_SIZE = 20
+    logger.info("User %s %s requested information about all the events on page %s.",
+                user.first_name, user.last_name, info['current_page'] + 1)
 
     info['keyboard'].append([InlineKeyboardButton("🏠 Вернуться к началу", callback_data=str(GO_BACK_START))])
     info['keyboard'].append(
@@ -477,25 +462,16 @@ async def single_printer_events(update: Update, context: ContextTypes.DEFAULT_TY
     query = update.callback_query
     await query.answer()
 
-    printers_all = await sync_to_async(list)(
-        Printer.objects.select_related(
-            'ip_address__subnet', 'model__stamp', 'location__cabinet', 'location__department').all()
-    )
+    printers_all = await read_model.get_rows('printers')
 
-    info = await handle_pagination(query, printers_all, 'single_printer_events')
+    info = handle_pagination(query, context, printers_all, 'single_printer_events')
 
     reply_markup = InlineKeyboardMarkup(info['keyboard'])
 
     table = PrettyTable()
     table.field_names = ['ID', 'Принтер', 'Расположение']
     for printer in info['qty_lines']:
-        table.add_row(
-            [
-                printer.id,
-                f'{printer.model}',
-                f'{printer.get_subnet_name()}, {printer.location}',
-            ]
-        )
+        table.add_row([printer['id'], printer['model'], printer['location']])
 
     message = (
             f"✅ <b>СОБЫТИЯ ПРИНТЕРА</b>\n\n" +
@@ -517,11 +493,9 @@ async def single_printer_events(update: Update, context: ContextTypes.DEFAULT_TY
 async def handle_text_input_printer_events(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_input = update.message.text
 
-    printer_ids = await sync_to_async(list)(Printer.objects.values_list('id', flat=True))
-
     if user_input.isdigit():
         printer_id = int(user_input)
-        if printer_id in printer_ids:
+        if await Printer.objects.filter(id=printer_id).aexists():
             await result_single_printer_events(update, context, printer_id)
         else:
             await update.message.reply_text(
@@ -547,20 +521,16 @@ async def result_single_printer_events(update: Update, context: ContextTypes.DEF
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
 
-    printer = await sync_to_async(Printer.objects.select_related('ip_address').get)(id=printer_id)
-
-    recent_changes_supplies = await sync_to_async(lambda: list(
-        ChangeSupply.objects.select_related('printer__ip_address', 'printer__model__stamp', 'supply')
-        .filter(printer_id=printer_id).order_by('-time_change')[:10]))()
-
-    recent_errors = await sync_to_async(lambda: list(
-        PrinterError.objects.select_related('printer__ip_address__subnet', 'printer__model__stamp')
-        .filter(printer_id=printer_id).order_by('-event_date')[:10]))()
-
-    recent_admin_log = await sync_to_async(lambda: list(
-        LogEntry.objects.filter(object_repr=printer).order_by('-action_time')[:10]))()
+    printer, recent_changes_supplies, recent_errors, recent_admin_log = await asyncio.gather(
+        Printer.objects.select_related('ip_address', 'model__stamp').aget(id=printer_id),
+        alist(ChangeSupply.objects.select_related('printer__ip_address', 'printer__model__stamp', 'supply')
+              .filter(printer_id=printer_id).order_by('-time_change')[:10]),
+        alist(PrinterError.objects.select_related('printer__ip_address__subnet', 'printer__model__stamp')
+              .filter(printer_id=printer_id).order_by('-event_date')[:10]),
+        alist(get_printer_admin_log(printer_id).select_related('user').order_by('-action_time')[:10]),
+    )
 
-    recent_events = await sync_to_async(create_events)(recent_changes_supplies, recent_errors, recent_admin_log)
+    recent_events = create_events(recent_changes_supplies, recent_errors, recent_admin_log)
     new_recent_events = recent_events[:10]
 
     table = PrettyTable()
@@ -599,13 +569,12 @@ async def events_supplies(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
 
-    recent_changes_supplies = await sync_to_async(lambda: list(ChangeSupply.objects.select_related(
-        'printer__ip_address', 'printer__model__stamp', 'supply').order_by('-time_change')[:20]))()
+    recent_changes_supplies = await alist(ChangeSupply.objects.select_related(
+        'printer__ip_address', 'printer__model__stamp', 'supply').order_by('-time_change')[:20])
     table = PrettyTable()
     table.field_names = ['Принтер', 'РМ', 'Время замены',]
     for event in recent_changes_supplies:
-        event.time_change += timedelta(hours=7)
-        formatted_time = event.time_change.strftime('%Y/%m/%d %H:%M')
+        formatted_time = timezone.localtime(event.time_change).strftime('%Y/%m/%d %H:%M')
         table.add_row(
             [event.printer,
              wrap_text(f'{event.supply}', 10),
@@ -653,12 +622,9 @@ async def all_supplies(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
                 user.first_name, user.last_name)
     await query.answer()
 
-    supplies_query = await sync_to_async(list)(SupplyDetails.objects.select_related('supply').all().order_by('id'))
-    printers_supplies = await sync_to_async(list)(
-        PrinterSupplyStatus.objects.select_related('printer__ip_address__subnet', 'printer__model__stamp', 'supply').all()
-    )
+    supplies_query = await read_model.get_rows('supplies')
 
-    info = await handle_pagination(query, supplies_query, 'all_supplies')
+    info = handle_pagination(query, context, supplies_query, 'all_supplies')
 
     info['keyboard'].append([InlineKeyboardButton("🏠 Вернуться к началу", callback_data=str(GO_BACK_START))])
     info['keyboard'].append(
@@ -672,19 +638,8 @@ async def all_supplies(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     table = PrettyTable()
     table.field_names = ['Название', 'Тип', 'Кол-во', 'Стоимость', 'Принтер']
     for supply in info['qty_lines']:
-        sup_for_printer = None
-        for printer_supply in printers_supplies:
-            if supply.supply.name == printer_supply.supply.name:
-                sup_for_printer = f'{printer_supply.printer.model}'
-        table.add_row(
-            [
-                supply.supply.name,
-                supply.supply.type,
-                supply.qty,
-                supply.supply.price,
-                sup_for_printer if sup_for_printer else 'Отсутствует',
-            ]
-        )
+        table.add_row([supply['name'], supply['type'], supply['qty'], supply['price'],
+                       supply['printer'] if supply['printer'] else 'Отсутствует'])
 
     message = (
             f"✅ <b>Вы выбрали все расходные материалы | [{len(supplies_query)}]</b>\n\n" +
@@ -707,21 +662,16 @@ async def single_supplies(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     query = update.callback_query
     await query.answer()
 
-    supplies_query = await sync_to_async(list)(SupplyDetails.objects.select_related('supply').all().order_by('id'))
+    supplies_query = await read_model.get_rows('supplies')
 
-    info = await handle_pagination(query, supplies_query, 'single_supplies')
+    info = handle_pagination(query, context, supplies_query, 'single_supplies')
 
     reply_markup = InlineKeyboardMarkup(info['keyboard'])
 
     table = PrettyTable()
     table.field_names = ['ID', 'РМ']
     for supply in info['qty_lines']:
-        table.add_row(
-            [
-                supply.supply_id,
-                supply.supply,
-            ]
-        )
+        table.add_row([supply['supply_id'], supply['supply']])
 
     message = (
             f"✅ <b>РАСХОДНЫЙ МАТЕРИАЛ</b>\n\n" +
@@ -742,11 +692,10 @@ async def single_supplies(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 async def handle_text_input_supplies(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_input = update.message.text
-    supply_ids = await sync_to_async(list)(SupplyDetails.objects.values_list('id', flat=True))
 
     if user_input.isdigit():
         supply_id = int(user_input)
-        if supply_id in supply_ids:
+        if await SupplyDetails.objects.filter(id=supply_id).aexists():
             await result_single_supplies(update, context, supply_id)
         else:
             await update.message.reply_text(
@@ -772,7 +721,7 @@ async def result_single_supplies(update: Update, context: ContextTypes.DEFAULT_T
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
 
-    supply = await sync_to_async(SupplyDetails.objects.select_related('supply').get)(id=supply_id)
+    supply = await SupplyDetails.objects.select_related('supply').aget(id=supply_id)
 
     table = PrettyTable()
     table.field_names = ['Название', 'Значение']
@@ -785,15 +734,8 @@ async def result_single_supplies(update: Update, context: ContextTypes.DEFAULT_T
 
     table.add_row(['Кол-во', supply.qty])
 
-    printers_supplies = await sync_to_async(list)(
-        PrinterSupplyStatus.objects.select_related(
-            'printer__ip_address__subnet', 'printer__model__stamp', 'supply').all()
-    )
-
-    sup_for_printer = None
-    for printer_supply in printers_supplies:
-        if supply.supply.name == printer_supply.supply.name:
-            sup_for_printer = f'{printer_supply.printer.model}'
+    supply_rows = await read_model.get_rows('supplies')
+    sup_for_printer = next((row['printer'] for row in supply_rows if row['id'] == supply_id), None)
     table.add_row(
         [
             'Принтер',
@@ -884,12 +826,12 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     logger.info("User %s %s with chat_id=%s received his status",
                 user.first_name, user.last_name, update.effective_chat.id)
 
-    if not check_user(update):
+    if not await check_user(update):
         str_access = ("Доступ: Запрещен 🚫\n"
                       "ℹ️ Для получения доступа обратитесь к администратору.")
     else:
         str_access = "Доступ: Разрешен ✅\n"
-        user_db = await sync_to_async(TelegramUser.objects.get)(chat_id=update.effective_chat.id)
+        user_db = await TelegramUser.objects.aget(chat_id=update.effective_chat.id)
         if user_db.admin:
             str_access += "Права доступа: Администратор 🛡️\n"
         else:
@@ -947,85 +889,36 @@ async def end_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await update.message.reply_text("Приложение уже выключено.")
 
 
-async def check_supplies_every_3days(context: ContextTypes.DEFAULT_TYPE):
-    low_supply_printers = await sync_to_async(list)(
-        PrinterSupplyStatus.objects.select_related(
-            'printer__ip_address__subnet', 'printer__model__stamp', 'supply'
-        ).filter(
-            supply__type='cartridge', remaining_supply_percentage__lt=10
-        )
-    )
+async def get_low_cartridge_messages() -> list:
+    return await sync_to_async(load_low_supply_messages)('cartridge', 10)
 
-    printer_ids = [status.printer.id for status in low_supply_printers]
 
-    printers_with_low_supplies = await sync_to_async(list)(
-        Printer.objects.select_related(
-            'ip_address__subnet', 'model__stamp', 'location__cabinet', 'location__department'
-        ).filter(id__in=printer_ids)
-    )
+async def get_low_drum_unit_messages() -> list:
+    return await sync_to_async(load_low_supply_messages)('drum_unit', 20)
 
-    for printer in printers_with_low_supplies:
-        message_text = (f'📢 <b>УВЕДОМЛЕНИЕ</b>\n\n'
-                        f'Принтер: {printer.model}\n'
-                        f'Местоположение: {printer.get_subnet_name()}, {printer.location}')
-        for supply in low_supply_printers:
-            if supply.printer == printer:
-                message_text += f'\nОстаток {supply.supply} - {supply.remaining_supply_percentage}%'
-
-        await context.bot.send_message(
-            chat_id=context.job.chat_id,
-            text=message_text,
-            parse_mode='HTML',
-        )
 
+async def get_low_stock_messages() -> list:
+    return [await sync_to_async(load_low_stock_message)()]
 
-async def check_supplies_every_7_days(context: ContextTypes.DEFAULT_TYPE):
-    low_supply_printers = await sync_to_async(list)(
-        PrinterSupplyStatus.objects.select_related(
-            'printer__ip_address__subnet', 'printer__model__stamp', 'supply'
-        ).filter(
-            supply__type='drum_unit', remaining_supply_percentage__lt=20
-        )
-    )
 
-    printer_ids = [status.printer.id for status in low_supply_printers]
+async def check_supplies_every_3days(context: ContextTypes.DEFAULT_TYPE):
+    if active_chats_notify:
+        await send_to_chats(context.bot, active_chats_notify.copy(), await get_low_cartridge_messages())
 
-    printers_with_low_supplies = await sync_to_async(list)(
-        Printer.objects.select_related(
-            'ip_address__subnet', 'model__stamp', 'location__cabinet', 'location__department'
-        ).filter(id__in=printer_ids)
-    )
 
-    for printer in printers_with_low_supplies:
-        message_text = (f'📢 <b>УВЕДОМЛЕНИЕ</b>\n\n'
-                        f'Принтер: {printer.model}\n'
-                        f'Местоположение: {printer.get_subnet_name()}, {printer.location}')
-        for supply in low_supply_printers:
-            if supply.printer == printer:
-                message_text += f'\nОстаток {supply.supply} - {supply.remaining_supply_percentage}%'
-
-        await context.bot.send_message(
-            chat_id=context.job.chat_id,
-            text=message_text,
-            parse_mode='HTML',
-        )
+async def check_supplies_every_7_days(context: ContextTypes.DEFAULT_TYPE):
+    if active_chats_notify:
+        await send_to_chats(context.bot, active_chats_notify.copy(), await get_low_drum_unit_messages())
 
 
 async def check_supplies_every_2_weeks(context: ContextTypes.DEFAULT_TYPE):
-    low_supplies_qty = await sync_to_async(list)(
-        SupplyDetails.objects.select_related('supply').filter(qty__lt=20)
-    )
+    if active_chats_notify:
+        await send_to_chats(context.bot, active_chats_notify.copy(), await get_low_stock_messages())
 
-    message_sup = ("📢 <b>УВЕДОМЛЕНИЕ</b>\n\n"
-                   "<i>Низкие остатки расходных материалов</i>\n")
-    for supply in low_supplies_qty:
-        message_sup += f"{supply.supply} - {supply.qty}шт.\n"
 
-    await context.bot.send_message(
-        chat_id=context.job.chat_id,
-        text=message_sup,
-        parse_mode='HTML',
-    )
+async def send_current_notifications(context: ContextTypes.DEFAULT_TYPE):
+    for get_messages in (get_low_cartridge_messages, get_low_drum_unit_messages, get_low_stock_messages):
+        await send_to_chats(context.bot, [context.job.chat_id], await get_messages())
 
 
 @user_check_access
@@ -1041,9 +934,7 @@ async def start_notifications(update: Update, context: ContextTypes.DEFAULT_TYPE
         return None
 
     active_chats_notify.add(chat_id)
-    user_db = await sync_to_async(TelegramUser.objects.get)(chat_id=chat_id)
-    user_db.active_notify = True
-    await sync_to_async(user_db.save)()
+    await TelegramUser.objects.filter(chat_id=chat_id).aupdate(active_notify=True)
 
     name = update.effective_chat.full_name
     await context.bot.send_message(
@@ -1051,9 +942,7 @@ async def start_notifications(update: Update, context: ContextTypes.DEFAULT_TYPE
         text='🥳 Поздравляю! Теперь вы получаете уведомления о важных событиях 🔔'
     )
 
-    context.job_queue.run_repeating(check_supplies_every_3days, interval=259200, first=5, data=name, chat_id=chat_id)
-    context.job_queue.run_repeating(check_supplies_every_7_days, interval=604800, first=35, data=name, chat_id=chat_id)
-    context.job_queue.run_repeating(check_supplies_every_2_weeks, interval=1209600, first=65, data=name, chat_id=chat_id)
+    context.job_queue.run_once(send_current_notifications, 5, data=name, chat_id=chat_id)
 
 
 @user_check_access
@@ -1064,31 +953,25 @@ async def stop_notifications(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 user.first_name, user.last_name)
 
     chat_id = update.message.chat_id
-    job_removed = remove_job_if_exists(context, chat_id)
+    job_removed = remove_chat_notifications(chat_id)
     if job_removed:
-        user_db = await sync_to_async(TelegramUser.objects.get)(chat_id=chat_id)
-        user_db.active_notify = False
-        await sync_to_async(user_db.save)()
+        await TelegramUser.objects.filter(chat_id=chat_id).aupdate(active_notify=False)
     text = '🔕 Уведомления отключены!' if job_removed else '🚫 Уведомления уже отключены.'
     await context.bot.send_message(chat_id=chat_id, text=text)
 
 
-def remove_job_if_exists(context: ContextTypes.DEFAULT_TYPE, chat_id: int) -> bool:
-    current_jobs = context.job_queue.jobs()
+def remove_chat_notifications(chat_id: int) -> bool:
     if chat_id in active_chats_notify:
-        for job in current_jobs:
-            if job.chat_id == chat_id:
-                job.schedule_removal()
         active_chats_notify.remove(chat_id)
-        return bool(current_jobs)
-    return bool(None)
+        return True
+    return False
 
 
 @user_check_access
 async def update_allowed_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.message.from_user
     chat_id = update.message.chat_id
-    user_db = await sync_to_async(TelegramUser.objects.get)(chat_id=chat_id)
+    user_db = await TelegramUser.objects.aget(chat_id=chat_id)
     if user_db.admin:
         logger.info("User %s %s updated the ALLOWED_USERS list",
                     user.first_name, user.last_name)
@@ -1102,21 +985,39 @@ async def update_allowed_users(update: Update, context: ContextTypes.DEFAULT_TYP
 
 
 async def callback_update_user(context: ContextTypes.DEFAULT_TYPE):
-    global ALLOWED_USERS
-    current_allowed_users = ALLOWED_USERS.copy()
-
-    list_users = await sync_to_async(lambda: list(TelegramUser.objects.values_list('chat_id', flat=True)))()
-    ALLOWED_USERS = set(list_users)
-    new_users = ALLOWED_USERS - current_allowed_users
+    read_model.invalidate('allowed_users')
+    new_users = await greet_new_users(context.bot)
 
     if new_users:
-        for user in ALLOWED_USERS:
-            await context.bot.send_message(chat_id=user, text='Доступ к боту открыт ✅')
         await context.bot.send_message(chat_id=context.job.chat_id, text='Список пользователей обновлен 🔄')
     else:
         await context.bot.send_message(chat_id=context.job.chat_id, text='Новых пользователей не найдено!')
 
 
+async def greet_new_users(bot: Bot) -> set:
+    allowed_users = await read_model.get_rows('allowed_users')
+    new_users = allowed_users - known_users
+    known_users.clear()
+    known_users.update(allowed_users)
+
+    if new_users:
+        logger.info("New users have been allowed: %s", new_users)
+        await send_to_chats(bot, new_users, ['Доступ к боту открыт ✅'])
+    return new_users
+
+
+async def watch_allowed_users(context: ContextTypes.DEFAULT_TYPE) -> None:
+    known_users.update(await read_model.get_rows('allowed_users'))
+
+    def on_notify(channel, payload):
+        read_model.invalidate('allowed_users')
+        context.application.create_task(greet_new_users(context.bot))
+
+    allowed_users_listener = PostgresListener([ALLOWED_USERS_CHANNEL], on_notify)
+    if await sync_to_async(allowed_users_listener.connect)():
+        allowed_users_listener.start(asyncio.get_running_loop())
+
+
 async def send_msg(msg_text: str, users_ids):
     async with Notifier(token) as notifier:
         await notifier.send_text(msg_text, users_ids)
@@ -1143,121 +1044,125 @@ async def signal_handler(sig, frame):
     asyncio.get_event_loop().stop()
 
 
-async def init_first_users(context: ContextTypes.DEFAULT_TYPE) -> None:
-    global ALLOWED_USERS
-    logging.info(f'context test {context}')
-    current_jobs = context.job_queue.jobs()
-    logging.info(f'jobs test {current_jobs}, {type(current_jobs)}')
-    logging.info(ALLOWED_USERS)
-    if not ALLOWED_USERS:
-        users_chat_id = await sync_to_async(lambda: list(TelegramUser.objects.values_list('chat_id', flat=True)))()
-        logging.info(users_chat_id)
-        if users_chat_id:
-            ALLOWED_USERS = set(users_chat_id)
-            for job in current_jobs:
-                job.schedule_removal()
-                logging.info(f'Init first users ({users_chat_id}) success, Job ({job}) Delete')
-                for chat_id in users_chat_id:
-                    await context.bot.send_message(chat_id=chat_id, text='Доступ к боту открыт ✅')
-    else:
-        for job in current_jobs:
-            job.schedule_removal()
-            logging.info(f'Delete init_first_admin_users {job}')
+def build_application(request=None) -> Application:
+    builder = Application.builder().token(token)
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    application = builder.build()
+
+    conv_handler = ConversationHandler(
+        entry_points=[CommandHandler("start", start)],
+        states={
+            START_ROUTES: [
+                CallbackQueryHandler(printers, pattern="^" + str(PRINTERS) + "$"),
+                CallbackQueryHandler(events, pattern="^" + str(EVENTS) + "$"),
+                CallbackQueryHandler(supplies, pattern="^" + str(SUPPLIES) + "$"),
+                CallbackQueryHandler(help_command, pattern="^" + str(HELP) + "$"),
+                CallbackQueryHandler(end, pattern="^" + str(EXIT) + "$"),
+            ],
+            PRINTERS_ROUTES: [
+                CallbackQueryHandler(printers, pattern="^" + str(PRINTERS) + "$"),
+                CallbackQueryHandler(all_printers, pattern="^" + str(ALL_OBJECTS) + "$"),
+                CallbackQueryHandler(single_printer, pattern="^" + str(SINGLE_OBJECT) + "$"),
+                CallbackQueryHandler(start_over, pattern="^" + str(GO_BACK_START) + "$"),
+                CallbackQueryHandler(help_command, pattern="^" + str(HELP) + "$"),
+                CallbackQueryHandler(end, pattern="^" + str(EXIT) + "$"),
+            ],
+            INPUT_PRINTER_ROUTES: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_input_printer),
+                CallbackQueryHandler(printers, pattern="^" + str(PRINTERS) + "$"),
+                CallbackQueryHandler(start_over, pattern="^" + str(GO_BACK_START) + "$"),
+                CallbackQueryHandler(end, pattern="^" + str(EXIT) + "$"),
+                CallbackQueryHandler(single_printer, pattern='prev_page_single_printer'),
+                CallbackQueryHandler(single_printer, pattern='next_page_single_printer'),
+            ],
+            EVENTS_ROUTES: [
+                CallbackQueryHandler(printers, pattern="^" + str(EVENTS) + "$"),
+                CallbackQueryHandler(all_events, pattern="^" + str(ALL_OBJECTS) + "$"),
+                CallbackQueryHandler(single_printer_events, pattern="^" + str(SINGLE_OBJECT) + "$"),
+                CallbackQueryHandler(events_supplies, pattern="^" + str(EVENTS_SUPPLIES) + "$"),
+                CallbackQueryHandler(start_over, pattern="^" + str(GO_BACK_START) + "$"),
+                CallbackQueryHandler(help_command, pattern="^" + str(HELP) + "$"),
+                CallbackQueryHandler(end, pattern="^" + str(EXIT) + "$"),
+            ],
+            INPUT_EVENTS_ROUTES: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_input_printer_events),
+                CallbackQueryHandler(events, pattern="^" + str(EVENTS) + "$"),
+                CallbackQueryHandler(start_over, pattern="^" + str(GO_BACK_START) + "$"),
+                CallbackQueryHandler(end, pattern="^" + str(EXIT) + "$"),
+                CallbackQueryHandler(single_printer_events, pattern='prev_page_single_printer_events'),
+                CallbackQueryHandler(single_printer_events, pattern='next_page_single_printer_events'),
+            ],
+            SUPPLIES_ROUTES: [
+                CallbackQueryHandler(supplies, pattern="^" + str(SUPPLIES) + "$"),
+                CallbackQueryHandler(all_supplies, pattern="^" + str(ALL_OBJECTS) + "$"),
+                CallbackQueryHandler(single_supplies, pattern="^" + str(SINGLE_OBJECT) + "$"),
+                CallbackQueryHandler(start_over, pattern="^" + str(GO_BACK_START) + "$"),
+                CallbackQueryHandler(help_command, pattern="^" + str(HELP) + "$"),
+                CallbackQueryHandler(end, pattern="^" + str(EXIT) + "$"),
+            ],
+            INPUT_SUPPLIES_ROUTES: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_input_supplies),
+                CallbackQueryHandler(supplies, pattern="^" + str(SUPPLIES) + "$"),
+                CallbackQueryHandler(start_over, pattern="^" + str(GO_BACK_START) + "$"),
+                CallbackQueryHandler(end, pattern="^" + str(EXIT) + "$"),
+                CallbackQueryHandler(single_supplies, pattern='prev_page_single_supplies'),
+                CallbackQueryHandler(single_supplies, pattern='next_page_single_supplies'),
+
+            ],
+            END_ROUTES: [
+                CallbackQueryHandler(printers, pattern="^" + str(PRINTERS) + "$"),
+                CallbackQueryHandler(events, pattern="^" + str(EVENTS) + "$"),
+                CallbackQueryHandler(supplies, pattern="^" + str(SUPPLIES) + "$"),
+                CallbackQueryHandler(start_over, pattern="^" + str(GO_BACK_START) + "$"),
+                CallbackQueryHandler(end, pattern="^" + str(EXIT) + "$"),
+                CallbackQueryHandler(all_printers, pattern='prev_page_all_printers'),
+                CallbackQueryHandler(all_printers, pattern='next_page_all_printers'),
+                CallbackQueryHandler(all_supplies, pattern='prev_page_all_supplies'),
+                CallbackQueryHandler(all_supplies, pattern='next_page_all_supplies'),
+                CallbackQueryHandler(all_events, pattern='prev_page_all_events'),
+                CallbackQueryHandler(all_events, pattern='next_page_all_events')
+            ],
+        },
+        fallbacks=[CommandHandler("start", start)],
+    )
+
+    application.add_handler(conv_handler)
+    application.add_handler(CommandHandler('help', help_command_main))
+    application.add_handler(CommandHandler('exit', end_input))
+    application.add_handler(CommandHandler('start_notify', start_notifications))
+    application.add_handler(CommandHandler('stop_notify', stop_notifications))
+    application.add_handler(CommandHandler('status', status))
+    application.add_handler(CommandHandler('update_allowed_users', update_allowed_users))
+
+    job_queue = application.job_queue
+    job_queue.run_once(watch_allowed_users, 0)
+    job_queue.run_repeating(check_supplies_every_3days, interval=259200, first=5)
+    job_queue.run_repeating(check_supplies_every_7_days, interval=604800, first=35)
+    job_queue.run_repeating(check_supplies_every_2_weeks, interval=1209600, first=65)
+
+    return application
 
 
 class Command(BaseCommand):
-    def handle(self, *args, **options):
-        application = Application.builder().token(token).build()
-
-        conv_handler = ConversationHandler(
-            entry_points=[CommandHandler("start", start)],
-            states={
-                START_ROUTES: [
-                    CallbackQueryHandler(printers, pattern="^" + str(PRINTERS) + "$"),
-                    CallbackQueryHandler(events, pattern="^" + str(EVENTS) + "$"),
-                    CallbackQueryHandler(supplies, pattern="^" + str(SUPPLIES) + "$"),
-                    CallbackQueryHandler(help_command, pattern="^" + str(HELP) + "$"),
-                    CallbackQueryHandler(end, pattern="^" + str(EXIT) + "$"),
-                ],
-                PRINTERS_ROUTES: [
-                    CallbackQueryHandler(printers, pattern="^" + str(PRINTERS) + "$"),
-                    CallbackQueryHandler(all_printers, pattern="^" + str(ALL_OBJECTS) + "$"),
-                    CallbackQueryHandler(single_printer, pattern="^" + str(SINGLE_OBJECT) + "$"),
-                    CallbackQueryHandler(start_over, pattern="^" + str(GO_BACK_START) + "$"),
-                    CallbackQueryHandler(help_command, pattern="^" + str(HELP) + "$"),
-                    CallbackQueryHandler(end, pattern="^" + str(EXIT) + "$"),
-                ],
-                INPUT_PRINTER_ROUTES: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_input_printer),
-                    CallbackQueryHandler(printers, pattern="^" + str(PRINTERS) + "$"),
-                    CallbackQueryHandler(start_over, pattern="^" + str(GO_BACK_START) + "$"),
-                    CallbackQueryHandler(end, pattern="^" + str(EXIT) + "$"),
-                    CallbackQueryHandler(single_printer, pattern='prev_page_single_printer'),
-                    CallbackQueryHandler(single_printer, pattern='next_page_single_printer'),
-                ],
-                EVENTS_ROUTES: [
-                    CallbackQueryHandler(printers, pattern="^" + str(EVENTS) + "$"),
-                    CallbackQueryHandler(all_events, pattern="^" + str(ALL_OBJECTS) + "$"),
-                    CallbackQueryHandler(single_printer_events, pattern="^" + str(SINGLE_OBJECT) + "$"),
-                    CallbackQueryHandler(events_supplies, pattern="^" + str(EVENTS_SUPPLIES) + "$"),
-                    CallbackQueryHandler(start_over, pattern="^" + str(GO_BACK_START) + "$"),
-                    CallbackQueryHandler(help_command, pattern="^" + str(HELP) + "$"),
-                    CallbackQueryHandler(end, pattern="^" + str(EXIT) + "$"),
-                ],
-                INPUT_EVENTS_ROUTES: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_input_printer_events),
-                    CallbackQueryHandler(events, pattern="^" + str(EVENTS) + "$"),
-                    CallbackQueryHandler(start_over, pattern="^" + str(GO_BACK_START) + "$"),
-                    CallbackQueryHandler(end, pattern="^" + str(EXIT) + "$"),
-                    CallbackQueryHandler(single_printer_events, pattern='prev_page_single_printer_events'),
-                    CallbackQueryHandler(single_printer_events, pattern='next_page_single_printer_events'),
-                ],
-                SUPPLIES_ROUTES: [
-                    CallbackQueryHandler(supplies, pattern="^" + str(SUPPLIES) + "$"),
-                    CallbackQueryHandler(all_supplies, pattern="^" + str(ALL_OBJECTS) + "$"),
-                    CallbackQueryHandler(single_supplies, pattern="^" + str(SINGLE_OBJECT) + "$"),
-                    CallbackQueryHandler(start_over, pattern="^" + str(GO_BACK_START) + "$"),
-                    CallbackQueryHandler(help_command, pattern="^" + str(HELP) + "$"),
-                    CallbackQueryHandler(end, pattern="^" + str(EXIT) + "$"),
-                ],
-                INPUT_SUPPLIES_ROUTES: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_input_supplies),
-                    CallbackQueryHandler(supplies, pattern="^" + str(SUPPLIES) + "$"),
-                    CallbackQueryHandler(start_over, pattern="^" + str(GO_BACK_START) + "$"),
-                    CallbackQueryHandler(end, pattern="^" + str(EXIT) + "$"),
-                    CallbackQueryHandler(single_supplies, pattern='prev_page_single_supplies'),
-                    CallbackQueryHandler(single_supplies, pattern='next_page_single_supplies'),
-
-                ],
-                END_ROUTES: [
-                    CallbackQueryHandler(printers, pattern="^" + str(PRINTERS) + "$"),
-                    CallbackQueryHandler(events, pattern="^" + str(EVENTS) + "$"),
-                    CallbackQueryHandler(supplies, pattern="^" + str(SUPPLIES) + "$"),
-                    CallbackQueryHandler(start_over, pattern="^" + str(GO_BACK_START) + "$"),
-                    CallbackQueryHandler(end, pattern="^" + str(EXIT) + "$"),
-                    CallbackQueryHandler(all_printers, pattern='prev_page_all_printers'),
-                    CallbackQueryHandler(all_printers, pattern='next_page_all_printers'),
-                    CallbackQueryHandler(all_supplies, pattern='prev_page_all_supplies'),
-                    CallbackQueryHandler(all_supplies, pattern='next_page_all_supplies'),
-                    CallbackQueryHandler(all_events, pattern='prev_page_all_events'),
-                    CallbackQueryHandler(all_events, pattern='next_page_all_events')
-                ],
-            },
-            fallbacks=[CommandHandler("start", start)],
-        )
+    help = 'Runs the Telegram bot with long polling or replays recorded updates offline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--replay', help='Path of a JSONL file with Telegram updates to replay offline')
+        parser.add_argument('--concurrency', type=int, default=1, help='Number of users replayed at the same time')
 
-        application.add_handler(conv_handler)
-        application.add_handler(CommandHandler('help', help_command_main))
-        application.add_handler(CommandHandler('exit', end_input))
-        application.add_handler(CommandHandler('start_notify', start_notifications))
-        application.add_handler(CommandHandler('stop_notify', stop_notifications))
-        application.add_handler(CommandHandler('status', status))
-        application.add_handler(CommandHandler('update_allowed_users', update_allowed_users))
+    def handle(self, *args, **options):
+        if options['replay']:
+            request = OfflineRequest()
+            source = LocalReplaySource.from_file(options['replay'], options['concurrency'])
+            result = source.run(build_application(request))
+            result['requests'] = dict(request.calls)
+            self.stdout.write(json.dumps(result, ensure_ascii=False, indent=2))
+            return
 
-        job_queue = application.job_queue
-        job_queue.run_repeating(init_first_users, interval=10, first=0)
+        application = build_application()
 
         signal.signal(signal.SIGINT, lambda sig, frame: asyncio.create_task(signal_handler(sig, frame)))
         signal.signal(signal.SIGTERM, lambda sig, frame: asyncio.create_task(signal_handler(sig, frame)))
 
-        application.run_polling(allowed_updates=Update.ALL_TYPES)
+        PollingSource().run(application)
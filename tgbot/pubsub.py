@@ -0,0 +1,58 @@
+import logging
+from django.db import connection
+
+
+ALLOWED_USERS_CHANNEL = 'tgbot_allowed_users'
+
+logger = logging.getLogger('tgbot')
+
+
+def publish(channel: str, payload: str = '') -> None:
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_notify(%s, %s)', [channel, payload])
+
+
+class PostgresListener:
+    def __init__(self, channels: list, callback):
+        self.channels = channels
+        self.callback = callback
+        self.connection = None
+        self.loop = None
+
+    def connect(self) -> bool:
+        if connection.vendor != 'postgresql':
+            logger.warning("LISTEN is not supported by the %s database backend", connection.vendor)
+            return False
+
+        self.connection = connection.get_new_connection(connection.get_connection_params())
+        self.connection.autocommit = True
+        with self.connection.cursor() as cursor:
+            for channel in self.channels:
+                cursor.execute(f'LISTEN {connection.ops.quote_name(channel)}')
+        return True
+
+    def start(self, loop):
+        self.loop = loop
+        self.loop.add_reader(self.connection.fileno(), self.read_notifications)
+        logger.info("Listening to the channels %s", ', '.join(self.channels))
+
+    def stop(self):
+        if self.connection is None:
+            return
+        self.loop.remove_reader(self.connection.fileno())
+        self.connection.close()
+        self.connection = None
+
+    def read_notifications(self):
+        try:
+            self.connection.poll()
+        except Exception as e:
+            logger.error("The listening connection has been lost: %s", e)
+            self.stop()
+            return
+
+        while self.connection.notifies:
+            notify = self.connection.notifies.pop(0)
+            self.callback(notify.channel, notify.payload)
@@ -0,0 +1,97 @@
+import asyncio
+import time
+from asgiref.sync import sync_to_async
+from django.db.models import Value
+from django.db.models.functions import Concat
+
+
+READ_MODEL_TTL = 60
+
+
+def load_printer_rows() -> list:
+    from monitoring.models import Printer
+
+    printers = Printer.objects.select_related('ip_address__subnet', 'model__stamp', 'location__cabinet',
+                                              'location__department').order_by('id')
+    return [
+        {
+            'id': printer.id,
+            'model': f'{printer.model}',
+            'status': '🟢' if printer.is_active else '🔴',
+            'ip_address': printer.ip_address.address if printer.ip_address else None,
+            'location': f'{printer.get_subnet_name()}, {printer.location}',
+        }
+        for printer in printers
+    ]
+
+
+def get_supply_printer_models() -> dict:
+    from monitoring.models import PrinterSupplyStatus
+
+    return dict(PrinterSupplyStatus.objects.order_by('printer_id').annotate(
+        printer_model=Concat('printer__model__stamp__name', Value(' '), 'printer__model__name')
+    ).values_list('supply_id', 'printer_model'))
+
+
+def build_supply_rows(supplies, printer_models: dict) -> list:
+    return [
+        {
+            'id': supply.id,
+            'supply_id': supply.supply_id,
+            'supply': f'{supply.supply}',
+            'name': supply.supply.name,
+            'type': supply.supply.type,
+            'qty': supply.qty,
+            'price': supply.supply.price,
+            'printer': printer_models.get(supply.supply_id),
+        }
+        for supply in supplies
+    ]
+
+
+def load_supply_rows() -> list:
+    from monitoring.models import SupplyDetails
+
+    supplies = SupplyDetails.objects.select_related('supply').order_by('id')
+    return build_supply_rows(supplies, get_supply_printer_models())
+
+
+def load_allowed_users() -> frozenset:
+    from tgbot.models import TelegramUser
+
+    return frozenset(TelegramUser.objects.values_list('chat_id', flat=True))
+
+
+class ReadModel:
+    def __init__(self, loaders: dict, ttl: float = READ_MODEL_TTL):
+        self.loaders = loaders
+        self.ttl = ttl
+        self.entries = dict()
+        self.locks = dict()
+
+    def invalidate(self, *entities):
+        for entity in entities or list(self.entries):
+            self.entries.pop(entity, None)
+
+    def get_fresh_rows(self, entity):
+        entry = self.entries.get(entity)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            return entry[1]
+        return None
+
+    async def get_rows(self, entity) -> list:
+        rows = self.get_fresh_rows(entity)
+        if rows is None:
+            async with self.locks.setdefault(entity, asyncio.Lock()):
+                rows = self.get_fresh_rows(entity)
+                if rows is None:
+                    rows = await sync_to_async(self.loaders[entity])()
+                    self.entries[entity] = (time.monotonic(), rows)
+        return rows
+
+
+read_model = ReadModel({
+    'printers': load_printer_rows,
+    'supplies': load_supply_rows,
+    'allowed_users': load_allowed_users,
+})
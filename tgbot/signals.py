@@ -0,0 +1,30 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from monitoring.models import (Printer, IPAddress, PrinterModel, Location, Cabinet, Department, SupplyItem,
+                               SupplyDetails, PrinterSupplyStatus)
+from tgbot.models import TelegramUser
+from tgbot.pubsub import ALLOWED_USERS_CHANNEL, publish
+from tgbot.read_model import read_model
+
+
+@receiver([post_save, post_delete], sender=Printer)
+@receiver([post_save, post_delete], sender=IPAddress)
+@receiver([post_save, post_delete], sender=PrinterModel)
+@receiver([post_save, post_delete], sender=Location)
+@receiver([post_save, post_delete], sender=Cabinet)
+@receiver([post_save, post_delete], sender=Department)
+def invalidate_printer_rows(sender, **kwargs):
+    read_model.invalidate('printers', 'supplies')
+
+
+@receiver([post_save, post_delete], sender=SupplyItem)
+@receiver([post_save, post_delete], sender=SupplyDetails)
+@receiver([post_save, post_delete], sender=PrinterSupplyStatus)
+def invalidate_supply_rows(sender, **kwargs):
+    read_model.invalidate('supplies')
+
+
+@receiver([post_save, post_delete], sender=TelegramUser)
+def publish_allowed_users_change(sender, **kwargs):
+    read_model.invalidate('allowed_users')
+    publish(ALLOWED_USERS_CHANNEL)
@@ -0,0 +1,181 @@
+import asyncio
+import hmac
+import json
+import logging
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from telegram import Update
+from telegram.request import BaseRequest
+
+
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY]
+
+WEBHOOK_PATH = '/tgbot/webhook'
+SECRET_TOKEN_HEADER = b'x-telegram-bot-api-secret-token'
+MAX_UPDATE_SIZE = 1024 * 1024
+
+OFFLINE_BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Printer Master', 'username': 'printer_master_bot'}
+
+logger = logging.getLogger('tgbot')
+
+
+class PollingSource:
+    def run(self, application):
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
+
+
+class WebhookSource:
+    def __init__(self, url: str, secret_token: str, path: str = WEBHOOK_PATH, max_body_size: int = MAX_UPDATE_SIZE):
+        if not secret_token:
+            raise ValueError('The webhook mode requires a secret token')
+        self.url = url
+        self.secret_token = secret_token
+        self.path = path
+        self.max_body_size = max_body_size
+
+    async def start(self, application):
+        await application.initialize()
+        await application.start()
+        await application.bot.set_webhook(self.url, allowed_updates=ALLOWED_UPDATES,
+                                          secret_token=self.secret_token)
+        logger.info("Webhook has been set to %s", self.url)
+
+    async def stop(self, application):
+        await application.stop()
+        await application.shutdown()
+
+    def wrap_asgi(self, application, asgi_application):
+        async def webhook_asgi_application(scope, receive, send):
+            if scope['type'] == 'lifespan':
+                return await self.handle_lifespan(application, receive, send)
+            if scope['type'] == 'http' and scope['path'] == self.path:
+                return await self.handle_request(application, scope, receive, send)
+            return await asgi_application(scope, receive, send)
+        return webhook_asgi_application
+
+    async def handle_lifespan(self, application, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.start(application)
+                except Exception as e:
+                    logger.error("The bot has not been started: %s", e)
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.stop(application)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def handle_request(self, application, scope, receive, send):
+        if scope['method'] != 'POST':
+            return await send_response(send, 405)
+
+        headers = dict(scope['headers'])
+        secret_token = headers.get(SECRET_TOKEN_HEADER, b'')
+        if not hmac.compare_digest(secret_token, self.secret_token.encode()):
+            return await send_response(send, 403)
+
+        content_length = headers.get(b'content-length', b'0')
+        if content_length.isdigit() and int(content_length) > self.max_body_size:
+            return await send_response(send, 413)
+
+        body = b''
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get('body', b'')
+            if len(body) > self.max_body_size:
+                return await send_response(send, 413)
+            more_body = message.get('more_body', False)
+
+        try:
+            update = Update.de_json(json.loads(body), application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning("Invalid webhook update: %s", e)
+            return await send_response(send, 400)
+
+        await application.update_queue.put(update)
+        return await send_response(send, 200)
+
+
+async def send_response(send, status: int):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+class OfflineRequest(BaseRequest):
+    def __init__(self):
+        self.calls = Counter()
+        self.message_id = 0
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=BaseRequest.DEFAULT_NONE,
+                         write_timeout=BaseRequest.DEFAULT_NONE, connect_timeout=BaseRequest.DEFAULT_NONE,
+                         pool_timeout=BaseRequest.DEFAULT_NONE):
+        api_method = url.rsplit('/', 1)[-1]
+        self.calls[api_method] += 1
+        parameters = request_data.parameters if request_data is not None else dict()
+        return 200, json.dumps({'ok': True, 'result': self.get_result(api_method, parameters)}).encode()
+
+    def get_result(self, api_method: str, parameters: dict):
+        if api_method == 'getMe':
+            return OFFLINE_BOT_USER
+        if api_method == 'sendMessage':
+            self.message_id += 1
+            return {'message_id': self.message_id, 'date': int(time.time()), 'text': parameters.get('text', ''),
+                    'chat': {'id': int(parameters['chat_id']), 'type': 'private'}, 'from': OFFLINE_BOT_USER}
+        return True
+
+
+class LocalReplaySource:
+    def __init__(self, updates: list, concurrency: int = 1):
+        self.updates = updates
+        self.concurrency = concurrency
+
+    @classmethod
+    def from_file(cls, path, concurrency: int = 1):
+        lines = Path(path).read_text(encoding='utf-8').splitlines()
+        return cls([json.loads(line) for line in lines if line.strip()], concurrency)
+
+    def run(self, application) -> dict:
+        return asyncio.run(self.replay(application))
+
+    async def replay(self, application) -> dict:
+        updates_by_user = defaultdict(list)
+        async with application:
+            for data in self.updates:
+                update = Update.de_json(data, application.bot)
+                user_id = update.effective_user.id if update.effective_user else None
+                updates_by_user[user_id].append(update)
+
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def replay_user_updates(user_updates):
+                async with semaphore:
+                    for update in user_updates:
+                        await application.process_update(update)
+
+            start_time = time.perf_counter()
+            await asyncio.gather(*(replay_user_updates(user_updates) for user_updates in updates_by_user.values()))
+            duration = time.perf_counter() - start_time
+
+        return {
+            'updates': len(self.updates),
+            'users': len(updates_by_user),
+            'duration_s': round(duration, 3),
+            'updates_per_s': round(len(self.updates) / duration, 1) if duration else None,
+        }